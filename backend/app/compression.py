@@ -0,0 +1,194 @@
+"""zstd compression for large text columns.
+
+``CompressedText`` stores a string as a zstd frame (or as plain UTF-8 bytes
+when it is shorter than ``TEXT_COMPRESS_MIN_BYTES``) and returns it
+decompressed, so models use it like ``Text``. Rows written before the
+column was compressed still hold TEXT values and are read as they are;
+``python -m app.compression backfill`` rewrites them.
+
+OCR output of one hospital's reports repeats the same headers and phrases,
+so a dictionary trained on it (``python -m app.compression train``)
+compresses short documents much better. Dictionaries live in
+``TEXT_ZSTD_DICT_DIR`` as ``<dict_id>.zdict``; ``TEXT_ZSTD_DICT_ID`` picks the
+one new values are compressed with, and every frame names the dictionary it
+needs, so older dictionaries must be kept for as long as rows use them.
+"""
+import argparse
+import logging
+import os
+import threading
+from functools import lru_cache
+from typing import Optional, Union
+
+import zstandard as zstd
+from sqlalchemy import LargeBinary
+from sqlalchemy.types import TypeDecorator
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"  # cannot occur at the start of valid UTF-8
+
+_local = threading.local()  # zstd (de)compressors are not thread-safe
+
+
+@lru_cache(maxsize=None)
+def _dictionary(dict_dir: str, dict_id: int) -> zstd.ZstdCompressionDict:
+    path = os.path.join(dict_dir, f"{dict_id}.zdict")
+    try:
+        with open(path, "rb") as f:
+            return zstd.ZstdCompressionDict(f.read())
+    except FileNotFoundError:
+        raise LookupError(f"zstd dictionary {dict_id} not found at {path}") from None
+
+
+def _compressor() -> zstd.ZstdCompressor:
+    key = (settings.TEXT_ZSTD_LEVEL, settings.TEXT_ZSTD_DICT_ID, settings.TEXT_ZSTD_DICT_DIR)
+    cache = _local.__dict__.setdefault("compressors", {})
+    if key not in cache:
+        dict_data = _dictionary(settings.TEXT_ZSTD_DICT_DIR, settings.TEXT_ZSTD_DICT_ID) if settings.TEXT_ZSTD_DICT_ID else None
+        cache[key] = zstd.ZstdCompressor(level=settings.TEXT_ZSTD_LEVEL, dict_data=dict_data)
+    return cache[key]
+
+
+def _decompressor(dict_id: int) -> zstd.ZstdDecompressor:
+    key = (dict_id, settings.TEXT_ZSTD_DICT_DIR)
+    cache = _local.__dict__.setdefault("decompressors", {})
+    if key not in cache:
+        dict_data = _dictionary(settings.TEXT_ZSTD_DICT_DIR, dict_id) if dict_id else None
+        cache[key] = zstd.ZstdDecompressor(dict_data=dict_data)
+    return cache[key]
+
+
+def compress(text: str) -> bytes:
+    data = text.encode("utf-8")
+    if len(data) < settings.TEXT_COMPRESS_MIN_BYTES:
+        return data
+    return _compressor().compress(data)
+
+
+def frame_dict_id(value: bytes) -> Optional[int]:
+    """The dictionary a stored value was compressed with (0 for none), None if it is not compressed."""
+    if not value.startswith(ZSTD_MAGIC):
+        return None
+    return zstd.get_frame_parameters(value).dict_id
+
+
+def decompress(value: Union[bytes, str]) -> str:
+    if isinstance(value, str):
+        return value  # written before the column was compressed
+    dict_id = frame_dict_id(value)
+    if dict_id is None:
+        return value.decode("utf-8")
+    return _decompressor(dict_id).decompress(value).decode("utf-8")
+
+
+def is_current(value: Union[bytes, str, None]) -> bool:
+    """Whether a stored value is already in the form ``compress`` would write now."""
+    if value is None:
+        return True
+    if isinstance(value, str):
+        return False
+    dict_id = frame_dict_id(value)
+    if dict_id is None:
+        return len(value) < settings.TEXT_COMPRESS_MIN_BYTES
+    return dict_id == settings.TEXT_ZSTD_DICT_ID
+
+
+class CompressedText(TypeDecorator):
+    """A ``Text`` column stored zstd-compressed. Not usable in SQL string comparisons."""
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else compress(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else decompress(value)
+
+
+def train(samples: list[str], size: int) -> bytes:
+    """Train a zstd dictionary of about ``size`` bytes on ``samples``."""
+    trained = zstd.train_dictionary(size, [s.encode("utf-8") for s in samples if s])
+    return trained.as_bytes()
+
+
+def backfill(db, batch_size: int = 200) -> int:
+    """Rewrite translations stored uncompressed or with another dictionary; returns the rows changed."""
+    from sqlalchemy import text, update
+
+    from app.models import PREVIEW_CHARS, Translation
+
+    table = Translation.__table__
+    changed, after = 0, 0
+    while True:
+        rows = db.execute(
+            text("SELECT id, original_text, translated_text, translated_preview FROM translations "
+                 "WHERE id > :after ORDER BY id LIMIT :n"),
+            {"after": after, "n": batch_size},
+        ).all()
+        if not rows:
+            break
+        for row_id, original, translated, preview in rows:
+            if is_current(original) and is_current(translated) and preview is not None:
+                continue
+            translated_text = decompress(translated)
+            db.execute(update(table).where(table.c.id == row_id).values(
+                original_text=decompress(original),
+                translated_text=translated_text,
+                translated_preview=translated_text[:PREVIEW_CHARS],
+            ))
+            changed += 1
+        after = rows[-1][0]
+        db.commit()
+    return changed
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.compression", description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_train = sub.add_parser("train", help="train a dictionary on the stored translations")
+    p_train.add_argument("--size", type=int, default=112640, help="dictionary size in bytes")
+    p_train.add_argument("--limit", type=int, default=5000, help="most recent translations to sample")
+    p_backfill = sub.add_parser("backfill", help="compress rows written before, or with another dictionary")
+    p_backfill.add_argument("--vacuum", action="store_true", help="VACUUM afterwards to return the space to the OS")
+    args = parser.parse_args(argv)
+
+    from sqlalchemy import text
+    from sqlalchemy.orm import undefer
+
+    from app.database import SessionLocal, engine, init_db
+    from app.models import Translation
+
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    db = SessionLocal()
+    try:
+        if args.command == "train":
+            rows = (
+                db.query(Translation)
+                .options(undefer(Translation.original_text), undefer(Translation.translated_text))
+                .order_by(Translation.id.desc()).limit(args.limit).all()
+            )
+            samples = [t for row in rows for t in (row.original_text, row.translated_text)]
+            data = train(samples, args.size)
+            dict_id = zstd.ZstdCompressionDict(data).dict_id()
+            os.makedirs(settings.TEXT_ZSTD_DICT_DIR, exist_ok=True)
+            path = os.path.join(settings.TEXT_ZSTD_DICT_DIR, f"{dict_id}.zdict")
+            with open(path, "wb") as f:
+                f.write(data)
+            print(f"wrote {path} from {len(samples)} texts; set TEXT_ZSTD_DICT_ID={dict_id} and run backfill")
+        else:
+            print(f"rewrote {backfill(db)} translations")
+            if args.vacuum:
+                db.close()
+                with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                    conn.execute(text("VACUUM"))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
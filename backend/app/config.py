@@ -7,11 +7,78 @@ class Settings(BaseSettings):
     UPPERMIND_URL: str = "http://10.10.0.149:3000"
     OLLAMA_URL: str = "http://localhost:11434"
     OLLAMA_MODEL: str = "deepseek-ocr"
+    OLLAMA_KEEP_ALIVE: str = ""  # e.g. "1h" or "-1" (forever); empty = the model profile's value
+    OLLAMA_WARMUP_INTERVAL: int = 120  # seconds between residency checks, 0 disables warm-up
     TRANSLATOR_AGENT_ID: int = 1
+    JWT_KEY: str = ""  # PEM public key or HMAC secret; enables local token verification
+    JWT_JWKS_URL: str = ""  # or a JWKS endpoint, refreshed every JWT_JWKS_REFRESH_S
+    JWT_JWKS_REFRESH_S: int = 3600
+    JWT_ALGORITHMS: str = "RS256"  # comma-separated
+    JWT_ISSUER: str = ""
+    JWT_AUDIENCE: str = ""
+    JWT_LEEWAY_S: int = 30
     UPLOAD_DIR: str = "./uploads"
+    STORAGE_BACKEND: str = "local"  # "local" (UPLOAD_DIR) or "s3" (any S3-compatible store, e.g. MinIO)
+    STORAGE_S3_BUCKET: str = ""
+    STORAGE_S3_PREFIX: str = ""  # prepended to every object key, e.g. "intpatient/"
+    STORAGE_S3_ENDPOINT_URL: str = ""  # empty = AWS; e.g. "http://minio:9000"
+    STORAGE_S3_REGION: str = ""
+    STORAGE_S3_ACCESS_KEY_ID: str = ""  # empty = boto3's default credential chain
+    STORAGE_S3_SECRET_ACCESS_KEY: str = ""
+    STORAGE_S3_PART_SIZE_MB: int = 8  # uploads above this use multipart upload
+    STORAGE_PRESIGN_DOWNLOADS: bool = False  # redirect downloads to presigned S3 URLs instead of proxying
+    STORAGE_PRESIGN_EXPIRES_S: int = 300
+    BLOB_GC_INTERVAL_S: int = 3600  # seconds between sweeps for unreferenced uploads, 0 disables
+    BLOB_GC_GRACE_S: int = 3600  # an unreferenced blob is kept at least this long after its last upload
+    EXPORT_MAX_RECORDS: int = 1000  # records one bulk export may contain
+    INGEST_DIR: str = "./ingest"  # archives uploaded for bulk ingest, removed once every record is imported
+    INGEST_CONCURRENCY: int = 4  # records a bulk ingest worker imports at a time
+    REPROCESS_CONCURRENCY: int = 2  # files a reprocess job OCRs/translates at a time
+    REPROCESS_PER_MINUTE: float = 0  # files a reprocess job starts per minute, 0 = no limit
     DATABASE_URL: str = "sqlite:///./intpatient.db"
+    TEXT_COMPRESS_MIN_BYTES: int = 128  # translation texts shorter than this are stored uncompressed
+    TEXT_ZSTD_LEVEL: int = 9
+    TEXT_ZSTD_DICT_DIR: str = "./zstd-dicts"  # trained dictionaries, <dict_id>.zdict
+    TEXT_ZSTD_DICT_ID: int = 0  # dictionary new texts are compressed with, 0 = none
     MAX_UPLOAD_SIZE_MB: int = 50
     CORS_ORIGINS: str = "http://localhost:5173"
+    JSON_GZIP_MIN_BYTES: int = 4096  # JSON responses at least this large are gzipped for clients that accept it, 0 disables
+    JSON_GZIP_LEVEL: int = 6
+    OCR_CONCURRENCY: int = 2
+    OCR_TOKENS_BASE: int = 256  # generated-token cap per image: base + per megapixel
+    OCR_TOKENS_PER_MEGAPIXEL: int = 1200
+    OCR_BATCH_SIZE: int = 0  # images per vision request, 0 = the model's batch_size
+    OCR_TARGET_PIXELS: int = 1600  # long side of a PDF region rendered for OCR
+    OCR_MIN_DPI: int = 100
+    OCR_MAX_DPI: int = 300
+    PREFILTER_BLANK_INK: float = 0.0001  # ink share below which a page counts as blank (0 disables)
+    PREFILTER_DUP_HAMMING: int = 4  # max pHash distance (of 63 bits) for a near-duplicate
+    PREFILTER_DUP_CORRELATION: float = 0.99  # min thumbnail correlation for a near-duplicate
+    LANGID_SKIP_TURKISH: bool = True  # pass Turkish OCR segments through without translating
+    LANGID_MIN_LETTERS: int = 20  # shorter segments are left undecided
+    LANGID_MIN_MARGIN: float = 0.3  # per-trigram log-likelihood lead the winning language needs
+    SCHEDULER_USER_WEIGHTS: str = ""  # e.g. "intake1:2,batch:0.5"
+    TRANSLATE_CONCURRENCY_INITIAL: int = 4
+    TRANSLATE_CONCURRENCY_MIN: int = 1
+    TRANSLATE_CONCURRENCY_MAX: int = 32
+    TRANSLATE_LATENCY_TOLERANCE: float = 2.0
+    TRANSLATE_RETRIES: int = 2  # extra attempts after a transient translator failure
+    TRANSLATE_RETRY_BASE_S: float = 0.5  # first backoff ceiling, doubled per attempt (full jitter)
+    TRANSLATE_RETRY_MAX_S: float = 8.0
+    TRANSLATE_RETRY_BUDGET_RATIO: float = 0.1  # retries + hedges allowed per request
+    TRANSLATE_RETRY_BUDGET_MIN_PER_S: float = 0.2  # budget trickle when traffic is low
+    TRANSLATE_HEDGE_QUANTILE: float = 0.95  # duplicate a request slower than this quantile, 0 disables
+    TRANSLATE_BATCH_MAX_ITEMS: int = 8  # small texts packed per translator request, 1 disables packing
+    TRANSLATE_BATCH_ITEM_CHARS: int = 600  # only texts up to this length wait for a batch
+    TRANSLATE_BATCH_MAX_CHARS: int = 3000  # a batch this large is sent without waiting
+    TRANSLATE_BATCH_WINDOW_MS: float = 30  # how long a small text waits for company
+    ADMISSION_MAX_QUEUED_PAGES: int = 200
+    ADMISSION_MAX_GPU_JOBS: int = 64
+    ADMISSION_MAX_INFLIGHT_MB: int = 1024
+    ADMISSION_MAX_RETRY_AFTER: int = 300
+    TRACE_EXPORTER: str = ""  # "", "json" or "otlp"
+    TRACE_JSON_PATH: str = "./traces/traces.jsonl"
+    TRACE_OTLP_ENDPOINT: str = "http://localhost:4318/v1/traces"
 
     class Config:
         env_file = str(Path(__file__).resolve().parent.parent.parent / ".env")
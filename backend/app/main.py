@@ -1,16 +1,25 @@
+import asyncio
 import logging
 import os
 
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 
 logging.basicConfig(level=logging.INFO)
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.config import settings
 from app.database import init_db
-from app.routers import auth, radiology, reports
+from app.responses import CompressedJSONResponse
+from app.routers import auth, export, ingest, metrics, radiology, reports, usage
+from app.services import blobs, ocr, storage
+from app.services.admission import AdmissionMiddleware
+from app.tracing import TracingMiddleware
 
-app = FastAPI(title="IntPatient API", version="1.0.0")
+app = FastAPI(title="IntPatient API", version="1.0.0", default_response_class=CompressedJSONResponse)
+
+# Reject report uploads early while the OCR/translation backlog is too deep
+app.add_middleware(AdmissionMiddleware)
 
 # CORS middleware
 origins = [origin.strip() for origin in settings.CORS_ORIGINS.split(",")]
@@ -20,22 +29,60 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "Retry-After"],
 )
 
+# Per-request tracing (outermost, so Server-Timing covers the whole request)
+app.add_middleware(TracingMiddleware)
+
 # Include routers
 app.include_router(auth.router, prefix="/api")
 app.include_router(radiology.router, prefix="/api")
 app.include_router(reports.router, prefix="/api")
+app.include_router(metrics.router, prefix="/api")
+app.include_router(usage.router, prefix="/api")
+app.include_router(export.router, prefix="/api")
+app.include_router(ingest.router, prefix="/api")
 
 
 @app.on_event("startup")
 def on_startup():
     init_db()
-    # Create upload directories
-    os.makedirs(os.path.join(settings.UPLOAD_DIR, "radiology"), exist_ok=True)
-    os.makedirs(os.path.join(settings.UPLOAD_DIR, "reports"), exist_ok=True)
+    # Fail at startup, not on the first upload, if the storage backend is misconfigured
+    if storage.backend().name == "local":
+        os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+
+
+@app.on_event("startup")
+async def start_blob_gc():
+    if settings.BLOB_GC_INTERVAL_S > 0:
+        app.state.blob_gc_task = asyncio.create_task(blobs.collect_periodically(settings.BLOB_GC_INTERVAL_S))
+
+
+@app.on_event("startup")
+async def start_model_warmup():
+    # Keep the OCR model resident so no upload pays Ollama's load time
+    if settings.OLLAMA_WARMUP_INTERVAL > 0:
+        app.state.warmup_task = asyncio.create_task(ocr.keep_warm(settings.OLLAMA_WARMUP_INTERVAL))
+
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    for name in ("warmup_task", "blob_gc_task"):
+        task = getattr(app.state, name, None)
+        if task is not None:
+            task.cancel()
 
 
 @app.get("/api/health")
 def health_check():
     return {"status": "ok"}
+
+
+@app.get("/api/health/ready")
+def readiness_check():
+    """200 once the OCR model is resident in Ollama, 503 while it is not."""
+    state = ocr.readiness.as_dict()
+    if not state["resident"]:
+        return JSONResponse({"status": "warming", "ocr_model": state}, status_code=503)
+    return {"status": "ready", "ocr_model": state}
@@ -0,0 +1,66 @@
+"""In-process metrics registry.
+
+Counters and summaries are updated by the services; gauges are callables
+sampled when a snapshot is taken. ``GET /api/metrics`` returns ``snapshot()``.
+"""
+import threading
+from typing import Callable
+
+_lock = threading.Lock()
+_counters: dict[str, float] = {}
+_summaries: dict[str, dict] = {}
+_gauges: dict[str, Callable[[], float]] = {}
+
+
+def _key(name: str, labels: dict) -> str:
+    if not labels:
+        return name
+    inner = ",".join(f'{k}="{v}"' for k, v in sorted(labels.items()))
+    return f"{name}{{{inner}}}"
+
+
+def inc(name: str, value: float = 1, **labels) -> None:
+    """Increase a counter."""
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name: str, value: float, **labels) -> None:
+    """Record one observation (count, sum and max are kept)."""
+    key = _key(name, labels)
+    with _lock:
+        s = _summaries.get(key)
+        if s is None:
+            s = _summaries[key] = {"count": 0, "sum": 0.0, "max": value}
+        s["count"] += 1
+        s["sum"] += value
+        s["max"] = max(s["max"], value)
+
+
+def register_gauge(name: str, fn: Callable[[], float], **labels) -> None:
+    """Register a gauge whose value is read from ``fn`` at snapshot time."""
+    with _lock:
+        _gauges[_key(name, labels)] = fn
+
+
+def snapshot() -> dict:
+    with _lock:
+        counters = dict(_counters)
+        summaries = {
+            k: {**v, "avg": v["sum"] / v["count"] if v["count"] else 0.0}
+            for k, v in _summaries.items()
+        }
+        gauges = dict(_gauges)
+    return {
+        "counters": counters,
+        "gauges": {k: fn() for k, fn in gauges.items()},
+        "summaries": summaries,
+    }
+
+
+def reset() -> None:
+    """Clear counters and summaries (gauges stay registered)."""
+    with _lock:
+        _counters.clear()
+        _summaries.clear()
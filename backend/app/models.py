@@ -1,10 +1,13 @@
 from datetime import datetime
 
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, Float, String, Text, DateTime, ForeignKey, event, update
+from sqlalchemy.orm import deferred, relationship
 
+from app.compression import CompressedText
 from app.database import Base
 
+PREVIEW_CHARS = 200  # translated text kept uncompressed for record listings
+
 
 class Record(Base):
     __tablename__ = "records"
@@ -14,6 +17,7 @@ class Record(Base):
     patient_note = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     created_by = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="complete", server_default="complete")  # "processing", "complete", "aborted" or "failed"
 
     files = relationship("UploadedFile", back_populates="record", cascade="all, delete-orphan")
 
@@ -25,11 +29,41 @@ class UploadedFile(Base):
     record_id = Column(Integer, ForeignKey("records.id"), nullable=False)
     original_filename = Column(String, nullable=False)
     stored_path = Column(String, nullable=False)
+    blob_sha256 = Column(String(64), ForeignKey("blobs.sha256"), nullable=True)  # null for files stored before blobs
     file_type = Column(String, nullable=False)
+    status = Column(String, nullable=True)  # reports: "pending", "ocr", "translated" or "failed"; null for radiology
     created_at = Column(DateTime, default=datetime.utcnow)
 
     record = relationship("Record", back_populates="files")
-    translations = relationship("Translation", back_populates="file", cascade="all, delete-orphan")
+    # Newest version first: translations[0] is the current one
+    translations = relationship(
+        "Translation", back_populates="file", cascade="all, delete-orphan",
+        order_by="(Translation.version.desc(), Translation.id.desc())",
+    )
+
+
+class Blob(Base):
+    __tablename__ = "blobs"
+
+    sha256 = Column(String(64), primary_key=True)
+    size = Column(Integer, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0, server_default="0")  # uploaded_files rows pointing here
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow)  # last upload of these bytes; garbage collection waits past it
+
+
+# Keep Blob.ref_count in step with the rows that point at a blob, in the same
+# transaction. Bulk query.delete() bypasses these hooks.
+@event.listens_for(UploadedFile, "after_insert")
+def _blob_referenced(mapper, connection, target):
+    if target.blob_sha256:
+        connection.execute(update(Blob).where(Blob.sha256 == target.blob_sha256).values(ref_count=Blob.ref_count + 1))
+
+
+@event.listens_for(UploadedFile, "after_delete")
+def _blob_released(mapper, connection, target):
+    if target.blob_sha256:
+        connection.execute(update(Blob).where(Blob.sha256 == target.blob_sha256).values(ref_count=Blob.ref_count - 1))
 
 
 class Translation(Base):
@@ -37,10 +71,99 @@ class Translation(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     file_id = Column(Integer, ForeignKey("uploaded_files.id"), nullable=False)
-    original_text = Column(Text, nullable=False)
-    translated_text = Column(Text, nullable=False)
+    # Compressed and only loaded when accessed; listings read translated_preview
+    original_text = deferred(Column(CompressedText, nullable=False))
+    translated_text = deferred(Column(CompressedText, nullable=False))
+    translated_preview = Column(String, nullable=True)  # first PREVIEW_CHARS of translated_text
     ocr_duration_ms = Column(Integer, nullable=True)
     translation_duration_ms = Column(Integer, nullable=True)
+    translation_calls_skipped = Column(Integer, nullable=False, default=0, server_default="0")  # Turkish segments passed through
+    version = Column(Integer, nullable=False, default=1, server_default="1")  # reprocessing adds a higher version
+    ocr_model = Column(String, nullable=True)  # OLLAMA_MODEL that produced original_text; null on older rows and failed OCR
+    translator_agent_id = Column(Integer, nullable=True)  # TRANSLATOR_AGENT_ID at translation time; null on older rows
     created_at = Column(DateTime, default=datetime.utcnow)
 
     file = relationship("UploadedFile", back_populates="translations")
+    usage = relationship("UpstreamUsage", back_populates="translation", cascade="all, delete-orphan")
+
+
+class UpstreamUsage(Base):
+    __tablename__ = "upstream_usage"
+
+    id = Column(Integer, primary_key=True, index=True)
+    translation_id = Column(Integer, ForeignKey("translations.id"), nullable=False, index=True)
+    stage = Column(String, nullable=False)  # "ocr" or "translation"
+    model = Column(String, nullable=False)
+    requests = Column(Float, nullable=False, default=0)  # fractional when a request served several files
+    prompt_tokens = Column(Integer, nullable=False, default=0)
+    output_tokens = Column(Integer, nullable=False, default=0)
+    gpu_ms = Column(Integer, nullable=False, default=0)
+    load_ms = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    translation = relationship("Translation", back_populates="usage")
+
+
+class IngestJob(Base):
+    __tablename__ = "ingest_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    source = Column(String, nullable=False)  # ZIP archive or directory the files are read from
+    created_by = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="pending", server_default="pending")  # "pending", "running" or "complete"
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)  # start of the latest run; throughput is measured from here
+    finished_at = Column(DateTime, nullable=True)
+
+    items = relationship("IngestItem", back_populates="job", cascade="all, delete-orphan")
+
+
+class IngestItem(Base):
+    """One record to create from a manifest; its status is the job's checkpoint."""
+
+    __tablename__ = "ingest_items"
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(Integer, ForeignKey("ingest_jobs.id"), nullable=False, index=True)
+    key = Column(String, nullable=False)  # the manifest's record column
+    record_type = Column(String, nullable=False)  # "radiology" or "report"
+    patient_note = Column(Text, nullable=True)
+    paths = Column(Text, nullable=False)  # JSON list of paths inside the source
+    status = Column(String, nullable=False, default="pending", server_default="pending")  # "pending", "done" or "failed"
+    record_id = Column(Integer, ForeignKey("records.id"), nullable=True)  # set as soon as the record exists
+    failed_files = Column(Integer, nullable=False, default=0, server_default="0")
+    error = Column(Text, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    job = relationship("IngestJob", back_populates="items")
+
+
+class ReprocessJob(Base):
+    __tablename__ = "reprocess_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    mode = Column(String, nullable=False)  # "ocr" (OCR and translate again) or "translate"
+    criteria = Column(Text, nullable=False)  # JSON of the filters the files were selected with
+    created_by = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="pending", server_default="pending")  # "pending", "running" or "complete"
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    items = relationship("ReprocessItem", back_populates="job", cascade="all, delete-orphan")
+
+
+class ReprocessItem(Base):
+    """One file to reprocess; its status is the job's checkpoint."""
+
+    __tablename__ = "reprocess_items"
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(Integer, ForeignKey("reprocess_jobs.id"), nullable=False, index=True)
+    file_id = Column(Integer, ForeignKey("uploaded_files.id"), nullable=False)
+    status = Column(String, nullable=False, default="pending", server_default="pending")  # "pending", "done" or "failed"
+    translation_id = Column(Integer, ForeignKey("translations.id"), nullable=True)  # the version it wrote
+    error = Column(Text, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    job = relationship("ReprocessJob", back_populates="items")
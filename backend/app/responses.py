@@ -0,0 +1,60 @@
+"""JSON encoding for API responses and server-sent events.
+
+``CompressedJSONResponse`` is the app's default response class: bodies are
+rendered with orjson instead of the standard library encoder, and gzipped
+when the client accepts it and the body is at least ``JSON_GZIP_MIN_BYTES``
+(record details carry every translation in full, and OCR text compresses
+well).
+Streaming responses (SSE, downloads, exports) are left alone, so events are
+never held back in a compressor's buffer.
+"""
+import gzip
+
+import orjson
+from fastapi.responses import ORJSONResponse
+
+from app import metrics
+from app.config import settings
+
+
+def _quality(params: str) -> float:
+    for param in params.split(";"):
+        name, _, value = param.partition("=")
+        if name.strip().lower() == "q":
+            try:
+                return float(value)
+            except ValueError:
+                return 1.0
+    return 1.0
+
+
+def _accepts_gzip(scope) -> bool:
+    """Whether any ``Accept-Encoding`` header allows gzip; an explicit ``gzip`` entry overrides ``*``."""
+    qualities = {}
+    for name, value in scope.get("headers", []):
+        if name != b"accept-encoding":
+            continue
+        for coding in value.decode("latin-1").lower().split(","):
+            coding, _, params = coding.partition(";")
+            if coding.strip() in ("gzip", "*"):
+                qualities[coding.strip()] = max(qualities.get(coding.strip(), 0.0), _quality(params))
+    return qualities.get("gzip", qualities.get("*", 0.0)) > 0
+
+
+class CompressedJSONResponse(ORJSONResponse):
+    async def __call__(self, scope, receive, send):
+        if 0 < settings.JSON_GZIP_MIN_BYTES <= len(self.body):
+            self.headers.add_vary_header("Accept-Encoding")
+            if _accepts_gzip(scope) and "content-encoding" not in self.headers:
+                raw = len(self.body)
+                self.body = gzip.compress(self.body, compresslevel=settings.JSON_GZIP_LEVEL, mtime=0)
+                self.headers["content-encoding"] = "gzip"
+                self.headers["content-length"] = str(len(self.body))
+                metrics.inc("json_gzip_responses")
+                metrics.inc("json_gzip_bytes_saved", raw - len(self.body))
+        await super().__call__(scope, receive, send)
+
+
+def sse(payload) -> bytes:
+    """One server-sent event carrying ``payload`` as compact JSON."""
+    return b"data: " + orjson.dumps(payload) + b"\n\n"
@@ -1,8 +1,11 @@
 import logging
 
+import jwt
 from fastapi import APIRouter, Depends, HTTPException, Request
 from pydantic import BaseModel
 
+from app import metrics
+from app.services.tokens import verifier
 from app.services.uppermind import authenticate, get_user
 
 logger = logging.getLogger(__name__)
@@ -15,15 +18,39 @@ class LoginRequest(BaseModel):
     password: str
 
 
+async def _local_user(token: str):
+    """Verify ``token`` in-process when a JWT key is configured; None means ask UpperMind."""
+    if not verifier.enabled:
+        return None
+    try:
+        user = await verifier.user_for(token, get_user)
+    except jwt.InvalidTokenError as exc:
+        metrics.inc("auth_verifications", result="rejected")
+        logger.info("Rejected access token: %s", exc)
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+    if user is not None:
+        metrics.inc("auth_verifications", result="local")
+    return user
+
+
 async def get_current_user(request: Request) -> dict:
-    """Dependency that validates the Bearer token via UpperMind and returns the user."""
+    """Dependency that validates the Bearer token and returns the user.
+
+    Signed tokens are verified locally when a JWT key is configured;
+    anything else is validated via UpperMind's ``/auth/me``.
+    """
     auth_header = request.headers.get("Authorization")
     if not auth_header or not auth_header.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Missing or invalid authorization header")
 
     token = auth_header.split(" ", 1)[1]
     try:
-        user = await get_user(token)
+        user = await _local_user(token)
+        if user is None:
+            metrics.inc("auth_verifications", result="remote")
+            user = await get_user(token)
+    except HTTPException:
+        raise
     except Exception:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
 
@@ -44,7 +71,7 @@ async def login(body: LoginRequest):
         raise HTTPException(status_code=401, detail="No access token received")
 
     try:
-        user = await get_user(access_token)
+        user = await _local_user(access_token) or await get_user(access_token)
     except Exception:
         raise HTTPException(status_code=401, detail="Failed to fetch user info")
 
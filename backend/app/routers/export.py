@@ -0,0 +1,91 @@
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.config import settings
+from app.database import get_db
+from app.models import Record
+from app.routers.auth import get_current_user
+from app.services import export, storage
+
+router = APIRouter(prefix="/export", tags=["export"])
+
+
+def _check_options(format: str, sidecars: str) -> None:
+    if format not in export.FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(export.FORMATS)}")
+    if sidecars not in export.SIDECARS:
+        raise HTTPException(status_code=400, detail=f"sidecars must be one of: {', '.join(export.SIDECARS)}")
+
+
+def _response(db: Session, record_ids: list[int], name: str, format: str, sidecars: str) -> StreamingResponse:
+    # The archive is built after this request's session is closed; it reads each record in its own
+    session_factory = sessionmaker(bind=db.get_bind(), autoflush=False)
+    return StreamingResponse(
+        export.archive(session_factory, record_ids, format, sidecars),
+        media_type=export.FORMATS[format],
+        headers={"Content-Disposition": storage.attachment(f"{name}.{format}")},
+    )
+
+
+@router.get("/records/{record_id}")
+def export_record(
+    record_id: int,
+    format: str = "zip",
+    sidecars: str = "txt",
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user),
+):
+    """Download one record's files and translations as a streamed archive."""
+    _check_options(format, sidecars)
+    record = db.query(Record).filter(Record.id == record_id).first()
+    if not record:
+        raise HTTPException(status_code=404, detail="Record not found")
+    return _response(db, [record.id], f"{record.record_type}-{record.id}", format, sidecars)
+
+
+@router.get("/records")
+def export_records(
+    record_type: Optional[str] = None,
+    created_by: Optional[str] = None,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    ids: Optional[str] = None,
+    format: str = "zip",
+    sidecars: str = "txt",
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user),
+):
+    """Download every record matching the filters as one streamed archive.
+
+    ``since`` and ``until`` are inclusive dates on the record's creation time;
+    ``ids`` is a comma-separated list of record ids.
+    """
+    _check_options(format, sidecars)
+    query = db.query(Record.id)
+    if record_type is not None:
+        query = query.filter(Record.record_type == record_type)
+    if created_by is not None:
+        query = query.filter(Record.created_by == created_by)
+    if since is not None:
+        query = query.filter(Record.created_at >= datetime.combine(since, datetime.min.time()))
+    if until is not None:
+        query = query.filter(Record.created_at < datetime.combine(until + timedelta(days=1), datetime.min.time()))
+    if ids is not None:
+        try:
+            wanted = [int(i) for i in ids.split(",") if i.strip()]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="ids must be a comma-separated list of record ids")
+        query = query.filter(Record.id.in_(wanted))
+    record_ids = [r.id for r in query.order_by(Record.created_at, Record.id).limit(settings.EXPORT_MAX_RECORDS + 1)]
+    if not record_ids:
+        raise HTTPException(status_code=404, detail="No records match")
+    if len(record_ids) > settings.EXPORT_MAX_RECORDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"More than {settings.EXPORT_MAX_RECORDS} records match; narrow the filters",
+        )
+    return _response(db, record_ids, f"records-{date.today().isoformat()}", format, sidecars)
@@ -0,0 +1,85 @@
+import asyncio
+import csv
+import logging
+import os
+import shutil
+import uuid
+import zipfile
+
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.config import settings
+from app.database import get_db
+from app.routers.auth import get_current_user
+from app.services import ingest
+from app.services.storage import CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/ingest", tags=["ingest"])
+
+_running: set[asyncio.Task] = set()  # strong references, so running jobs are not garbage collected
+
+
+def _save(stream, path: str) -> None:
+    with open(path, "wb") as out:
+        shutil.copyfileobj(stream, out, CHUNK_SIZE)
+
+
+async def _run(job_id: int, user: dict, session_factory, path: str) -> None:
+    try:
+        await ingest.run_job(job_id, user, session_factory)
+    except Exception:
+        logger.exception("Ingest job %d stopped", job_id)
+        return
+    with session_factory() as db:
+        done = ingest.progress(db, job_id)
+    if done["status"] == "complete" and not done["records"]["failed"]:
+        os.remove(path)
+
+
+@router.post("", status_code=202)
+async def start_ingest(
+    archive: UploadFile = File(...),
+    manifest: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user),
+):
+    """Import a ZIP archive of reports and scans described by a CSV or JSON manifest.
+
+    The import runs in the background; poll ``GET /api/ingest/{job_id}`` for progress.
+    It runs on the caller's access token, so an archive that takes longer than
+    the token lasts is better imported with ``python -m app.services.ingest``.
+    """
+    os.makedirs(settings.INGEST_DIR, exist_ok=True)
+    path = os.path.join(settings.INGEST_DIR, f"{uuid.uuid4().hex}.zip")
+    await asyncio.to_thread(_save, archive.file, path)
+    username = current_user.get("username", current_user.get("email", "unknown"))
+    try:
+        if not zipfile.is_zipfile(path):
+            raise ValueError("The archive must be a ZIP file")
+        rows = ingest.parse_manifest(await manifest.read(), manifest.filename or "")
+        job = ingest.create_job(db, path, rows, username)
+    except (ValueError, csv.Error) as e:
+        os.remove(path)
+        raise HTTPException(status_code=400, detail=str(e))
+
+    session_factory = sessionmaker(bind=db.get_bind(), autoflush=False)
+    task = asyncio.create_task(_run(job.id, current_user, session_factory, path))
+    _running.add(task)
+    task.add_done_callback(_running.discard)
+    return ingest.progress(db, job.id)
+
+
+@router.get("/{job_id}")
+def get_ingest_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user),
+):
+    """Progress and throughput of an ingest job."""
+    result = ingest.progress(db, job_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Ingest job not found")
+    return result
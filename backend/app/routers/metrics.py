@@ -0,0 +1,12 @@
+from fastapi import APIRouter, Depends
+
+from app import metrics
+from app.routers.auth import get_current_user
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics")
+def get_metrics(current_user: dict = Depends(get_current_user)):
+    """Return in-process counters, gauges and latency summaries."""
+    return metrics.snapshot()
@@ -1,15 +1,13 @@
-import os
-import uuid
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, Header, HTTPException, UploadFile, File, Form
 from sqlalchemy.orm import Session
 
-from app.config import settings
 from app.database import get_db
 from app.models import Record, UploadedFile
 from app.routers.auth import get_current_user
+from app.schemas import FileOut, RadiologyRecordOut, RecordSummary
+from app.services import blobs
 
 router = APIRouter(prefix="/radiology", tags=["radiology"])
 
@@ -20,7 +18,27 @@ def _get_extension(filename: str) -> str:
     return filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
 
 
-@router.post("/upload")
+def _record_out(record: Record) -> RadiologyRecordOut:
+    return RadiologyRecordOut(
+        id=record.id,
+        record_type=record.record_type,
+        patient_note=record.patient_note,
+        created_at=record.created_at,
+        created_by=record.created_by,
+        files=[
+            FileOut(
+                id=f.id,
+                original_filename=f.original_filename,
+                file_type=f.file_type,
+                sha256=f.blob_sha256,
+                download_url=f"/api/radiology/files/{f.id}",
+            )
+            for f in record.files
+        ],
+    )
+
+
+@router.post("/upload", response_model=RadiologyRecordOut)
 async def upload_radiology(
     files: List[UploadFile] = File(...),
     patient_note: str = Form(None),
@@ -40,7 +58,10 @@ async def upload_radiology(
                 detail=f"Invalid file type: {f.filename}. Allowed: {', '.join(ALLOWED_EXTENSIONS)}",
             )
 
-    # Create record
+    # Store the bytes first (identical content is stored once); the record and
+    # its file rows are then written in one transaction with no await inside
+    staged = [await blobs.stage_upload(db, f) for f in files]
+
     username = current_user.get("username", current_user.get("email", "unknown"))
     record = Record(
         record_type="radiology",
@@ -50,51 +71,23 @@ async def upload_radiology(
     db.add(record)
     db.flush()  # get record.id
 
-    # Save files
-    record_dir = os.path.join(settings.UPLOAD_DIR, "radiology", str(record.id))
-    os.makedirs(record_dir, exist_ok=True)
-
-    saved_files = []
-    for f in files:
-        ext = _get_extension(f.filename)
-        stored_name = f"{uuid.uuid4().hex}.{ext}"
-        stored_path = os.path.join(record_dir, stored_name)
-
-        content = await f.read()
-        with open(stored_path, "wb") as out:
-            out.write(content)
-
-        uploaded = UploadedFile(
+    for f, (sha256, size) in zip(files, staged):
+        blobs.adopt(db, sha256, size)
+        db.add(UploadedFile(
             record_id=record.id,
             original_filename=f.filename,
-            stored_path=stored_path,
-            file_type=ext,
-        )
-        db.add(uploaded)
-        saved_files.append(uploaded)
+            stored_path=blobs.key_for(sha256),
+            blob_sha256=sha256,
+            file_type=_get_extension(f.filename),
+        ))
 
     db.commit()
     db.refresh(record)
 
-    return {
-        "id": record.id,
-        "record_type": record.record_type,
-        "patient_note": record.patient_note,
-        "created_at": record.created_at.isoformat(),
-        "created_by": record.created_by,
-        "files": [
-            {
-                "id": f.id,
-                "original_filename": f.original_filename,
-                "file_type": f.file_type,
-                "download_url": f"/api/radiology/files/{f.id}",
-            }
-            for f in record.files
-        ],
-    }
+    return _record_out(record)
 
 
-@router.get("/records")
+@router.get("/records", response_model=list[RecordSummary])
 def list_radiology_records(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user),
@@ -102,18 +95,18 @@ def list_radiology_records(
     """List all radiology records."""
     records = db.query(Record).filter(Record.record_type == "radiology").order_by(Record.created_at.desc()).all()
     return [
-        {
-            "id": r.id,
-            "patient_note": r.patient_note,
-            "created_at": r.created_at.isoformat(),
-            "created_by": r.created_by,
-            "file_count": len(r.files),
-        }
+        RecordSummary(
+            id=r.id,
+            patient_note=r.patient_note,
+            created_at=r.created_at,
+            created_by=r.created_by,
+            file_count=len(r.files),
+        )
         for r in records
     ]
 
 
-@router.get("/records/{record_id}")
+@router.get("/records/{record_id}", response_model=RadiologyRecordOut)
 def get_radiology_record(
     record_id: int,
     db: Session = Depends(get_db),
@@ -124,27 +117,14 @@ def get_radiology_record(
     if not record:
         raise HTTPException(status_code=404, detail="Record not found")
 
-    return {
-        "id": record.id,
-        "record_type": record.record_type,
-        "patient_note": record.patient_note,
-        "created_at": record.created_at.isoformat(),
-        "created_by": record.created_by,
-        "files": [
-            {
-                "id": f.id,
-                "original_filename": f.original_filename,
-                "file_type": f.file_type,
-                "download_url": f"/api/radiology/files/{f.id}",
-            }
-            for f in record.files
-        ],
-    }
+    return _record_out(record)
 
 
 @router.get("/files/{file_id}")
 def download_radiology_file(
     file_id: int,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user),
 ):
@@ -158,10 +138,4 @@ def download_radiology_file(
     if not record:
         raise HTTPException(status_code=404, detail="File not found")
 
-    if not os.path.exists(uploaded_file.stored_path):
-        raise HTTPException(status_code=404, detail="File not found on disk")
-
-    return FileResponse(
-        path=uploaded_file.stored_path,
-        filename=uploaded_file.original_filename,
-    )
+    return blobs.file_response(uploaded_file, range_header, if_none_match)
@@ -1,27 +1,35 @@
 import asyncio
-import json
 import logging
-import os
 import time
-import uuid
-from typing import List
+from typing import AsyncIterator, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from fastapi.responses import FileResponse, StreamingResponse
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session, selectinload, sessionmaker
+from starlette.formparsers import MultiPartException
+from starlette.requests import ClientDisconnect
 
+from app import metrics
 from app.config import settings
 from app.database import get_db
-from app.models import Record, UploadedFile, Translation
+from app.models import PREVIEW_CHARS, Record, UploadedFile, Translation, UpstreamUsage
+from app.responses import sse
 from app.routers.auth import get_current_user
-from app.services.ocr import extract_text_from_image
-from app.services.pdf import extract_from_pdf
+from app.schemas import ReportFileOut, ReportRecordOut, ReportRecordSummary, TranslationOut
+from app.services import admission, blobs, formstream, langid, prefilter, usage
+from app.services.ocr import extract_text_from_image, extract_text_from_images, ocr_batch_size
+from app.services.pdf import count_pages, extract_from_pdf
+from app.services.scheduler import JobContext, job_context
 from app.services.uppermind import translate
+from app.tracing import record_since_request_start, span
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/reports", tags=["reports"])
 
+_background: set[asyncio.Task] = set()  # strong references to status writes left behind by cancelled streams
+
 ALLOWED_EXTENSIONS = {"jpg", "jpeg", "png", "pdf"}
 
 
@@ -29,152 +37,481 @@ def _get_extension(filename: str) -> str:
     return filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
 
 
-@router.post("/upload")
+_UPLOAD_FORM = {
+    "requestBody": {
+        "required": True,
+        "content": {"multipart/form-data": {"schema": {
+            "type": "object",
+            "required": ["files"],
+            "properties": {
+                "files": {"type": "array", "items": {"type": "string", "format": "binary"}},
+                "patient_note": {"type": "string"},
+            },
+        }}},
+    },
+}
+
+
+@router.post("/upload", openapi_extra=_UPLOAD_FORM)
 async def upload_report(
-    files: List[UploadFile] = File(...),
-    patient_note: str = Form(None),
+    request: Request,
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user),
 ):
-    """Upload report files (jpg, jpeg, png, pdf), extract text, and translate."""
-    if not files:
-        raise HTTPException(status_code=400, detail="No files provided")
-
-    # Validate extensions
-    for f in files:
-        ext = _get_extension(f.filename)
-        if ext not in ALLOWED_EXTENSIONS:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Invalid file type: {f.filename}. Allowed: {', '.join(ALLOWED_EXTENSIONS)}",
-            )
-
-    # Create record
+    """Upload report files (jpg, jpeg, png, pdf), extract text, and translate.
+
+    The body is read part by part: each file is stored and handed to OCR as
+    soon as it has arrived, so inference overlaps the transfer of the files
+    behind it.
+    """
+    if not request.headers.get("content-type", "").startswith("multipart/form-data"):
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data body")
+    return await start_report(formstream.parts(request), db, current_user)
+
+
+async def start_report(
+    parts: AsyncIterator[formstream.Part],
+    db: Session,
+    current_user: dict,
+) -> StreamingResponse:
+    """Store the ``files`` of an upload form as they arrive and return the progress event stream.
+
+    Bulk ingest calls this with files it has already read (``formstream.received``).
+    """
     username = current_user.get("username", current_user.get("email", "unknown"))
     token = current_user.get("token", "")
 
-    record = Record(
-        record_type="report",
-        patient_note=patient_note,
-        created_by=username,
-    )
-    db.add(record)
-    db.flush()
-
-    # Save files to disk and DB
-    record_dir = os.path.join(settings.UPLOAD_DIR, "reports", str(record.id))
-    os.makedirs(record_dir, exist_ok=True)
-
-    file_items = []
-    for f in files:
-        ext = _get_extension(f.filename)
-        stored_name = f"{uuid.uuid4().hex}.{ext}"
-        stored_path = os.path.join(record_dir, stored_name)
-
-        content = await f.read()
-        with open(stored_path, "wb") as out:
-            out.write(content)
-
-        uploaded = UploadedFile(
-            record_id=record.id,
-            original_filename=f.filename,
-            stored_path=stored_path,
-            file_type=ext,
-        )
-        db.add(uploaded)
-        db.flush()
-
+    # Each part is stored in a short transaction of its own and results are
+    # written the same way, so no pooled connection stays checked out while
+    # the rest of the body uploads or while the stream runs.
+    new_session = sessionmaker(bind=db.get_bind(), autoflush=False)
+    ticket = admission.current_ticket()
+    batch_size = ocr_batch_size()
+
+    record_id = None
+    patient_note = None
+    body_done = False
+    file_items, ocr_results = [], []
+    image_idx, seen = [], prefilter.Seen()  # prefilter state, grown as photos arrive
+    skip_as_blank, reuse_from = set(), {}
+    arrived = asyncio.Queue()  # file indices in upload order; None once the body is complete
+    ocr_done = asyncio.Queue()  # OCR units once stored; None when the worker stops
+
+    def _job():
+        # Single-page uploads use the scheduler's priority lane; until the body
+        # is complete it is not known whether more files follow
+        single_page = body_done and len(file_items) == 1 and file_items[0]["pages"] <= 1
+        return JobContext(user=username, upload=record_id, small=single_page)
+
+    async def _store(upload):
+        """Save one file to the blob store and DB, then queue it for OCR."""
+        nonlocal record_id
+        ext = _get_extension(upload.filename)
+        # Identical content is stored once. Bytes are stored and read before the
+        # write transaction opens, and nothing is awaited until it commits, so
+        # OCR result writes from the worker never wait on this one
+        with span("upload.write", filename=upload.filename) as s:
+            sha256, size = await blobs.stage_upload(db, upload)
+            content = await upload.read()
+            if s is not None:
+                s.set_attribute("bytes", len(content))
+
+        with new_session() as session:
+            if record_id is None:
+                record = Record(
+                    record_type="report",
+                    patient_note=patient_note,
+                    created_by=username,
+                    status="processing",
+                )
+                session.add(record)
+                session.flush()
+                record_id = record.id
+
+            blobs.adopt(session, sha256, size)
+            uploaded = UploadedFile(
+                record_id=record_id,
+                original_filename=upload.filename,
+                stored_path=blobs.key_for(sha256),
+                blob_sha256=sha256,
+                file_type=ext,
+                status="pending",
+            )
+            session.add(uploaded)
+            session.flush()
+            uploaded_id = uploaded.id
+            with span("db.commit"):
+                session.commit()
+        await upload.close()
+
+        i = len(file_items)
         file_items.append({
-            "uploaded_id": uploaded.id,
-            "filename": f.filename,
+            "uploaded_id": uploaded_id,
+            "sha256": sha256,
+            "filename": upload.filename,
             "ext": ext,
             "content": content,
+            "pages": max(count_pages(content), 1) if ext == "pdf" else 1,
         })
+        ocr_results.append(None)
+        file_status[uploaded_id] = "pending"
+
+        # Count the pages towards the admission backlog until they are OCR'd
+        if ticket is not None:
+            ticket.add_pages(file_items[i]["pages"])
+
+        # Blank photos are not sent to OCR; repeated photos reuse the earlier
+        # text. Each photo is only compared with the ones before it, so the
+        # answer for earlier files does not change as more arrive.
+        if ext in ("jpg", "jpeg", "png"):
+            image_idx.append(i)
+            with span("upload.prefilter", images=len(image_idx)):
+                blank, duplicate_of = await asyncio.to_thread(
+                    lambda: prefilter.compare_last(seen, prefilter.thumbnail_from_image(content))
+                )
+            if blank:
+                skip_as_blank.add(i)
+            if duplicate_of != -1:
+                reuse_from[i] = image_idx[duplicate_of]
+        arrived.put_nowait(i)
+
+    async def _ocr_worker():
+        """OCR files in upload order while later parts are still arriving.
+
+        Consecutive photos that still need OCR share one vision request when the
+        model batches; a batch is sent once it is full or the photos stop.
+        """
+        run = []
+        try:
+            while (i := await arrived.get()) is not None:
+                if batch_size > 1 and i in image_idx and i not in skip_as_blank and i not in reuse_from:
+                    run.append(i)
+                    if len(run) == batch_size:
+                        await _ocr(run)
+                        run = []
+                    continue
+                if run:
+                    await _ocr(run)
+                    run = []
+                await _ocr([i])
+            if run:
+                await _ocr(run)
+        finally:
+            ocr_done.put_nowait(None)
+
+    async def _ocr(unit):
+        names = ", ".join(file_items[i]["filename"] for i in unit)
+        start = time.monotonic()
+        with usage.metering() as unit_usage:
+            try:
+                with job_context(_job()), span("ocr", filename=names, file_type=file_items[unit[0]]["ext"]):
+                    texts = await _ocr_unit(unit, ocr_results)
+                failed = False
+            except Exception as exc:
+                logger.exception("OCR failed for file %s", names)
+                texts = [f"[OCR error: {repr(exc)}]"] * len(unit)
+                failed = True
+        duration_ms = int((time.monotonic() - start) * 1000 / len(unit))
+        for i, text in zip(unit, texts):
+            file_usage = usage.UsageMeter()
+            file_usage.add(unit_usage, share=1 / len(unit))
+            ocr_results[i] = {"text": text, "failed": failed, "duration_ms": duration_ms, "usage": file_usage}
+            file_items[i]["content"] = None  # only the text is needed from here on
+            if ticket is not None:
+                ticket.pages_done(file_items[i]["pages"], duration_ms / 1000)
+        # Not abandoned half-way when the worker is cancelled: a rejected upload
+        # deletes its record right after, and must not race this transaction
+        save = asyncio.ensure_future(asyncio.to_thread(_save_ocr, unit, ocr_results))
+        try:
+            await asyncio.shield(save)
+        except asyncio.CancelledError:
+            await save
+            raise
+        ocr_done.put_nowait(unit)
+
+    async def _ocr_unit(unit, ocr_results):
+        if len(unit) > 1:
+            return await extract_text_from_images([file_items[i]["content"] for i in unit])
+        i = unit[0]
+        item = file_items[i]
+        if i in skip_as_blank:
+            metrics.inc("ocr_calls_avoided", reason="blank")
+            return [""]
+        if i in reuse_from and not ocr_results[reuse_from[i]]["failed"]:
+            metrics.inc("ocr_calls_avoided", reason="duplicate")
+            return [ocr_results[reuse_from[i]]["text"]]
+        if item["ext"] in ("jpg", "jpeg", "png"):
+            return [await extract_text_from_image(item["content"])]
+        if item["ext"] == "pdf":
+            return [await extract_from_pdf(item["content"])]
+        return [""]
+
+    file_status, translation_ids = {}, {}
+
+    def _write(fn):
+        """Run ``fn(session)`` in a transaction of its own."""
+        with new_session() as session:
+            fn(session)
+            with span("db.commit"):
+                session.commit()
+
+    def _set_status(session, statuses):
+        file_status.update(statuses)
+        session.execute(update(UploadedFile), [{"id": fid, "status": st} for fid, st in statuses.items()])
+
+    def _save_ocr(indices, ocr_results):
+        """Insert the Translation rows of files whose OCR just finished."""
+        def fn(session):
+            ids = session.scalars(
+                insert(Translation).returning(Translation.id, sort_by_parameter_order=True),
+                [
+                    {
+                        "file_id": file_items[i]["uploaded_id"],
+                        "original_text": ocr_results[i]["text"],
+                        "translated_text": "",
+                        "translated_preview": "",
+                        "ocr_duration_ms": ocr_results[i]["duration_ms"],
+                        # No model for a failed OCR, so reprocessing still picks the file up
+                        "ocr_model": None if ocr_results[i]["failed"] else settings.OLLAMA_MODEL,
+                        "translator_agent_id": settings.TRANSLATOR_AGENT_ID,
+                    }
+                    for i in indices
+                ],
+            ).all()
+            translation_ids.update(zip(indices, ids))
+            rows = [
+                {**row, "translation_id": translation_ids[i]}
+                for i in indices for row in usage.rows(ocr_results[i]["usage"])
+            ]
+            if rows:
+                session.execute(insert(UpstreamUsage), rows)
+            _set_status(session, {
+                file_items[i]["uploaded_id"]: "failed" if ocr_results[i]["failed"] else "ocr" for i in indices
+            })
+        _write(fn)
+
+    def _save_translated(indices, translate_results):
+        """Store finished translations (or pass-through text) on their Translation rows."""
+        def fn(session):
+            session.execute(update(Translation), [
+                {
+                    "id": translation_ids[i],
+                    "translated_text": translate_results[i]["text"],
+                    "translated_preview": translate_results[i]["text"][:PREVIEW_CHARS],
+                    "translation_duration_ms": translate_results[i]["duration_ms"],
+                    "translation_calls_skipped": translate_results[i]["calls_skipped"],
+                }
+                for i in indices
+            ])
+            rows = [
+                {**row, "translation_id": translation_ids[i]}
+                for i in indices for row in usage.rows(translate_results[i]["usage"])
+            ]
+            if rows:
+                session.execute(insert(UpstreamUsage), rows)
+            _set_status(session, {
+                file_items[i]["uploaded_id"]: "failed" if translate_results[i]["failed"] else "translated"
+                for i in indices
+            })
+        _write(fn)
+
+    def _finish(status):
+        _write(lambda session: session.execute(
+            update(Record).where(Record.id == record_id).values(status=status)
+        ))
+
+    def _abort(ocr_results, pending_translations):
+        """Client went away: keep partial results and account for the GPU work skipped."""
+        ocr_skipped = sum(item["pages"] for i, item in enumerate(file_items) if ocr_results[i] is None)
+        saved_s = (
+            ocr_skipped * admission.controller.ocr_seconds_per_page
+            + pending_translations * admission.controller.translate_seconds
+        )
+        metrics.inc("uploads_aborted")
+        metrics.inc("gpu_seconds_saved", saved_s)
+        logger.info(
+            "Client disconnected from record %s: skipped %d OCR pages and %d translations (~%.1f GPU seconds)",
+            record_id, ocr_skipped, pending_translations, saved_s,
+        )
 
-    db.commit()
-
-    # Capture record attributes before stream (session may close)
-    record_id = record.id
-    record_type = record.record_type
-    record_patient_note = record.patient_note
-    record_created_at = record.created_at.isoformat()
-    record_created_by = record.created_by
+    async def _finish_aborted():
+        # Finished files are already stored; only the record's status is left
+        try:
+            await asyncio.to_thread(_finish, "aborted")
+        except Exception:
+            logger.exception("Failed to mark record %s as aborted", record_id)
+
+    async def _reject(detail):
+        """Stop OCR and drop what was stored of an upload that cannot be accepted."""
+        worker.cancel()
+        await asyncio.wait([worker])
+        if record_id is not None:
+            def fn(session):
+                session.delete(session.get(Record, record_id))
+            await asyncio.to_thread(_write, fn)
+        raise HTTPException(status_code=400, detail=detail)
+
+    worker = asyncio.create_task(_ocr_worker())
+    try:
+        async for name, value, last in parts:
+            if isinstance(value, str):
+                if name == "patient_note":
+                    patient_note = value
+                    if record_id is not None:  # sent after the files
+                        await asyncio.to_thread(_write, lambda session: session.execute(
+                            update(Record).where(Record.id == record_id).values(patient_note=value)
+                        ))
+                continue
+            if name != "files":
+                await value.close()
+                continue
+            if _get_extension(value.filename or "") not in ALLOWED_EXTENSIONS:
+                await value.close()
+                await _reject(f"Invalid file type: {value.filename}. Allowed: {', '.join(ALLOWED_EXTENSIONS)}")
+            body_done = last
+            await _store(value)
+    except MultiPartException as exc:
+        await _reject(str(exc))
+    except ClientDisconnect:
+        if record_id is None:
+            await _reject("There was an error parsing the body")
+        # Like a disconnect during the stream: keep what was stored, skip the rest
+        worker.cancel()
+        _abort(ocr_results, 0)
+        await _finish_aborted()
+        raise HTTPException(status_code=400, detail="There was an error parsing the body")
+    except BaseException:
+        worker.cancel()
+        raise
+    body_done = True
+    arrived.put_nowait(None)
+    record_since_request_start("request.parse", file_count=len(file_items))
+    if not file_items:
+        await _reject("No files provided")
 
     async def _process_stream():
         total = len(file_items)
-        ocr_results = [None] * total
-
-        # Phase 1 - OCR (sequential)
-        for i, item in enumerate(file_items):
-            start = time.monotonic()
-            try:
-                if item["ext"] in ("jpg", "jpeg", "png"):
-                    text = await extract_text_from_image(item["content"])
-                elif item["ext"] == "pdf":
-                    text = await extract_from_pdf(item["content"])
+        job = _job()
+        translate_results = [
+            {"text": "", "duration_ms": 0, "calls_skipped": 0, "usage": None, "failed": False} for _ in range(total)
+        ]
+        tasks = []
+
+        try:
+            # Phase 1 - OCR (sequential, under way since the first file arrived).
+            # The stream only starts once the body is complete (browsers' fetch
+            # is half-duplex), so there are no per-part upload events
+            while (unit := await ocr_done.get()) is not None:
+                for i in unit:
+                    yield sse({'phase': 'ocr', 'done': i + 1, 'total': total})
+            await worker  # re-raises whatever stopped it early
+
+            # Phase 2 - Translation (parallel, bounded by the shared adaptive limiter)
+            progress_queue = asyncio.Queue()
+            candidates = [i for i in range(total) if not ocr_results[i]["failed"] and ocr_results[i]["text"].strip()]
+            with span("langid", files=len(candidates)):
+                plans = {
+                    i: langid.plan(ocr_results[i]["text"]) if settings.LANGID_SKIP_TURKISH
+                    else [(ocr_results[i]["text"], True)]
+                    for i in candidates
+                }
+            translatable = []
+            for i in candidates:
+                skipped = sum(1 for piece, foreign in plans[i] if not foreign and piece.strip())
+                translate_results[i]["calls_skipped"] = skipped
+                if skipped:
+                    metrics.inc("translation_calls_skipped", skipped)
+                if any(foreign for _, foreign in plans[i]):
+                    translatable.append(i)
                 else:
-                    text = ""
-                ocr_results[i] = {"text": text, "failed": False, "duration_ms": int((time.monotonic() - start) * 1000)}
-            except Exception as exc:
-                logger.exception("OCR failed for file %s", item["filename"])
-                ocr_results[i] = {"text": f"[OCR error: {repr(exc)}]", "failed": True, "duration_ms": int((time.monotonic() - start) * 1000)}
-            yield f"data: {json.dumps({'phase': 'ocr', 'done': i + 1, 'total': total})}\n\n"
-
-        # Phase 2 - Translation (parallel, max 4)
-        semaphore = asyncio.Semaphore(4)
-        progress_queue = asyncio.Queue()
-        translatable = [i for i in range(total) if not ocr_results[i]["failed"] and ocr_results[i]["text"].strip()]
-        translate_total = len(translatable)
-        translate_results = [{"text": "", "duration_ms": 0} for _ in range(total)]
-
-        if translate_total > 0:
-            async def translate_task(idx):
-                async with semaphore:
+                    translate_results[i]["text"] = ocr_results[i]["text"]  # already Turkish
+            translate_total = len(translatable)
+
+            # Blank and all-Turkish files are done without a translation call
+            settled = [i for i in range(total) if not ocr_results[i]["failed"] and i not in translatable]
+            if settled:
+                await asyncio.to_thread(_save_translated, settled, translate_results)
+
+            if translate_total > 0:
+                async def translate_task(idx):
                     start = time.monotonic()
                     try:
-                        text = await translate(ocr_results[idx]["text"], token)
+                        with span("translate", filename=file_items[idx]["filename"]), \
+                                usage.metering() as translate_usage:
+                            translate_results[idx]["usage"] = translate_usage
+                            pieces = plans[idx]
+                            translated = iter(await asyncio.gather(
+                                *(translate(piece, token) for piece, foreign in pieces if foreign)
+                            ))
+                            text = "".join(next(translated) if foreign else piece for piece, foreign in pieces)
                     except Exception as exc:
                         text = f"[Translation error: {repr(exc)}]"
-                    translate_results[idx] = {"text": text, "duration_ms": int((time.monotonic() - start) * 1000)}
-                await progress_queue.put(idx)
-
-            tasks = [asyncio.create_task(translate_task(i)) for i in translatable]
-            for done_count in range(1, translate_total + 1):
-                await progress_queue.get()
-                yield f"data: {json.dumps({'phase': 'translation', 'done': done_count, 'total': translate_total})}\n\n"
-            await asyncio.gather(*tasks)
-
-        # Phase 3 - DB save + final event
-        result_files = []
-        for i, item in enumerate(file_items):
-            t = Translation(
-                file_id=item["uploaded_id"],
-                original_text=ocr_results[i]["text"],
-                translated_text=translate_results[i]["text"],
-                ocr_duration_ms=ocr_results[i]["duration_ms"],
-                translation_duration_ms=translate_results[i]["duration_ms"],
-            )
-            db.add(t)
-            result_files.append({
-                "id": item["uploaded_id"],
-                "original_filename": item["filename"],
-                "file_type": item["ext"],
-                "download_url": f"/api/reports/files/{item['uploaded_id']}",
-                "translation": {
-                    "original_text": ocr_results[i]["text"],
-                    "translated_text": translate_results[i]["text"],
-                    "ocr_duration_ms": ocr_results[i]["duration_ms"],
-                    "translation_duration_ms": translate_results[i]["duration_ms"],
-                },
-            })
-        db.commit()
-
-        yield f"data: {json.dumps({'phase': 'complete', 'result': {'id': record_id, 'record_type': record_type, 'patient_note': record_patient_note, 'created_at': record_created_at, 'created_by': record_created_by, 'files': result_files}})}\n\n"
-
-    return StreamingResponse(_process_stream(), media_type="text/event-stream")
+                        translate_results[idx]["failed"] = True
+                    else:
+                        admission.controller.record_translation(time.monotonic() - start)
+                    translate_results[idx].update(text=text, duration_ms=int((time.monotonic() - start) * 1000))
+                    await progress_queue.put(idx)
+
+                with job_context(job):
+                    tasks = [asyncio.create_task(translate_task(i)) for i in translatable]
+                done_count = 0
+                while done_count < translate_total:
+                    # Store every translation that finished meanwhile in one transaction
+                    finished = [await progress_queue.get()]
+                    while not progress_queue.empty():
+                        finished.append(progress_queue.get_nowait())
+                    await asyncio.to_thread(_save_translated, finished, translate_results)
+                    for i in finished:
+                        ocr_results[i]["text"] = translate_results[i]["text"] = None
+                        done_count += 1
+                        yield sse({'phase': 'translation', 'done': done_count, 'total': translate_total})
+                await asyncio.gather(*tasks)
+        except (asyncio.CancelledError, GeneratorExit):
+            # Starlette cancels the stream when the client disconnects; stop the
+            # translations still queued or running so they don't burn GPU time.
+            worker.cancel()
+            pending = [t for t in tasks if not t.done()]
+            for t in pending:
+                t.cancel()
+            _abort(ocr_results, len(pending))
+            # A cancelled stream cannot await any more; the status is written in a
+            # thread, where the cancelled worker's last OCR write only delays it
+            task = asyncio.ensure_future(_finish_aborted())
+            _background.add(task)
+            task.add_done_callback(_background.discard)
+            raise
+        except Exception:
+            # Anything else (a failed write, an OCR worker that died) would leave
+            # the record "processing" forever; stored results are kept
+            logger.exception("Processing record %s failed", record_id)
+            worker.cancel()
+            for t in tasks:
+                t.cancel()
+            metrics.inc("uploads_failed")
+            try:
+                await asyncio.to_thread(_finish, "failed")
+            except Exception:
+                logger.exception("Failed to mark record %s as failed", record_id)
+            raise
+
+        # Every file is stored already; the final event only carries ids and statuses
+        await asyncio.to_thread(_finish, "complete")
+        result = {
+            "id": record_id,
+            "status": "complete",
+            "files": [
+                {"id": item["uploaded_id"], "status": file_status[item["uploaded_id"]], "translation_id": translation_ids.get(i)}
+                for i, item in enumerate(file_items)
+            ],
+        }
+        yield sse({'phase': 'complete', 'result': result})
+
+    return StreamingResponse(
+        _process_stream(), media_type="text/event-stream", headers={"X-Record-Id": str(record_id)}
+    )
 
 
-@router.get("/records")
+@router.get("/records", response_model=list[ReportRecordSummary])
 def list_report_records(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user),
@@ -186,63 +523,82 @@ def list_report_records(
         # Get a preview from the first file's translation
         translation_preview = ""
         if r.files and r.files[0].translations:
-            preview_text = r.files[0].translations[0].translated_text
-            translation_preview = preview_text[:200] if preview_text else ""
-
-        result.append({
-            "id": r.id,
-            "patient_note": r.patient_note,
-            "created_at": r.created_at.isoformat(),
-            "created_by": r.created_by,
-            "file_count": len(r.files),
-            "translation_preview": translation_preview,
-        })
+            t = r.files[0].translations[0]
+            preview_text = t.translated_preview if t.translated_preview is not None else t.translated_text
+            translation_preview = preview_text[:PREVIEW_CHARS] if preview_text else ""
+
+        result.append(ReportRecordSummary(
+            id=r.id,
+            patient_note=r.patient_note,
+            created_at=r.created_at,
+            created_by=r.created_by,
+            file_count=len(r.files),
+            status=r.status,
+            translation_preview=translation_preview,
+        ))
     return result
 
 
-@router.get("/records/{record_id}")
+@router.get("/records/{record_id}", response_model=ReportRecordOut)
 def get_report_record(
     record_id: int,
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user),
 ):
     """Get a single report record with files and full translations."""
-    record = db.query(Record).filter(Record.id == record_id, Record.record_type == "report").first()
+    record = (
+        db.query(Record)
+        .options(
+            selectinload(Record.files).selectinload(UploadedFile.translations)
+            .undefer(Translation.original_text).undefer(Translation.translated_text)
+        )
+        .filter(Record.id == record_id, Record.record_type == "report")
+        .first()
+    )
     if not record:
         raise HTTPException(status_code=404, detail="Record not found")
 
-    return {
-        "id": record.id,
-        "record_type": record.record_type,
-        "patient_note": record.patient_note,
-        "created_at": record.created_at.isoformat(),
-        "created_by": record.created_by,
-        "files": [
-            {
-                "id": f.id,
-                "original_filename": f.original_filename,
-                "file_type": f.file_type,
-                "download_url": f"/api/reports/files/{f.id}",
-                "translations": [
-                    {
-                        "id": t.id,
-                        "original_text": t.original_text,
-                        "translated_text": t.translated_text,
-                        "ocr_duration_ms": t.ocr_duration_ms,
-                        "translation_duration_ms": t.translation_duration_ms,
-                        "created_at": t.created_at.isoformat(),
-                    }
+    return ReportRecordOut(
+        id=record.id,
+        record_type=record.record_type,
+        patient_note=record.patient_note,
+        created_at=record.created_at,
+        created_by=record.created_by,
+        status=record.status,
+        files=[
+            ReportFileOut(
+                id=f.id,
+                original_filename=f.original_filename,
+                file_type=f.file_type,
+                sha256=f.blob_sha256,
+                status=f.status,
+                download_url=f"/api/reports/files/{f.id}",
+                translations=[
+                    TranslationOut(
+                        id=t.id,
+                        original_text=t.original_text,
+                        translated_text=t.translated_text,
+                        ocr_duration_ms=t.ocr_duration_ms,
+                        translation_duration_ms=t.translation_duration_ms,
+                        translation_calls_skipped=t.translation_calls_skipped,
+                        version=t.version,
+                        ocr_model=t.ocr_model,
+                        translator_agent_id=t.translator_agent_id,
+                        created_at=t.created_at,
+                    )
                     for t in f.translations
                 ],
-            }
+            )
             for f in record.files
         ],
-    }
+    )
 
 
 @router.get("/files/{file_id}")
 def download_report_file(
     file_id: int,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user),
 ):
@@ -256,10 +612,4 @@ def download_report_file(
     if not record:
         raise HTTPException(status_code=404, detail="File not found")
 
-    if not os.path.exists(uploaded_file.stored_path):
-        raise HTTPException(status_code=404, detail="File not found on disk")
-
-    return FileResponse(
-        path=uploaded_file.stored_path,
-        filename=uploaded_file.original_filename,
-    )
+    return blobs.file_response(uploaded_file, range_header, if_none_match)
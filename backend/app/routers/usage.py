@@ -0,0 +1,75 @@
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.models import Record, UploadedFile, Translation, UpstreamUsage
+from app.routers.auth import get_current_user
+
+router = APIRouter(prefix="/usage", tags=["usage"])
+
+GROUPINGS = {
+    "day": func.date(Translation.created_at),
+    "user": Record.created_by,
+    "record": Record.id,
+}
+
+
+@router.get("")
+def get_usage(
+    group_by: str = "day",
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user),
+):
+    """Sum upstream tokens and GPU time per day, user or record, split by stage and model.
+
+    ``since`` and ``until`` are inclusive dates on the translation's creation time.
+    """
+    if group_by not in GROUPINGS:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of: {', '.join(GROUPINGS)}")
+    key = GROUPINGS[group_by]
+
+    query = (
+        db.query(
+            key.label("key"),
+            UpstreamUsage.stage,
+            UpstreamUsage.model,
+            func.count(func.distinct(UpstreamUsage.translation_id)).label("files"),
+            func.sum(UpstreamUsage.requests).label("requests"),
+            func.sum(UpstreamUsage.prompt_tokens).label("prompt_tokens"),
+            func.sum(UpstreamUsage.output_tokens).label("output_tokens"),
+            func.sum(UpstreamUsage.gpu_ms).label("gpu_ms"),
+            func.sum(UpstreamUsage.load_ms).label("load_ms"),
+        )
+        .join(Translation, UpstreamUsage.translation_id == Translation.id)
+        .join(UploadedFile, Translation.file_id == UploadedFile.id)
+        .join(Record, UploadedFile.record_id == Record.id)
+    )
+    if since is not None:
+        query = query.filter(Translation.created_at >= datetime.combine(since, datetime.min.time()))
+    if until is not None:
+        query = query.filter(Translation.created_at < datetime.combine(until + timedelta(days=1), datetime.min.time()))
+    rows = query.group_by(key, UpstreamUsage.stage, UpstreamUsage.model).order_by(key, UpstreamUsage.stage).all()
+
+    return {
+        "group_by": group_by,
+        "rows": [
+            {
+                group_by: row.key,
+                "stage": row.stage,
+                "model": row.model,
+                "files": row.files,
+                "requests": round(row.requests or 0, 2),
+                "prompt_tokens": row.prompt_tokens or 0,
+                "output_tokens": row.output_tokens or 0,
+                "gpu_seconds": round((row.gpu_ms or 0) / 1000, 3),
+                "load_seconds": round((row.load_ms or 0) / 1000, 3),
+            }
+            for row in rows
+        ],
+    }
@@ -0,0 +1,65 @@
+"""Response models of the record endpoints.
+
+They document the API and let FastAPI serialize responses with
+pydantic-core instead of walking plain dicts with ``jsonable_encoder``.
+"""
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class RecordSummary(BaseModel):
+    id: int
+    patient_note: Optional[str]
+    created_at: datetime
+    created_by: str
+    file_count: int
+
+
+class ReportRecordSummary(RecordSummary):
+    status: str
+    translation_preview: str
+
+
+class TranslationOut(BaseModel):
+    id: int
+    original_text: str
+    translated_text: str
+    ocr_duration_ms: Optional[int]
+    translation_duration_ms: Optional[int]
+    translation_calls_skipped: int
+    version: int
+    ocr_model: Optional[str]
+    translator_agent_id: Optional[int]
+    created_at: datetime
+
+
+class FileOut(BaseModel):
+    id: int
+    original_filename: str
+    file_type: str
+    sha256: Optional[str]
+    download_url: str
+
+
+class ReportFileOut(FileOut):
+    status: Optional[str]
+    translations: list[TranslationOut]
+
+
+class RecordOut(BaseModel):
+    id: int
+    record_type: str
+    patient_note: Optional[str]
+    created_at: datetime
+    created_by: str
+
+
+class RadiologyRecordOut(RecordOut):
+    files: list[FileOut]
+
+
+class ReportRecordOut(RecordOut):
+    status: str
+    files: list[ReportFileOut]
@@ -0,0 +1,161 @@
+import contextvars
+import json
+import logging
+import math
+from typing import Optional
+
+from app import metrics
+from app.config import settings
+from app.services.ocr import ocr_scheduler
+from app.services.uppermind import translation_limiter, translation_scheduler
+
+logger = logging.getLogger(__name__)
+
+
+class Ticket:
+    """Resources held by one admitted request; released when the response ends."""
+
+    def __init__(self, controller: "AdmissionController", nbytes: int):
+        self.controller = controller
+        self.bytes = nbytes
+        self.pages = 0
+
+    def add_pages(self, n: int) -> None:
+        self.pages += n
+        self.controller.pending_pages += n
+
+    def pages_done(self, n: int, seconds: Optional[float] = None) -> None:
+        n = min(n, self.pages)
+        self.pages -= n
+        self.controller.pending_pages -= n
+        if seconds is not None and n > 0:
+            self.controller.record_ocr(seconds / n)
+
+
+_current_ticket: contextvars.ContextVar[Optional[Ticket]] = contextvars.ContextVar("admission_ticket", default=None)
+
+
+def current_ticket() -> Optional[Ticket]:
+    return _current_ticket.get()
+
+
+class AdmissionController:
+    """Tracks outstanding GPU work and decides whether a new upload may start.
+
+    Three signals are checked against configurable limits: pages accepted but
+    not yet OCR'd, upload bytes held by requests still being processed, and
+    OCR/translation jobs queued or running. ``Retry-After`` is estimated from
+    the observed OCR time per page and the current translation limit.
+    """
+
+    def __init__(self):
+        self.pending_pages = 0
+        self.in_flight_bytes = 0
+        self.ocr_seconds_per_page = 5.0  # EWMA, seeded with a conservative guess
+        self.translate_seconds = 10.0
+
+        metrics.register_gauge("admission_pending_pages", lambda: self.pending_pages)
+        metrics.register_gauge("admission_in_flight_bytes", lambda: self.in_flight_bytes)
+        metrics.register_gauge("admission_gpu_jobs", self.gpu_jobs)
+
+    def record_ocr(self, seconds_per_page: float) -> None:
+        self.ocr_seconds_per_page += 0.2 * (seconds_per_page - self.ocr_seconds_per_page)
+
+    def record_translation(self, seconds: float) -> None:
+        self.translate_seconds += 0.2 * (seconds - self.translate_seconds)
+
+    def gpu_jobs(self) -> int:
+        return (
+            ocr_scheduler.queued + ocr_scheduler.in_flight
+            + translation_scheduler.queued + translation_scheduler.in_flight
+        )
+
+    def check(self, content_length: int) -> tuple[Optional[str], int]:
+        """Return ``(reason, retry_after_seconds)``; ``reason`` is None when admitted."""
+        ocr_rate = max(settings.OCR_CONCURRENCY, 1) / max(self.ocr_seconds_per_page, 0.01)  # pages/s
+
+        excess_pages = self.pending_pages - settings.ADMISSION_MAX_QUEUED_PAGES
+        if excess_pages >= 0:
+            return "queued_pages", self._clamp((excess_pages + 1) / ocr_rate)
+
+        gpu_jobs = self.gpu_jobs()
+        excess_jobs = gpu_jobs - settings.ADMISSION_MAX_GPU_JOBS
+        if excess_jobs >= 0:
+            translate_rate = max(int(translation_limiter.limit), 1) / max(self.translate_seconds, 0.01)
+            return "gpu_jobs", self._clamp((excess_jobs + 1) / (ocr_rate + translate_rate))
+
+        max_bytes = settings.ADMISSION_MAX_INFLIGHT_MB * 1024 * 1024
+        if self.in_flight_bytes > 0 and self.in_flight_bytes + content_length > max_bytes:
+            # Bytes are freed as uploads finish: assume the pending pages drain first
+            return "in_flight_bytes", self._clamp(self.pending_pages / ocr_rate)
+
+        return None, 0
+
+    @staticmethod
+    def _clamp(seconds: float) -> int:
+        return int(min(max(math.ceil(seconds), 1), settings.ADMISSION_MAX_RETRY_AFTER))
+
+    def admit(self, content_length: int) -> Ticket:
+        self.in_flight_bytes += content_length
+        return Ticket(self, content_length)
+
+    def release(self, ticket: Ticket) -> None:
+        self.in_flight_bytes -= ticket.bytes
+        self.pending_pages -= ticket.pages
+        ticket.bytes = ticket.pages = 0
+
+
+controller = AdmissionController()
+
+
+class AdmissionMiddleware:
+    """Reject uploads with 503 + Retry-After while the GPU backlog is over its limits.
+
+    The decision is made from the request headers alone, before any of the
+    body is received, so rejected uploads never occupy memory.
+    """
+
+    def __init__(self, app, paths: tuple = ("/api/reports/upload",)):
+        self.app = app
+        self.paths = set(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = 0
+        for key, value in scope.get("headers", []):
+            if key == b"content-length":
+                try:
+                    content_length = int(value)
+                except ValueError:
+                    pass
+                break
+
+        reason, retry_after = controller.check(content_length)
+        if reason is not None:
+            metrics.inc("admission_rejected", reason=reason)
+            logger.warning("Upload rejected (%s), Retry-After %ss", reason, retry_after)
+            body = json.dumps({"detail": "Server is busy processing other reports, please retry later"}).encode()
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(retry_after).encode()),
+                    (b"connection", b"close"),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        metrics.inc("admission_accepted")
+        ticket = controller.admit(content_length)
+        token = _current_ticket.set(ticket)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current_ticket.reset(token)
+            controller.release(ticket)
@@ -0,0 +1,353 @@
+"""Content-addressed storage for uploaded files.
+
+Uploads are stored once per distinct content under the storage key
+``blobs/<sha[0:2]>/<sha[2:4]>/<sha256>`` of the configured backend (see
+``app.services.storage``). Each ``UploadedFile`` points at its ``Blob`` row,
+whose ``ref_count`` the model hooks keep in step with those rows.
+
+``collect_garbage`` removes blobs nobody references any more and objects left
+behind by uploads that never committed, in both cases only after
+``BLOB_GC_GRACE_S`` so an upload that is re-using a blob right now keeps it.
+
+``python -m app.services.blobs migrate`` moves files stored before the blob
+store into it, and with ``--from local`` copies local blobs to the
+configured backend (e.g. when switching to S3).
+"""
+import argparse
+import asyncio
+import hashlib
+import io
+import logging
+import mimetypes
+import os
+import re
+import time
+from datetime import datetime, timedelta
+from typing import BinaryIO, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import FileResponse, RedirectResponse, Response, StreamingResponse
+from sqlalchemy import delete
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app import metrics
+from app.config import settings
+from app.models import Blob, UploadedFile
+from app.services import storage
+from app.services.storage import CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "blobs"
+
+
+def key_for(sha256: str) -> str:
+    return f"{PREFIX}/{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+
+def adopt(db: Session, sha256: str, size: int) -> None:
+    """Create the blob's row or touch it, in the caller's transaction.
+
+    Touching happens before the object is checked, so garbage collection
+    cannot drop a blob an upload is adopting.
+    """
+    now = datetime.utcnow()
+    db.execute(
+        sqlite_insert(Blob)
+        .values(sha256=sha256, size=size, ref_count=0, created_at=now, last_used_at=now)
+        .on_conflict_do_update(index_elements=[Blob.sha256], set_={"last_used_at": now})
+    )
+
+
+def _touch(bind, sha256: str, size: int) -> None:
+    with Session(bind) as db:
+        adopt(db, sha256, size)
+        db.commit()
+
+
+def _store(sha256: str, size: int, stream: BinaryIO) -> None:
+    store, key = storage.backend(), key_for(sha256)
+    if store.exists(key):
+        # Refresh the timestamp so the orphan sweep leaves it alone while its row commits
+        store.touch(key)
+        metrics.inc("blob_dedup_hits")
+        metrics.inc("blob_bytes_deduplicated", size)
+        return
+    store.write(key, stream)
+    metrics.inc("blob_writes", backend=store.name)
+    metrics.inc("blob_bytes_written", size, backend=store.name)
+
+
+def _hash_stream(stream: BinaryIO) -> tuple[str, int]:
+    digest, size = hashlib.sha256(), 0
+    while chunk := stream.read(CHUNK_SIZE):
+        digest.update(chunk)
+        size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def put(db: Session, content: bytes) -> Blob:
+    """Store ``content`` and return its ``Blob`` row, created or re-used.
+
+    The caller's ``UploadedFile`` insert adds the reference.
+    """
+    sha256 = hashlib.sha256(content).hexdigest()
+    adopt(db, sha256, len(content))
+    _store(sha256, len(content), io.BytesIO(content))
+    return db.get(Blob, sha256, populate_existing=True)
+
+
+async def stage_upload(db: Session, upload) -> tuple[str, int]:
+    """Store a FastAPI ``UploadFile`` ahead of the row that references it; returns ``(sha256, size)``.
+
+    Hashing and the (possibly remote, multipart) write run in worker threads,
+    streamed from the spool file. The blob's row is touched in a short
+    transaction of its own first, so garbage collection leaves the object
+    alone for ``BLOB_GC_GRACE_S``; ``db``'s own transaction is not used. The
+    caller then calls ``adopt`` and inserts its ``UploadedFile`` and commits
+    without awaiting in between: an SQLite write transaction held across an
+    await blocks every other writer on the event loop.
+    """
+    await upload.seek(0)
+    sha256, size = await asyncio.to_thread(_hash_stream, upload.file)
+    await asyncio.to_thread(_touch, db.get_bind(), sha256, size)
+    await upload.seek(0)
+    await asyncio.to_thread(_store, sha256, size, upload.file)
+    await upload.seek(0)
+    return sha256, size
+
+
+def read(uploaded_file: UploadedFile) -> bytes:
+    """The stored bytes of a file; raises FileNotFoundError if they are gone."""
+    if not uploaded_file.blob_sha256:
+        with open(uploaded_file.stored_path, "rb") as f:  # stored before the blob store
+            return f.read()
+    store, key = storage.backend(), key_for(uploaded_file.blob_sha256)
+    if not store.exists(key):
+        raise FileNotFoundError(key)
+    return store.read(key)
+
+
+def etag(uploaded_file: UploadedFile) -> Optional[str]:
+    """Strong ETag for a stored file (its content hash), None for pre-blob files."""
+    return f'"{uploaded_file.blob_sha256}"' if uploaded_file.blob_sha256 else None
+
+
+def _byte_range(header: Optional[str], size: int):
+    """``(start, end)`` for a single-range ``Range`` header, None to send everything, or "unsatisfiable"."""
+    match = re.fullmatch(r"\s*bytes=(\d*)-(\d*)\s*", header or "")
+    if not match or match.groups() == ("", ""):
+        return None  # absent, malformed or multi-range: a full response is allowed
+    first, last = match.groups()
+    if first:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    else:
+        start, end = max(size - int(last), 0), size - 1
+    if start >= size or start > end:
+        return "unsatisfiable"
+    return start, end
+
+
+def file_response(uploaded_file: UploadedFile, range_header: Optional[str] = None,
+                  if_none_match: Optional[str] = None) -> Response:
+    """Download response for a stored file: 304 on a matching ETag, a redirect
+    to a presigned URL when the backend offers one, otherwise the bytes
+    proxied from storage (honouring a single ``Range``)."""
+    filename = uploaded_file.original_filename
+    if not uploaded_file.blob_sha256:
+        # Stored before the blob store: a path on this host's disk
+        if not os.path.exists(uploaded_file.stored_path):
+            raise HTTPException(status_code=404, detail="File not found on disk")
+        return FileResponse(path=uploaded_file.stored_path, filename=filename)
+
+    # Stored files never change, so the content hash is a strong validator
+    tag = etag(uploaded_file)
+    headers = {"ETag": tag, "Cache-Control": "private, max-age=31536000, immutable"}
+    if if_none_match and tag in {t.strip() for t in if_none_match.split(",")}:
+        return Response(status_code=304, headers=headers)
+
+    store, key = storage.backend(), key_for(uploaded_file.blob_sha256)
+    url = store.presigned_url(key, filename)
+    if url:
+        metrics.inc("blob_downloads", mode="presigned")
+        return RedirectResponse(url, status_code=307, headers={"Cache-Control": "no-store"})
+
+    try:
+        size = store.size(key)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File not found in storage")
+
+    headers.update({
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": storage.attachment(filename),
+    })
+    media_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    byte_range = _byte_range(range_header, size)
+    if byte_range == "unsatisfiable":
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+    metrics.inc("blob_downloads", mode="proxied")
+    if byte_range is None:
+        if size == 0:
+            return Response(b"", media_type=media_type, headers=headers)
+        return StreamingResponse(
+            store.iter_range(key, 0, size - 1), media_type=media_type,
+            headers={**headers, "Content-Length": str(size)},
+        )
+    start, end = byte_range
+    return StreamingResponse(
+        store.iter_range(key, start, end), status_code=206, media_type=media_type,
+        headers={**headers, "Content-Length": str(end - start + 1), "Content-Range": f"bytes {start}-{end}/{size}"},
+    )
+
+
+def collect_garbage(db: Session, grace_s: Optional[float] = None) -> dict:
+    """Delete unreferenced blobs and orphaned objects older than the grace period."""
+    grace_s = settings.BLOB_GC_GRACE_S if grace_s is None else grace_s
+    cutoff = datetime.utcnow() - timedelta(seconds=grace_s)
+    store = storage.backend()
+    removed = orphans = 0
+
+    candidates = db.query(Blob.sha256).filter(Blob.ref_count <= 0, Blob.last_used_at < cutoff).all()
+    for (sha256,) in candidates:
+        # Re-checked in the DELETE: an upload may have adopted the blob since the query
+        result = db.execute(
+            delete(Blob).where(Blob.sha256 == sha256, Blob.ref_count <= 0, Blob.last_used_at < cutoff)
+        )
+        if result.rowcount:
+            # Delete the object before committing, so an upload waiting on the row rewrites it
+            store.delete(key_for(sha256))
+            removed += 1
+        db.commit()
+
+    # Objects without a row: uploads that failed before committing, or interrupted writes
+    known = {sha256 for (sha256,) in db.query(Blob.sha256).all()}
+    db.rollback()
+    oldest = time.time() - grace_s
+    for key, modified in store.listing(PREFIX):
+        sha256 = key.rsplit("/", 1)[-1]
+        if len(sha256) == 64 and sha256 not in known and modified < oldest:
+            store.delete(key)
+            orphans += 1
+    orphans += store.cleanup_partial(oldest)
+
+    metrics.inc("blob_gc_removed", removed)
+    metrics.inc("blob_gc_orphans_removed", orphans)
+    if removed or orphans:
+        logger.info("Blob GC removed %d unreferenced and %d orphaned blobs", removed, orphans)
+    return {"removed": removed, "orphans": orphans}
+
+
+async def collect_periodically(interval: float) -> None:
+    """Run ``collect_garbage`` every ``interval`` seconds in a worker thread."""
+    from app.database import SessionLocal
+
+    def run():
+        db = SessionLocal()
+        try:
+            collect_garbage(db)
+        finally:
+            db.close()
+
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(run)
+        except Exception:
+            logger.exception("Blob garbage collection failed")
+
+
+def migrate_legacy(db: Session) -> int:
+    """Move files stored before the blob store into it; returns the number moved."""
+    # Blob rows written before storage keys held a local absolute path
+    for uploaded in db.query(UploadedFile).filter(UploadedFile.blob_sha256.is_not(None)).all():
+        uploaded.stored_path = key_for(uploaded.blob_sha256)
+    db.commit()
+
+    moved = 0
+    for uploaded in db.query(UploadedFile).filter(UploadedFile.blob_sha256.is_(None)).all():
+        if not os.path.exists(uploaded.stored_path):
+            logger.warning("File %d is missing on disk: %s", uploaded.id, uploaded.stored_path)
+            continue
+        old_path = uploaded.stored_path
+        with open(old_path, "rb") as f:
+            blob = put(db, f.read())
+        uploaded.blob_sha256 = blob.sha256
+        uploaded.stored_path = key_for(blob.sha256)
+        blob.ref_count += 1  # the insert hook only counts new rows
+        db.commit()
+        os.remove(old_path)
+        moved += 1
+    return moved
+
+
+class _ChunkReader(io.RawIOBase):
+    """Read-only file object over an iterator of byte chunks, so objects are copied without loading them whole."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._pending = memoryview(b"")
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._pending:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._pending = memoryview(chunk)
+        n = min(len(buffer), len(self._pending))
+        buffer[:n] = self._pending[:n]
+        self._pending = self._pending[n:]
+        return n
+
+
+def copy_between(db: Session, source: storage.Storage, target: storage.Storage) -> int:
+    """Copy every blob missing from ``target`` over from ``source``; returns the number copied.
+
+    Safe to re-run; the source objects are left for ``gc`` on the old backend.
+    """
+    copied = 0
+    for (sha256,) in db.query(Blob.sha256).all():
+        key = key_for(sha256)
+        if target.exists(key):
+            continue
+        if not source.exists(key):
+            logger.warning("Blob %s is missing from the %s store", sha256, source.name)
+            continue
+        size = source.size(key)
+        chunks = source.iter_range(key, 0, size - 1) if size else ()
+        with io.BufferedReader(_ChunkReader(chunks), CHUNK_SIZE) as stream:
+            target.write(key, stream)
+        copied += 1
+    return copied
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.services.blobs", description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["migrate", "gc"])
+    parser.add_argument("--from", dest="source", choices=["local", "s3"], default=None,
+                        help="migrate: also copy blobs from this backend to STORAGE_BACKEND")
+    parser.add_argument("--grace-s", type=float, default=None, help="gc: override BLOB_GC_GRACE_S")
+    args = parser.parse_args(argv)
+
+    from app.database import SessionLocal, init_db
+
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    db = SessionLocal()
+    try:
+        if args.command == "migrate":
+            if args.source and args.source != settings.STORAGE_BACKEND:
+                copied = copy_between(db, storage.backend(args.source), storage.backend())
+                print(f"copied {copied} blobs from {args.source} to {settings.STORAGE_BACKEND}")
+            print(f"moved {migrate_legacy(db)} files into the blob store")
+        else:
+            print(collect_garbage(db, args.grace_s))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
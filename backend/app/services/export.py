@@ -0,0 +1,212 @@
+"""Streaming ZIP and tar archives of records.
+
+``archive`` yields an archive of the given records while it is being built:
+each stored file is copied from storage in chunks straight into the output,
+so nothing is spooled to disk and memory stays at a chunk plus one record's
+texts whatever the size of the export. Records are loaded one at a time in
+a short session, so no database connection is held while bytes stream.
+
+Layout::
+
+    <record_type>-<record_id>/<file_id>_<original_filename>
+    <record_type>-<record_id>/<file_id>_<original_filename>.original.txt     (sidecars="txt")
+    <record_type>-<record_id>/<file_id>_<original_filename>.translation.txt
+    <record_type>-<record_id>/<file_id>_<original_filename>.json             (sidecars="json")
+    manifest.json
+
+Uploaded files are stored without compression (images and PDFs are
+compressed already, and deflating multi-GB studies would make the export
+CPU-bound); sidecars and the manifest are deflated. ZIP64 is used per entry
+when a file needs it.
+"""
+import json
+import os
+import tarfile
+import zipfile
+from datetime import datetime, timezone
+from typing import Callable, Iterable, Iterator
+
+from sqlalchemy.orm import Session, selectinload
+
+from app import metrics
+from app.models import Record, Translation, UploadedFile
+from app.services import blobs, storage
+from app.services.storage import CHUNK_SIZE
+
+FORMATS = {"zip": "application/zip", "tar": "application/x-tar"}
+SIDECARS = ("txt", "json")
+
+# (archive name, size, modified, chunks, compress)
+Entry = tuple[str, int, datetime, Iterable[bytes], bool]
+
+
+def _safe_name(filename: str) -> str:
+    name = os.path.basename(filename.replace("\\", "/")).lstrip(".")
+    return name or "file"
+
+
+def _read_file(path: str) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            yield chunk
+
+
+def _source(uploaded: UploadedFile) -> tuple[int, Iterable[bytes]]:
+    """Size and (lazy) chunks of a stored file; raises FileNotFoundError if it is gone."""
+    if not uploaded.blob_sha256:
+        # Stored before the blob store: a path on this host's disk
+        return os.path.getsize(uploaded.stored_path), _read_file(uploaded.stored_path)
+    store, key = storage.backend(), blobs.key_for(uploaded.blob_sha256)
+    size = store.size(key)
+    return size, store.iter_range(key, 0, size - 1) if size else ()
+
+
+def _text_entry(name: str, text: str, modified: datetime) -> Entry:
+    data = text.encode("utf-8")
+    return name, len(data), modified, (data,), True
+
+
+def _translation_dict(t: Translation) -> dict:
+    return {
+        "id": t.id,
+        "version": t.version,
+        "ocr_model": t.ocr_model,
+        "original_text": t.original_text,
+        "translated_text": t.translated_text,
+        "created_at": t.created_at.isoformat() if t.created_at else None,
+    }
+
+
+def _record_entries(record: Record, sidecars: str, manifest: list) -> Iterator[Entry]:
+    folder = f"{record.record_type}-{record.id}"
+    modified = record.created_at or datetime.utcnow()
+    files = []
+    manifest.append({
+        "id": record.id,
+        "record_type": record.record_type,
+        "patient_note": record.patient_note,
+        "created_at": record.created_at.isoformat() if record.created_at else None,
+        "created_by": record.created_by,
+        "status": record.status,
+        "files": files,
+    })
+    for f in record.files:
+        path = f"{folder}/{f.id}_{_safe_name(f.original_filename)}"
+        info = {"id": f.id, "original_filename": f.original_filename, "path": path, "sha256": f.blob_sha256,
+                "status": f.status}
+        files.append(info)
+        try:
+            size, chunks = _source(f)
+        except FileNotFoundError:
+            info.update(path=None, missing=True)
+            metrics.inc("export_missing_files")
+        else:
+            info["size"] = size
+            yield path, size, f.created_at or modified, chunks, False
+
+        if not f.translations:
+            continue
+        if sidecars == "json":
+            info["sidecars"] = [f"{path}.json"]
+            body = {"file_id": f.id, "original_filename": f.original_filename, "status": f.status,
+                    "translations": [_translation_dict(t) for t in f.translations]}
+            yield _text_entry(f"{path}.json", json.dumps(body, ensure_ascii=False, indent=2), modified)
+        else:
+            latest = f.translations[0]  # newest version
+            info["sidecars"] = [f"{path}.original.txt", f"{path}.translation.txt"]
+            yield _text_entry(f"{path}.original.txt", latest.original_text, modified)
+            yield _text_entry(f"{path}.translation.txt", latest.translated_text, modified)
+
+
+def _entries(session_factory: Callable[[], Session], record_ids: list[int], sidecars: str) -> Iterator[Entry]:
+    manifest = []
+    for record_id in record_ids:
+        with session_factory() as db:
+            record = (
+                db.query(Record)
+                .options(
+                    selectinload(Record.files).selectinload(UploadedFile.translations)
+                    .undefer(Translation.original_text).undefer(Translation.translated_text)
+                )
+                .filter(Record.id == record_id)
+                .first()
+            )
+            if record is None:
+                continue  # deleted since the export started
+            # Built inside the session; the chunks read storage, not the database
+            entries = list(_record_entries(record, sidecars, manifest))
+        yield from entries
+    body = {"exported_at": datetime.utcnow().isoformat(), "records": manifest}
+    yield _text_entry("manifest.json", json.dumps(body, ensure_ascii=False, indent=2), datetime.utcnow())
+
+
+class _Sink:
+    """Write-only file object the archive writers fill and the generator drains."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _zip(entries: Iterable[Entry]) -> Iterator[bytes]:
+    sink = _Sink()
+    # Not seekable, so zipfile writes sizes in data descriptors after each entry
+    with zipfile.ZipFile(sink, "w") as zf:
+        for name, size, modified, chunks, compress in entries:
+            info = zipfile.ZipInfo(name, date_time=max(modified, datetime(1980, 1, 1)).timetuple()[:6])
+            info.file_size = size  # lets zipfile decide on ZIP64 up front
+            info.compress_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+            info.external_attr = 0o644 << 16
+            with zf.open(info, "w") as dest:
+                for chunk in chunks:
+                    dest.write(chunk)
+                    if data := sink.drain():
+                        yield data
+            yield sink.drain()
+    yield sink.drain()
+
+
+def _tar(entries: Iterable[Entry]) -> Iterator[bytes]:
+    written = 0
+    for name, size, modified, chunks, _ in entries:
+        info = tarfile.TarInfo(name)
+        # Stored datetimes are naive UTC; timestamp() alone would read them as local time
+        info.size, info.mtime, info.mode = size, modified.replace(tzinfo=timezone.utc).timestamp(), 0o644
+        header = info.tobuf(tarfile.PAX_FORMAT)
+        yield header
+        copied = 0
+        for chunk in chunks:
+            copied += len(chunk)
+            yield chunk
+        if copied != size:
+            # The header already promised ``size`` bytes; a short entry would corrupt the rest
+            raise IOError(f"{name} changed size while being archived ({copied} of {size} bytes)")
+        padding = -size % tarfile.BLOCKSIZE
+        yield tarfile.NUL * padding
+        written += len(header) + size + padding
+    end = 2 * tarfile.BLOCKSIZE
+    yield tarfile.NUL * (end + -(written + end) % tarfile.RECORDSIZE)
+
+
+def archive(session_factory: Callable[[], Session], record_ids: list[int], fmt: str = "zip",
+            sidecars: str = "txt") -> Iterator[bytes]:
+    """Yield a ``fmt`` archive of ``record_ids`` with translations as ``sidecars`` files."""
+    writer = _zip if fmt == "zip" else _tar
+    total = 0
+    for data in writer(_entries(session_factory, record_ids, sidecars)):
+        if data:
+            total += len(data)
+            yield data
+    metrics.inc("exports", format=fmt)
+    metrics.inc("export_bytes", total, format=fmt)
@@ -0,0 +1,158 @@
+"""Incremental multipart/form-data parsing.
+
+Starlette's ``request.form()`` returns only after the whole body has been
+received. ``parts`` yields each field and file as soon as its closing
+boundary has arrived, so a handler can start working on the first files of
+a large upload while the rest are still in transit. It drives
+python-multipart's ``MultipartParser`` callbacks itself; files are spooled
+the same way as Starlette's (memory, then a temporary file past 1 MB).
+"""
+from tempfile import SpooledTemporaryFile
+from typing import AsyncIterator, Iterable, Optional, Union
+
+from fastapi import Request, UploadFile
+from multipart.multipart import MultipartParser, parse_options_header
+from starlette.datastructures import Headers
+from starlette.formparsers import MultiPartException
+
+# (field name, value, whether this is the last part of the body)
+Part = tuple[str, Union[str, UploadFile], bool]
+
+_SPOOL_MAX_BYTES = 1024 * 1024
+_MAX_FILES = 1000
+_MAX_FIELDS = 1000
+
+
+def _decode(value: bytes, charset: str) -> str:
+    try:
+        return value.decode(charset)
+    except (UnicodeDecodeError, LookupError):
+        return value.decode("latin-1")
+
+
+class _Collector:
+    """``MultipartParser`` callbacks that collect finished parts.
+
+    The callbacks run inside ``parser.write`` and must not block, so file
+    data is queued in ``writes`` for the caller to write (spooled files may
+    have rolled over to disk) before it hands out ``finished``.
+    """
+
+    def __init__(self, charset: str):
+        self.charset = charset
+        self.finished: list[tuple[str, Union[str, UploadFile]]] = []
+        self.writes: list[tuple[UploadFile, bytes]] = []
+        self.files: list[SpooledTemporaryFile] = []
+        self.complete = False
+        self._name = ""
+        self._data = bytearray()
+        self._file: Optional[UploadFile] = None
+        self._headers: list[tuple[bytes, bytes]] = []
+        self._header_name = b""
+        self._header_value = b""
+        self._fields = 0
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_end": self.on_end,
+        }
+
+    def on_part_begin(self) -> None:
+        self._name, self._data, self._file, self._headers = "", bytearray(), None, []
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._file is None:
+            self._data += data[start:end]
+        else:
+            self.writes.append((self._file, data[start:end]))
+
+    def on_part_end(self) -> None:
+        if self._file is None:
+            self.finished.append((self._name, _decode(bytes(self._data), self.charset)))
+        else:
+            self.finished.append((self._name, self._file))
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        self._headers.append((self._header_name.lower(), self._header_value))
+        self._header_name, self._header_value = b"", b""
+
+    def on_headers_finished(self) -> None:
+        disposition = dict(self._headers).get(b"content-disposition", b"")
+        _, options = parse_options_header(disposition)
+        if b"name" not in options:
+            raise MultiPartException('The Content-Disposition header field "name" must be provided.')
+        self._name = _decode(options[b"name"], self.charset)
+        if b"filename" not in options:
+            self._fields += 1
+            if self._fields > _MAX_FIELDS:
+                raise MultiPartException(f"Too many fields. Maximum number of fields is {_MAX_FIELDS}.")
+            return
+        if len(self.files) >= _MAX_FILES:
+            raise MultiPartException(f"Too many files. Maximum number of files is {_MAX_FILES}.")
+        spool = SpooledTemporaryFile(max_size=_SPOOL_MAX_BYTES)
+        self.files.append(spool)
+        self._file = UploadFile(
+            file=spool, size=0, filename=_decode(options[b"filename"], self.charset),
+            headers=Headers(raw=self._headers),
+        )
+
+    def on_end(self) -> None:
+        self.complete = True
+
+
+async def _parse(headers: Headers, stream: AsyncIterator[bytes]) -> AsyncIterator[Part]:
+    _, params = parse_options_header(headers.get("Content-Type", ""))
+    charset = params.get(b"charset", b"utf-8").decode("latin-1")
+    if b"boundary" not in params:
+        raise MultiPartException("Missing boundary in multipart.")
+
+    collector = _Collector(charset)
+    parser = MultipartParser(params[b"boundary"], collector.callbacks())
+    done = 0
+    try:
+        async for chunk in stream:
+            parser.write(chunk)
+            for file, data in collector.writes:
+                await file.write(data)
+            collector.writes.clear()
+            # A file's data has all been written by the time its part is finished
+            while done < len(collector.finished):
+                name, value = collector.finished[done]
+                done += 1
+                if isinstance(value, UploadFile):
+                    await value.seek(0)
+                yield name, value, collector.complete and done == len(collector.finished)
+        parser.finalize()
+    except BaseException:
+        for spool in collector.files:
+            spool.close()
+        raise
+
+
+def parts(request: Request) -> AsyncIterator[Part]:
+    """Yield ``(name, value, last)`` for each part of ``request``'s body as it arrives.
+
+    Raises ``MultiPartException`` for malformed bodies and ``ClientDisconnect``
+    if the client goes away before the body is complete.
+    """
+    return _parse(request.headers, request.stream())
+
+
+async def received(items: Iterable[tuple[str, Union[str, UploadFile]]]) -> AsyncIterator[Part]:
+    """``parts`` for a form that is already in hand (e.g. files read from an archive)."""
+    items = list(items)
+    for i, (name, value) in enumerate(items):
+        yield name, value, i == len(items) - 1
@@ -0,0 +1,405 @@
+"""Bulk import of historical reports and scans.
+
+A manifest maps the files of a ZIP archive (or a directory) to records. It
+is a CSV with a header row, or a JSON list of objects, with the fields:
+
+``path``
+    the file's path inside the archive or directory (required)
+``record``
+    files with the same value go into one record (default: one record per file)
+``type``
+    ``report`` (OCR'd and translated, the default) or ``radiology``
+``note``
+    the record's patient note
+
+``create_job`` checks the manifest against the source and stores one
+``IngestItem`` per record; ``run_job`` then creates the records through the
+same code as the upload endpoints, a few at a time. Entries are read one at
+a time straight from the archive, so nothing is extracted up front. Each
+item's status is written as soon as it finishes, so a job that stopped
+(crash, restart, Ctrl-C) resumes where it left off. A record that was only
+part-way through is deleted and imported again.
+
+``python -m app.services.ingest`` runs a job across several worker
+processes; each process has its own translation limiter, so the upstream
+sees up to ``--workers`` times the usual concurrency. Imports run as the
+importing user, so a scheduler weight below 1 for that user (see
+``SCHEDULER_USER_WEIGHTS``) keeps interactive uploads ahead of a backlog.
+The command line logs in again when the access token is about to expire;
+a job started through ``POST /api/ingest`` runs on the caller's token and
+stops importing once it expires (resume it from the command line).
+"""
+import argparse
+import asyncio
+import csv
+import getpass
+import io
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Optional
+
+from fastapi import HTTPException, UploadFile
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app import metrics
+from app.config import settings
+from app.models import IngestItem, IngestJob, Record
+from app.services import formstream
+from app.services.storage import CHUNK_SIZE
+from app.services.uppermind import Login
+
+logger = logging.getLogger(__name__)
+
+RECORD_TYPES = ("report", "radiology")
+_MAX_PROBLEMS = 20  # manifest problems listed in one error
+
+
+class Source:
+    """Files of a ZIP archive or a directory, read one at a time."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._zip = zipfile.ZipFile(path) if zipfile.is_zipfile(path) else None
+        if self._zip is None and not os.path.isdir(path):
+            raise ValueError(f"{path} is neither a ZIP archive nor a directory")
+
+    def names(self) -> set[str]:
+        if self._zip is not None:
+            return {i.filename for i in self._zip.infolist() if not i.is_dir()}
+        return {
+            os.path.relpath(os.path.join(d, n), self.path).replace(os.sep, "/")
+            for d, _, names in os.walk(self.path) for n in names
+        }
+
+    def open(self, name: str):
+        if self._zip is not None:
+            return self._zip.open(name)
+        full = os.path.realpath(os.path.join(self.path, name))
+        if not full.startswith(os.path.realpath(self.path) + os.sep):
+            raise ValueError(f"{name} is outside {self.path}")
+        return open(full, "rb")
+
+    def close(self) -> None:
+        if self._zip is not None:
+            self._zip.close()
+
+
+def parse_manifest(data: bytes, filename: str) -> list[dict]:
+    """Rows of a CSV or JSON manifest as dicts with ``path``, ``record``, ``type`` and ``note``."""
+    text = data.decode("utf-8-sig")
+    if filename.lower().endswith(".json"):
+        rows = json.loads(text)
+        if not isinstance(rows, list):
+            raise ValueError("A JSON manifest must be a list of objects")
+    else:
+        rows = list(csv.DictReader(io.StringIO(text)))
+    parsed = []
+    for n, row in enumerate(rows, start=1):
+        if not isinstance(row, dict) or not str(row.get("path") or "").strip():
+            raise ValueError(f"Manifest row {n} has no path")
+        path = str(row["path"]).strip().lstrip("/")
+        parsed.append({
+            "path": path,
+            "record": str(row.get("record") or "").strip() or path,
+            "type": str(row.get("type") or "").strip().lower() or "report",
+            "note": str(row.get("note") or "").strip() or None,
+        })
+    return parsed
+
+
+def _allowed_extensions(record_type: str) -> set[str]:
+    from app.routers import radiology, reports
+
+    return reports.ALLOWED_EXTENSIONS if record_type == "report" else radiology.ALLOWED_EXTENSIONS
+
+
+def group(rows: list[dict], names: set[str]) -> "OrderedDict[str, dict]":
+    """Group manifest rows into records, checking them against the source's file ``names``."""
+    groups, problems = OrderedDict(), []
+    for row in rows:
+        if row["type"] not in RECORD_TYPES:
+            problems.append(f"{row['path']}: unknown type {row['type']!r}")
+            continue
+        if row["path"] not in names:
+            problems.append(f"{row['path']}: not in the source")
+            continue
+        ext = row["path"].rsplit(".", 1)[-1].lower() if "." in row["path"] else ""
+        if ext not in _allowed_extensions(row["type"]):
+            problems.append(f"{row['path']}: a {row['type']} cannot be a .{ext} file")
+            continue
+        entry = groups.setdefault(row["record"], {"type": row["type"], "note": row["note"], "paths": []})
+        if entry["type"] != row["type"]:
+            problems.append(f"{row['path']}: record {row['record']!r} mixes report and radiology files")
+            continue
+        entry["note"] = entry["note"] or row["note"]
+        entry["paths"].append(row["path"])
+    if problems:
+        more = f" (and {len(problems) - _MAX_PROBLEMS} more)" if len(problems) > _MAX_PROBLEMS else ""
+        raise ValueError("; ".join(problems[:_MAX_PROBLEMS]) + more)
+    if not groups:
+        raise ValueError("The manifest lists no files")
+    return groups
+
+
+def create_job(db: Session, source_path: str, rows: list[dict], created_by: str) -> IngestJob:
+    """Validate ``rows`` against the source and store the job with one item per record."""
+    source = Source(source_path)
+    try:
+        groups = group(rows, source.names())
+    finally:
+        source.close()
+    job = IngestJob(source=os.path.abspath(source_path), created_by=created_by)
+    db.add(job)
+    db.flush()
+    db.bulk_insert_mappings(IngestItem, [
+        {"job_id": job.id, "key": key, "record_type": g["type"], "patient_note": g["note"], "paths": json.dumps(g["paths"])}
+        for key, g in groups.items()
+    ])
+    db.commit()
+    return job
+
+
+def progress(db: Session, job_id: int) -> Optional[dict]:
+    """Counts and throughput of a job, None if it does not exist."""
+    job = db.get(IngestJob, job_id)
+    if job is None:
+        return None
+    counts = dict(
+        db.query(IngestItem.status, func.count()).filter(IngestItem.job_id == job_id).group_by(IngestItem.status).all()
+    )
+    total = sum(counts.values())
+    result = {
+        "id": job.id,
+        "status": job.status,
+        "source": os.path.basename(job.source),
+        "created_by": job.created_by,
+        "created_at": job.created_at.isoformat(),
+        "records": {"total": total, "done": counts.get("done", 0), "failed": counts.get("failed", 0),
+                    "pending": counts.get("pending", 0)},
+        "records_per_hour": None,
+        "eta_s": None,
+    }
+    if job.started_at is not None:
+        end = job.finished_at or datetime.utcnow()
+        elapsed = max((end - job.started_at).total_seconds(), 1e-3)
+        finished_this_run = (
+            db.query(func.count()).select_from(IngestItem)
+            .filter(IngestItem.job_id == job_id, IngestItem.finished_at >= job.started_at).scalar()
+        )
+        rate = finished_this_run / elapsed
+        result["elapsed_s"] = round(elapsed, 1)
+        result["records_per_hour"] = round(rate * 3600, 1)
+        if rate > 0 and job.finished_at is None:
+            result["eta_s"] = round(counts.get("pending", 0) / rate)
+    return result
+
+
+def _spool(source: Source, name: str) -> UploadFile:
+    """The entry as an ``UploadFile``, copied in chunks into a spool file like a multipart upload."""
+    spool = tempfile.SpooledTemporaryFile(max_size=CHUNK_SIZE)
+    with source.open(name) as f:
+        shutil.copyfileobj(f, spool, CHUNK_SIZE)
+    spool.seek(0)
+    return UploadFile(spool, filename=os.path.basename(name))
+
+
+def _remove_partial(db: Session, record_id: int) -> None:
+    """Delete a record an interrupted run left half-imported (its file rows release their blobs)."""
+    record = db.get(Record, record_id)
+    if record is not None:
+        logger.info("Removing partially imported record %d", record_id)
+        db.delete(record)
+        db.commit()
+
+
+async def _import(item, source: Source, user: dict, session_factory: Callable[[], Session]) -> None:
+    from app.routers import radiology, reports
+
+    with session_factory() as db:
+        if item.record_id is not None:
+            _remove_partial(db, item.record_id)
+        row = db.get(IngestItem, item.id)
+        row.record_id, row.status, row.error = None, "pending", None
+        db.commit()
+
+    uploads = [await asyncio.to_thread(_spool, source, p) for p in json.loads(item.paths)]
+    db = session_factory()
+    try:
+        if item.record_type == "radiology":
+            result = await radiology.upload_radiology(files=uploads, patient_note=item.patient_note, db=db,
+                                                      current_user=user)
+            record_id, failed = result.id, 0
+        else:
+            form = [("files", upload) for upload in uploads]
+            if item.patient_note is not None:
+                form.insert(0, ("patient_note", item.patient_note))
+            response = await reports.start_report(formstream.received(form), db, user)
+            record_id = int(response.headers["x-record-id"])
+            with session_factory() as checkpoint:
+                checkpoint.get(IngestItem, item.id).record_id = record_id
+                checkpoint.commit()
+            complete = None
+            async for event in response.body_iterator:
+                payload = json.loads(event[len("data: "):])
+                if payload["phase"] == "complete":
+                    complete = payload["result"]
+            failed = sum(1 for f in complete["files"] if f["status"] == "failed")
+    finally:
+        db.close()
+        for upload in uploads:
+            upload.file.close()
+
+    with session_factory() as db:
+        row = db.get(IngestItem, item.id)
+        row.record_id, row.failed_files, row.status, row.finished_at = record_id, failed, "done", datetime.utcnow()
+        db.commit()
+    metrics.inc("ingest_records", record_type=item.record_type)
+    metrics.inc("ingest_files", len(uploads), record_type=item.record_type)
+
+
+async def run_job(job_id: int, user: dict, session_factory: Callable[[], Session], concurrency: int = 0,
+                  worker: int = 0, workers: int = 1, login: Optional[Login] = None) -> None:
+    """Import the job's records that are not done yet, ``concurrency`` at a time.
+
+    With several ``workers`` (processes), each takes the items whose id
+    modulo ``workers`` equals ``worker``. With a ``login``, records are
+    imported as its user, logging in again before the token expires;
+    otherwise ``user``'s token has to last until the job is done.
+    """
+    concurrency = concurrency or settings.INGEST_CONCURRENCY
+    with session_factory() as db:
+        job = db.get(IngestJob, job_id)
+        if job is None:
+            raise ValueError(f"No ingest job {job_id}")
+        source_path = job.source
+        items = [
+            item for item in db.query(
+                IngestItem.id, IngestItem.key, IngestItem.record_type, IngestItem.patient_note,
+                IngestItem.paths, IngestItem.record_id,
+            ).filter(IngestItem.job_id == job_id, IngestItem.status != "done").order_by(IngestItem.id)
+            if item.id % workers == worker
+        ]
+        if worker == 0:
+            job.status, job.started_at, job.finished_at = "running", datetime.utcnow(), None
+            db.commit()
+
+    source = Source(source_path)
+    queue = iter(items)
+    renewing = asyncio.Lock()
+
+    async def consume():
+        for item in queue:
+            started = time.monotonic()
+            try:
+                if login is not None:
+                    async with renewing:
+                        current = await login.user()
+                else:
+                    current = user
+                await _import(item, source, current, session_factory)
+            except Exception as exc:
+                detail = exc.detail if isinstance(exc, HTTPException) else repr(exc)
+                logger.exception("Importing %r of ingest job %d failed", item.key, job_id)
+                metrics.inc("ingest_failures")
+                with session_factory() as db:
+                    row = db.get(IngestItem, item.id)
+                    row.status, row.error, row.finished_at = "failed", str(detail), datetime.utcnow()
+                    db.commit()
+            metrics.observe("ingest_record_seconds", time.monotonic() - started)
+
+    try:
+        await asyncio.gather(*(consume() for _ in range(max(concurrency, 1))))
+    finally:
+        source.close()
+
+    with session_factory() as db:
+        pending = db.query(IngestItem).filter(IngestItem.job_id == job_id, IngestItem.status == "pending").count()
+        job = db.get(IngestJob, job_id)
+        if not pending and job.status != "complete":
+            job.status, job.finished_at = "complete", datetime.utcnow()
+            db.commit()
+
+
+def _worker_process(job_id: int, user: dict, login: Login, concurrency: int, worker: int, workers: int) -> None:
+    from app.database import SessionLocal
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run_job(job_id, user, SessionLocal, concurrency, worker, workers, login))
+
+
+def _print_progress(db: Session, job_id: int) -> None:
+    p = progress(db, job_id)
+    db.rollback()  # see the workers' commits next time
+    r = p["records"]
+    print(f"job {p['id']}: {r['done']}/{r['total']} done, {r['failed']} failed, "
+          f"{p['records_per_hour'] or 0} records/h, eta {p['eta_s'] if p['eta_s'] is not None else '?'} s", flush=True)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.services.ingest", description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_start = sub.add_parser("start", help="create a job from a source and a manifest, then run it")
+    p_start.add_argument("source", help="ZIP archive or directory")
+    p_start.add_argument("manifest", help="CSV or JSON manifest")
+    p_resume = sub.add_parser("resume", help="run the records of a job that are not done yet")
+    p_resume.add_argument("job_id", type=int)
+    p_status = sub.add_parser("status", help="print a job's progress")
+    p_status.add_argument("job_id", type=int)
+    for p in (p_start, p_resume):
+        p.add_argument("--username", required=True, help="UpperMind user the records are imported as")
+        p.add_argument("--workers", type=int, default=1, help="worker processes")
+        p.add_argument("--concurrency", type=int, default=0, help="records in flight per worker (default INGEST_CONCURRENCY)")
+    args = parser.parse_args(argv)
+
+    import multiprocessing
+
+    from app.database import SessionLocal, init_db
+
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    db = SessionLocal()
+    try:
+        if args.command == "status":
+            print(json.dumps(progress(db, args.job_id), indent=2))
+            return
+
+        password = os.environ.get("UPPERMIND_PASSWORD") or getpass.getpass(f"UpperMind password for {args.username}: ")
+        login = Login(args.username, password)
+        user = asyncio.run(login.user())
+
+        if args.command == "start":
+            with open(args.manifest, "rb") as f:
+                rows = parse_manifest(f.read(), args.manifest)
+            job = create_job(db, args.source, rows, user.get("username", args.username))
+            job_id = job.id
+            print(f"created ingest job {job_id}; resume with: python -m app.services.ingest resume {job_id}")
+        else:
+            job_id = args.job_id
+
+        if args.workers <= 1:
+            asyncio.run(run_job(job_id, user, SessionLocal, args.concurrency, login=login))
+        else:
+            ctx = multiprocessing.get_context("spawn")
+            procs = [ctx.Process(target=_worker_process, args=(job_id, user, login, args.concurrency, w, args.workers))
+                     for w in range(args.workers)]
+            for proc in procs:
+                proc.start()
+            while any(proc.is_alive() for proc in procs):
+                for proc in procs:
+                    proc.join(timeout=30 / len(procs))
+                _print_progress(db, job_id)
+        _print_progress(db, job_id)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""Offline language identification for OCR output.
+
+A character-trigram naive Bayes classifier whose profiles are built at import
+time from short medical-register samples below. It only has to answer "is
+this segment already Turkish?" well, so the other languages are the ones
+foreign patients' documents usually arrive in, plus Azerbaijani, which is
+close enough to Turkish that it would otherwise be passed through untranslated.
+"""
+import math
+import re
+from collections import Counter
+from typing import Optional
+
+from app.config import settings
+
+_SAMPLES = {
+    "tr": """
+        Hastanın yapılan muayenesinde genel durumu iyi, bilinci açık, koopere ve oryante idi.
+        Lomber manyetik rezonans görüntülemede L4-L5 seviyesinde diskte dejeneratif değişiklikler
+        ve sağ paramedian protrüzyon izlenmiştir. Spinal kanal ve nöral foramenler doğal
+        görünümdedir. Karaciğer boyutları normal olup parankim ekojenitesi artmıştır, grade 1
+        hepatosteatoz ile uyumludur. Safra kesesi doğal, duvar kalınlığı normaldir, içerisinde
+        taş izlenmemiştir. Her iki böbrek normal boyut ve lokalizasyondadır, hidronefroz
+        saptanmamıştır. Akciğer grafisinde aktif infiltrasyon görülmedi, kalp gölgesi normal
+        sınırlardadır. Hastaya ağrı kesici ve fizik tedavi önerildi, kontrol muayenesi için
+        bir ay sonra polikliniğe başvurması gerektiği söylendi. Tahlil sonuçlarında hemoglobin
+        değeri düşük, lökosit sayısı yüksek bulundu. Ameliyat sonrası dönemde komplikasyon
+        gelişmedi, yara yeri temiz ve kuru olarak değerlendirildi. Patoloji raporunda malignite
+        lehine bulgu saptanmadı. Öykü: şikayetleri yaklaşık üç aydır devam eden bel ağrısı ve
+        sol bacağa yayılan uyuşma. Özgeçmişinde hipertansiyon ve diyabet mevcuttur, düzenli
+        ilaç kullanmaktadır. Sonuç: bulgular klinik ile birlikte değerlendirilmelidir.
+    """,
+    "az": """
+        Xəstənin müayinəsi zamanı ümumi vəziyyəti qənaətbəxşdir, huşu aydındır. Bel nahiyəsinin
+        maqnit rezonans tomoqrafiyasında L4-L5 səviyyəsində disk degenerativ dəyişikliklər və sağ
+        tərəfli protruziya aşkar edilmişdir. Onurğa kanalı və sinir dəlikləri normal görünür.
+        Qaraciyərin ölçüləri normaldır, parenximanın exogenliyi artmışdır. Öd kisəsi dəyişməyib,
+        daxilində daş aşkar edilməmişdir. Hər iki böyrək normal ölçüdədir, hidronefroz yoxdur.
+        Ağciyərlərin rentgenoqrafiyasında aktiv infiltrasiya müşahidə olunmur, ürəyin kölgəsi
+        normal hüdudlardadır. Xəstəyə ağrıkəsici dərmanlar və fizioterapiya tövsiyə edilmişdir,
+        bir aydan sonra təkrar müayinə üçün həkimə müraciət etməsi lazımdır. Analizlərin
+        nəticəsində hemoqlobin aşağı, leykositlərin sayı yüksəkdir. Əməliyyatdan sonrakı dövrdə
+        ağırlaşma olmamışdır. Anamnez: təxminən üç aydır davam edən bel ağrısı və sol ayağa
+        yayılan keyimə. Nəticə: tapıntılar kliniki məlumatlarla birlikdə qiymətləndirilməlidir.
+    """,
+    "en": """
+        On examination the patient was alert, cooperative and oriented, in good general condition.
+        Lumbar magnetic resonance imaging shows degenerative disc changes at the L4-L5 level with a
+        right paramedian protrusion. The spinal canal and neural foramina appear normal. The liver
+        is normal in size with increased parenchymal echogenicity, consistent with grade 1 hepatic
+        steatosis. The gallbladder is unremarkable with normal wall thickness and no stones. Both
+        kidneys are of normal size and position without hydronephrosis. The chest radiograph shows
+        no active infiltrate and the cardiac silhouette is within normal limits. Analgesics and
+        physical therapy were recommended, and the patient should return to the outpatient clinic
+        for follow-up in one month. Laboratory results showed low haemoglobin and a raised white
+        cell count. There were no postoperative complications and the wound was clean and dry.
+        Pathology revealed no evidence of malignancy. History: lower back pain for about three
+        months with numbness radiating to the left leg. Past medical history includes hypertension
+        and diabetes on regular medication. Conclusion: findings should be correlated clinically.
+    """,
+    "de": """
+        Bei der Untersuchung war der Patient wach, kooperativ und orientiert, in gutem
+        Allgemeinzustand. Die Magnetresonanztomographie der Lendenwirbelsäule zeigt degenerative
+        Bandscheibenveränderungen in Höhe L4-L5 mit einer rechts paramedianen Protrusion. Der
+        Spinalkanal und die Neuroforamina sind unauffällig. Die Leber ist normal groß mit erhöhter
+        Echogenität des Parenchyms, vereinbar mit einer Steatosis hepatis Grad 1. Die Gallenblase
+        ist unauffällig, keine Steine. Beide Nieren sind normal groß und ohne Harnstau. Im
+        Röntgenbild des Thorax kein Infiltrat, das Herz ist normal groß. Es wurden Schmerzmittel
+        und Physiotherapie empfohlen, eine Kontrolle in der Ambulanz in einem Monat. Die
+        Laborwerte zeigten ein niedriges Hämoglobin und eine erhöhte Leukozytenzahl. Keine
+        postoperativen Komplikationen, die Wunde ist sauber und trocken. Die Pathologie ergab
+        keinen Hinweis auf Malignität. Anamnese: seit etwa drei Monaten Rückenschmerzen mit
+        Taubheitsgefühl im linken Bein. Beurteilung: die Befunde sind klinisch zu korrelieren.
+    """,
+    "fr": """
+        À l'examen, le patient était conscient, coopérant et orienté, en bon état général.
+        L'imagerie par résonance magnétique lombaire montre des modifications discales
+        dégénératives au niveau L4-L5 avec une protrusion paramédiane droite. Le canal rachidien
+        et les foramens sont normaux. Le foie est de taille normale avec une échogénicité
+        augmentée du parenchyme, compatible avec une stéatose hépatique de grade 1. La vésicule
+        biliaire est sans particularité, pas de calcul. Les deux reins sont de taille normale,
+        sans dilatation des cavités. La radiographie thoracique ne montre pas d'infiltrat et la
+        silhouette cardiaque est normale. Des antalgiques et une rééducation ont été prescrits,
+        avec un contrôle en consultation dans un mois. Le bilan biologique montre une hémoglobine
+        basse et une hyperleucocytose. Pas de complication postopératoire, la plaie est propre.
+        L'examen anatomopathologique ne retrouve pas de signe de malignité. Antécédents:
+        lombalgie depuis trois mois avec des paresthésies de la jambe gauche. Conclusion: les
+        résultats doivent être corrélés aux données cliniques.
+    """,
+    "es": """
+        En la exploración el paciente estaba consciente, colaborador y orientado, con buen estado
+        general. La resonancia magnética lumbar muestra cambios degenerativos discales en el nivel
+        L4-L5 con una protrusión paramedial derecha. El canal raquídeo y los agujeros de conjunción
+        son normales. El hígado es de tamaño normal con aumento de la ecogenicidad del parénquima,
+        compatible con esteatosis hepática de grado 1. La vesícula biliar no presenta alteraciones
+        ni cálculos. Ambos riñones tienen tamaño normal, sin hidronefrosis. La radiografía de tórax
+        no muestra infiltrados y la silueta cardíaca está dentro de los límites normales. Se
+        recomendaron analgésicos y fisioterapia, con control en consulta externa en un mes. Los
+        análisis mostraron hemoglobina baja y leucocitosis. No hubo complicaciones postoperatorias
+        y la herida está limpia y seca. La anatomía patológica no mostró signos de malignidad.
+        Antecedentes: dolor lumbar desde hace unos tres meses con entumecimiento de la pierna
+        izquierda. Conclusión: los hallazgos deben correlacionarse con la clínica.
+    """,
+    "it": """
+        All'esame obiettivo il paziente era vigile, collaborante e orientato, in buone condizioni
+        generali. La risonanza magnetica lombare mostra alterazioni degenerative del disco a livello
+        L4-L5 con una protrusione paramediana destra. Il canale vertebrale e i forami di
+        coniugazione sono nella norma. Il fegato è di dimensioni normali con aumentata
+        ecogenicità del parenchima, compatibile con steatosi epatica di grado 1. La colecisti è
+        nella norma, senza calcoli. Entrambi i reni sono di dimensioni normali, senza idronefrosi.
+        La radiografia del torace non mostra infiltrati e l'ombra cardiaca è nei limiti. Sono
+        stati consigliati analgesici e fisioterapia, con controllo ambulatoriale tra un mese. Gli
+        esami di laboratorio hanno mostrato emoglobina bassa e leucocitosi. Non vi sono state
+        complicanze postoperatorie e la ferita è pulita e asciutta. L'esame istologico non ha
+        evidenziato segni di malignità. Anamnesi: lombalgia da circa tre mesi con parestesie alla
+        gamba sinistra. Conclusioni: i reperti vanno correlati con il quadro clinico.
+    """,
+    "nl": """
+        Bij onderzoek was de patiënt alert, coöperatief en georiënteerd, in goede algemene
+        toestand. De MRI van de lumbale wervelkolom toont degeneratieve discusveranderingen op
+        niveau L4-L5 met een rechts paramediane protrusie. Het wervelkanaal en de foramina zijn
+        normaal. De lever is normaal van grootte met een verhoogde echogeniciteit van het
+        parenchym, passend bij leversteatose graad 1. De galblaas is zonder afwijkingen, geen
+        stenen. Beide nieren zijn normaal van grootte, zonder hydronefrose. De thoraxfoto toont
+        geen infiltraat en de hartschaduw is niet vergroot. Pijnstillers en fysiotherapie werden
+        geadviseerd, met een controle op de polikliniek over een maand. Het laboratorium toonde
+        een laag hemoglobine en een verhoogd aantal leukocyten. Er waren geen postoperatieve
+        complicaties en de wond is schoon en droog. De pathologie toonde geen aanwijzingen voor
+        maligniteit. Anamnese: sinds ongeveer drie maanden lage rugpijn met een doof gevoel in
+        het linkerbeen. Conclusie: de bevindingen moeten klinisch worden gecorreleerd.
+    """,
+}
+
+_NON_LETTER = re.compile(r"[^\w]+|[\d_]+")
+_SEGMENT_BREAK = re.compile(r"(\n\s*\n)")
+
+
+def _normalize(text: str) -> str:
+    # str.lower() turns "İ" into "i" plus a combining dot; fold it explicitly
+    return _NON_LETTER.sub(" ", text.replace("İ", "i").lower())
+
+
+def _trigrams(text: str) -> list[str]:
+    grams = []
+    for word in _normalize(text).split():
+        padded = f" {word} "
+        grams.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _build_profiles() -> tuple[dict[str, dict[str, float]], dict[str, float]]:
+    counts = {lang: Counter(_trigrams(sample)) for lang, sample in _SAMPLES.items()}
+    vocab = set().union(*counts.values())
+    profiles, unseen = {}, {}
+    for lang, c in counts.items():
+        denom = sum(c.values()) + 0.5 * len(vocab)
+        profiles[lang] = {g: math.log((n + 0.5) / denom) for g, n in c.items()}
+        unseen[lang] = math.log(0.5 / denom)
+    return profiles, unseen
+
+
+_PROFILES, _UNSEEN = _build_profiles()
+
+
+def detect(text: str) -> Optional[str]:
+    """Return the most likely language code for ``text``.
+
+    Returns None when the segment has too few letters to judge (numbers,
+    dates, measurements, names). Turkish has to lead the runner-up by the
+    configured per-trigram margin; a narrower win reports the runner-up so
+    borderline text is translated rather than passed through. Text mostly
+    outside the Latin script is reported as "other".
+    """
+    letters = [ch for ch in text if ch.isalpha()]
+    if len(letters) < settings.LANGID_MIN_LETTERS:
+        return None
+    if sum(1 for ch in letters if ord(ch) > 0x24F) > len(letters) / 2:
+        return "other"
+    grams = _trigrams(text)
+    scores = sorted(
+        ((sum(_PROFILES[lang].get(g, _UNSEEN[lang]) for g in grams), lang) for lang in _PROFILES),
+        reverse=True,
+    )
+    (best, lang), (second, runner_up) = scores[0], scores[1]
+    if lang == "tr" and (best - second) / len(grams) < settings.LANGID_MIN_MARGIN:
+        return runner_up
+    return lang
+
+
+def plan(text: str) -> list[tuple[str, bool]]:
+    """Split ``text`` into consecutive pieces flagged with whether they need translating.
+
+    Segments are paragraphs (runs separated by blank lines). Segments detected
+    as Turkish pass through; segments too short to judge follow the paragraph
+    before them (or after, at the start), and a text with no decided segment
+    at all is translated as a whole. Neighbouring pieces with the same flag are
+    merged so the translator sees contiguous context, and joining the pieces
+    gives back ``text`` exactly.
+    """
+    parts = _SEGMENT_BREAK.split(text)
+    contents = parts[0::2]
+    labels = [detect(c) for c in contents]
+    decided = [lang for lang in labels if lang is not None]
+    if not decided:
+        return [(text, True)] if text.strip() else [(text, False)]
+
+    foreign = []
+    previous = decided[0] != "tr"
+    for lang in labels:
+        if lang is not None:
+            previous = lang != "tr"
+        foreign.append(previous)
+
+    pieces: list[tuple[str, bool]] = []
+    for n, content in enumerate(contents):
+        if n > 0:
+            # A blank line inside a foreign run goes to the translator with it
+            pieces.append((parts[2 * n - 1], foreign[n - 1] and foreign[n]))
+        pieces.append((content, foreign[n]))
+
+    merged: list[tuple[str, bool]] = []
+    for piece, flag in pieces:
+        if merged and merged[-1][1] == flag:
+            merged[-1] = (merged[-1][0] + piece, flag)
+        elif piece:
+            merged.append((piece, flag))
+    return merged
@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveLimiter:
+    """Process-wide concurrency limit tuned with AIMD.
+
+    Each completed call reports its latency (normalised by ``units`` of work,
+    e.g. kilo-characters to translate) and whether it failed. The limit grows
+    by one after a healthy call made while at least half the limit was in use.
+    It is cut multiplicatively on an error, or when the short-term average
+    latency exceeds ``tolerance`` times the long-term average, at most once per
+    window: calls started before the last cut cannot trigger another one.
+    Callers beyond the limit wait in FIFO order.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial: int,
+        min_limit: int,
+        max_limit: int,
+        tolerance: float = 2.0,
+        backoff: float = 0.9,
+        short_alpha: float = 0.3,
+        long_alpha: float = 0.02,
+    ):
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(max(min_limit, min(initial, max_limit)))
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.short_alpha = short_alpha
+        self.long_alpha = long_alpha
+        self.in_flight = 0
+        self.short_latency: float | None = None  # EWMA of normalised latency (s per unit)
+        self.long_latency: float | None = None
+        self.epoch = 0  # bumped on every decrease
+        self._waiters: deque[asyncio.Future] = deque()
+
+        metrics.register_gauge("limiter_limit", lambda: self.limit, limiter=name)
+        metrics.register_gauge("limiter_in_flight", lambda: self.in_flight, limiter=name)
+        metrics.register_gauge("limiter_queue_depth", lambda: self.queue_depth, limiter=name)
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for w in self._waiters if not w.done())
+
+    def _has_capacity(self) -> bool:
+        return self.in_flight < int(self.limit)
+
+    async def acquire(self) -> None:
+        if self._has_capacity() and not self._waiters:
+            self.in_flight += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Slot was handed over just as we were cancelled - give it back
+                self.in_flight -= 1
+                self._wake()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def _wake(self) -> None:
+        while self._waiters and self._has_capacity():
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def release(self, latency: float, ok: bool, units: float = 1.0,
+                in_flight_at_start: int | None = None, epoch: int | None = None) -> None:
+        """Return a slot and adjust the limit from the call's outcome."""
+        self.in_flight -= 1
+        sample = latency / max(units, 1.0)
+        busy = in_flight_at_start if in_flight_at_start is not None else self.in_flight + 1
+
+        if ok:
+            if self.short_latency is None:
+                self.short_latency = self.long_latency = sample
+            else:
+                self.short_latency += self.short_alpha * (sample - self.short_latency)
+                self.long_latency += self.long_alpha * (sample - self.long_latency)
+
+        old = self.limit
+        congested = not ok or self.short_latency > self.long_latency * self.tolerance
+        if congested:
+            if epoch is None or epoch == self.epoch:
+                self.limit = max(float(self.min_limit), self.limit * self.backoff)
+                self.epoch += 1
+                metrics.inc("limiter_decreases", limiter=self.name)
+        elif busy * 2 >= self.limit:
+            self.limit = min(float(self.max_limit), self.limit + 1)
+        if int(old) != int(self.limit):
+            logger.info("Limiter %s: limit %d -> %d", self.name, int(old), int(self.limit))
+
+        metrics.observe("limiter_latency_s", latency, limiter=self.name)
+        self._wake()
+
+    @asynccontextmanager
+    async def slot(self, units: float = 1.0):
+        """Hold a slot for the enclosed call; exceptions count as errors."""
+        await self.acquire()
+        busy = self.in_flight
+        epoch = self.epoch
+        start = time.monotonic()
+        try:
+            yield
+        except asyncio.CancelledError:
+            # Cancellation says nothing about upstream health
+            self.in_flight -= 1
+            self._wake()
+            raise
+        except BaseException:
+            metrics.inc("limiter_errors", limiter=self.name)
+            self.release(time.monotonic() - start, ok=False, units=units, in_flight_at_start=busy, epoch=epoch)
+            raise
+        self.release(time.monotonic() - start, ok=True, units=units, in_flight_at_start=busy, epoch=epoch)
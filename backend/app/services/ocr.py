@@ -1,49 +1,213 @@
+import asyncio
 import base64
+import io
+import json
 import logging
+import re
+import time
+from datetime import datetime, timezone
+from typing import Optional
 
 import httpx
+from PIL import Image
 
+from app import metrics
 from app.config import settings
+from app.services import usage
+from app.services.scheduler import FairScheduler, parse_weights
+from app.tracing import inject, span
 
 logger = logging.getLogger(__name__)
 
+# Per-model profiles: prompt handling, batching and Ollama runtime settings.
+# ``options`` is sent as Ollama's ``options`` object on every request and
+# ``keep_alive`` (overridable with OLLAMA_KEEP_ALIVE) controls how long the
+# model stays resident after it.
 _MODEL_CONFIGS = {
     "deepseek-ocr": {
         "prompt": "Extract the text in the image.",
         "preambles": ["Do not change the text"],
+        "batch_size": 1,
+        "keep_alive": "30m",
+        "options": {"num_ctx": 8192, "num_predict": 4096, "temperature": 0.0},
     },
     "glm-ocr": {
         "prompt": "OCR",
         "preambles": [],
+        "batch_size": 1,
+        "keep_alive": "30m",
+        "options": {"num_ctx": 16384, "num_predict": 4096, "temperature": 0.0},
     },
 }
 
 _DEFAULT_CONFIG = {
     "prompt": "OCR",
     "preambles": [],
+    "batch_size": 1,
+    "keep_alive": "30m",
+    "options": {},
 }
 
+# Appended to the prompt when several images go out in one request
+_BATCH_INSTRUCTIONS = (
+    "\n\nThere are {count} images. Before the text of each image write a line "
+    "'=== PAGE n ===' with the image's number, starting at 1."
+)
+_PAGE_MARKER = re.compile(r"^=== PAGE (\d+) ===[ \t]*$", re.MULTILINE)
 
-async def extract_text_from_image(image_bytes: bytes) -> str:
-    """Extract text from an image using Ollama vision model."""
-    b64_image = base64.b64encode(image_bytes).decode("utf-8")
+# Runaway-generation guard: output is checked for repetition every
+# _LOOP_CHECK_EVERY characters; a looping request is retried once with these
+# options merged over the profile's.
+_LOOP_CHECK_EVERY = 256
+_LOOP_MAX_PERIOD = 200
+_LOOP_MIN_REPEATS = 8
+_LOOP_MIN_SPAN = 600
+_RETRY_OPTIONS = {"repeat_penalty": 1.3, "repeat_last_n": 256, "temperature": 0.2}
+
+# Fair-share access to the vision model across users and uploads
+ocr_scheduler = FairScheduler(
+    "ocr",
+    capacity=settings.OCR_CONCURRENCY,
+    weights=parse_weights(settings.SCHEDULER_USER_WEIGHTS),
+)
+
+
+def ocr_batch_size() -> int:
+    """Images per vision request: OCR_BATCH_SIZE, or the model's ``batch_size``."""
+    if settings.OCR_BATCH_SIZE > 0:
+        return settings.OCR_BATCH_SIZE
+    return _MODEL_CONFIGS.get(settings.OLLAMA_MODEL, _DEFAULT_CONFIG)["batch_size"]
+
+
+def _runtime_fields(cfg: dict) -> dict:
+    """``keep_alive`` and ``options`` for a request to the configured model."""
+    return {"keep_alive": settings.OLLAMA_KEEP_ALIVE or cfg["keep_alive"], "options": cfg["options"]}
+
+
+def _strip_preambles(raw: str, cfg: dict) -> str:
+    for preamble in cfg["preambles"]:
+        if raw.startswith(preamble):
+            raw = raw[len(preamble):].lstrip("\n")
+            break
+    return raw.strip()
+
+
+def _token_cap(images: list[bytes], cfg: dict) -> int:
+    """``num_predict`` for a request: scales with image area, capped by the profile.
+
+    A page can only hold so much text, so anything beyond this is the model
+    rambling. Images whose size cannot be read get the profile's cap.
+    """
+    limit = cfg["options"].get("num_predict")
+    cap = 0.0
+    for image in images:
+        try:
+            with Image.open(io.BytesIO(image)) as img:
+                width, height = img.size
+        except Exception:
+            return limit * len(images) if limit else -1
+        cap += settings.OCR_TOKENS_BASE + settings.OCR_TOKENS_PER_MEGAPIXEL * width * height / 1e6
+    return int(min(cap, limit * len(images))) if limit else int(cap)
+
+
+def _find_loop(text: str):
+    """Return where a repetition loop at the end of ``text`` starts (keeping one copy), or None.
+
+    The tail counts as a loop when it is periodic with some period up to
+    _LOOP_MAX_PERIOD characters over at least _LOOP_MIN_REPEATS periods and
+    _LOOP_MIN_SPAN characters: the same line or phrase emitted over and over.
+    """
+    for period in range(1, _LOOP_MAX_PERIOD + 1):
+        span = max(period * _LOOP_MIN_REPEATS, _LOOP_MIN_SPAN)
+        if len(text) < span:
+            break
+        tail = text[-span:]
+        if tail[period:] == tail[:-period]:
+            start = len(text) - span
+            while start > 0 and text[start - 1] == text[start - 1 + period]:
+                start -= 1
+            return start + period
+    return None
+
+
+def _record_usage(final: dict, chunk_count: int, sent: Optional[float]) -> None:
+    """Report a generate request to the usage meter.
+
+    Ollama's final chunk carries token counts and durations; a stream closed
+    early has none, so each streamed chunk (one token) and the time since the
+    response began stand in for them.
+    """
+    eval_ns = (final.get("prompt_eval_duration") or 0) + (final.get("eval_duration") or 0)
+    usage.record(
+        "ocr",
+        settings.OLLAMA_MODEL,
+        prompt_tokens=final.get("prompt_eval_count") or 0,
+        output_tokens=final.get("eval_count") or chunk_count,
+        gpu_ms=eval_ns / 1e6 if eval_ns else (time.monotonic() - sent) * 1000 if sent else 0.0,
+        load_ms=(final.get("load_duration") or 0) / 1e6,
+    )
+
+
+async def _stream_generate(prompt: str, images: list[bytes], options: dict, attempt: int) -> tuple[str, bool]:
+    """Stream one ``/api/generate`` request; returns ``(text, looped)``.
+
+    The response is checked for repetition loops as it arrives; on a loop the
+    stream is closed, which makes Ollama stop generating, and the text is cut
+    at the start of the loop.
+    """
     cfg = _MODEL_CONFIGS.get(settings.OLLAMA_MODEL, _DEFAULT_CONFIG)
     url = f"{settings.OLLAMA_URL}/api/generate"
+    total_bytes = sum(len(image) for image in images)
 
-    logger.info("Ollama OCR request to %s model=%s", url, settings.OLLAMA_MODEL)
+    logger.info("Ollama OCR request to %s model=%s images=%d", url, settings.OLLAMA_MODEL, len(images))
 
+    chunks, length, checked = [], 0, 0
+    final, status, error_detail = {}, 200, ""
+    sent = None
     try:
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            response = await client.post(
-                url,
-                json={
-                    "model": settings.OLLAMA_MODEL,
-                    "prompt": cfg["prompt"],
-                    "images": [b64_image],
-                    "stream": False,
-                },
-                headers={"Content-Type": "application/json"},
-            )
+        async with ocr_scheduler.slot(cost=float(len(images))):
+            with span("ollama.generate", model=settings.OLLAMA_MODEL, image_bytes=total_bytes,
+                      images=len(images), attempt=attempt):
+                async with httpx.AsyncClient(timeout=120.0) as client:
+                    async with client.stream(
+                        "POST",
+                        url,
+                        json={
+                            "model": settings.OLLAMA_MODEL,
+                            "prompt": prompt,
+                            "images": [base64.b64encode(image).decode("utf-8") for image in images],
+                            "stream": True,
+                            **_runtime_fields(cfg),
+                            "options": options,
+                        },
+                        headers=inject({"Content-Type": "application/json"}),
+                    ) as response:
+                        sent = time.monotonic()
+                        if response.status_code != 200:
+                            status = response.status_code
+                            error_detail = (await response.aread()).decode("utf-8", errors="replace")
+                        else:
+                            async for line in response.aiter_lines():
+                                if not line.strip():
+                                    continue
+                                data = json.loads(line)
+                                if data.get("error"):
+                                    status, error_detail = 500, data["error"]
+                                    break
+                                piece = data.get("response", "")
+                                if piece:
+                                    chunks.append(piece)
+                                    length += len(piece)
+                                if data.get("done"):
+                                    final = data
+                                    break
+                                if length - checked >= _LOOP_CHECK_EVERY:
+                                    checked = length
+                                    text = "".join(chunks)
+                                    cut = _find_loop(text)
+                                    if cut is not None:
+                                        _record_usage({}, len(chunks), sent)
+                                        return text[:cut], True
     except Exception as exc:
         logger.exception(
             "Ollama connection failed: %s: %s (cause: %r)",
@@ -51,14 +215,175 @@ async def extract_text_from_image(image_bytes: bytes) -> str:
         )
         raise RuntimeError(f"Ollama connection failed: {type(exc).__name__}: {exc}") from exc
 
-    if response.status_code != 200:
-        error_detail = response.text
-        logger.error("Ollama OCR error (HTTP %s): %s", response.status_code, error_detail)
-        raise RuntimeError(f"Ollama OCR failed (HTTP {response.status_code}): {error_detail}")
-    data = response.json()
-    raw = data.get("response", "")
-    for preamble in cfg["preambles"]:
-        if raw.startswith(preamble):
-            raw = raw[len(preamble):].lstrip("\n")
-            break
-    return raw.strip()
+    if status != 200:
+        logger.error("Ollama OCR error (HTTP %s): %s", status, error_detail)
+        raise RuntimeError(f"Ollama OCR failed (HTTP {status}): {error_detail}")
+
+    load_s = (final.get("load_duration") or 0) / 1e9
+    if load_s > 1.0:
+        # The model was not resident: this request paid the load
+        metrics.inc("ollama_cold_loads", model=settings.OLLAMA_MODEL)
+        logger.warning("Ollama loaded %s inside a request (%.1fs)", settings.OLLAMA_MODEL, load_s)
+    readiness.resident = True
+    _record_usage(final, len(chunks), sent)
+    if final.get("eval_count") is not None:
+        metrics.observe("ocr_generated_tokens", final["eval_count"], model=settings.OLLAMA_MODEL)
+    if final.get("done_reason") == "length":
+        metrics.inc("ocr_token_cap_hits", model=settings.OLLAMA_MODEL)
+
+    text = "".join(chunks)
+    cut = _find_loop(text)
+    return (text, False) if cut is None else (text[:cut], True)
+
+
+async def _generate(prompt: str, images: list[bytes]) -> str:
+    """Run OCR for ``images`` and return the raw response text.
+
+    Generation is capped by ``_token_cap`` and aborted as soon as it loops.
+    A looping request is retried once with a repeat penalty; if that loops
+    too, the longer of the two cut-off texts is kept.
+    """
+    cfg = _MODEL_CONFIGS.get(settings.OLLAMA_MODEL, _DEFAULT_CONFIG)
+    options = {**cfg["options"], "num_predict": _token_cap(images, cfg)}
+
+    text, looped = await _stream_generate(prompt, images, options, attempt=1)
+    if not looped:
+        return text
+
+    metrics.inc("ocr_runaway_detected", model=settings.OLLAMA_MODEL)
+    logger.warning("OCR output started looping after %d chars, retrying with a repeat penalty", len(text))
+    retry_text, looped = await _stream_generate(prompt, images, {**options, **_RETRY_OPTIONS}, attempt=2)
+    if not looped:
+        metrics.inc("ocr_runaway_recovered", model=settings.OLLAMA_MODEL)
+        return retry_text
+
+    metrics.inc("ocr_runaway_truncated", model=settings.OLLAMA_MODEL)
+    logger.warning("OCR retry looped as well, keeping the output up to the loop")
+    return max(text, retry_text, key=len)
+
+
+async def extract_text_from_image(image_bytes: bytes) -> str:
+    """Extract text from an image using Ollama vision model."""
+    cfg = _MODEL_CONFIGS.get(settings.OLLAMA_MODEL, _DEFAULT_CONFIG)
+    raw = await _generate(cfg["prompt"], [image_bytes])
+    return _strip_preambles(raw, cfg)
+
+
+def _split_pages(raw: str, count: int):
+    """Split a batched response on its page markers; None unless pages 1..count all appear in order."""
+    markers = list(_PAGE_MARKER.finditer(raw))
+    if [int(m.group(1)) for m in markers] != list(range(1, count + 1)):
+        return None
+    ends = [m.start() for m in markers[1:]] + [len(raw)]
+    return [raw[m.end():end] for m, end in zip(markers, ends)]
+
+
+async def extract_text_from_images(images: list[bytes]) -> list[str]:
+    """Extract text from several images, packing up to ``ocr_batch_size()`` per request.
+
+    The model is asked to precede each image's text with a page marker. If a
+    batched response cannot be split into the expected pages, that batch is
+    retried one image per request.
+    """
+    cfg = _MODEL_CONFIGS.get(settings.OLLAMA_MODEL, _DEFAULT_CONFIG)
+    batch_size = ocr_batch_size()
+    texts = []
+    for start in range(0, len(images), batch_size):
+        batch = images[start:start + batch_size]
+        if len(batch) == 1:
+            texts.append(await extract_text_from_image(batch[0]))
+            continue
+
+        raw = await _generate(cfg["prompt"] + _BATCH_INSTRUCTIONS.format(count=len(batch)), batch)
+        pages = _split_pages(raw, len(batch))
+        if pages is None:
+            logger.warning("Batched OCR response for %d images had no usable page markers, retrying singly", len(batch))
+            metrics.inc("ocr_batch_fallbacks")
+            pages = [await extract_text_from_image(image) for image in batch]
+        else:
+            pages = [_strip_preambles(page.strip(), cfg) for page in pages]
+        metrics.observe("ocr_batch_size", len(batch))
+        texts.extend(pages)
+    return texts
+
+
+class ModelReadiness:
+    """Whether the OCR model is loaded in Ollama, as last observed."""
+
+    def __init__(self):
+        self.resident = False
+        self.expires_at = None
+        self.checked_at = None
+        self.last_warmup_s = None
+        self.error = None
+
+    def as_dict(self) -> dict:
+        return {
+            "model": settings.OLLAMA_MODEL,
+            "resident": self.resident,
+            "expires_at": self.expires_at,
+            "checked_at": self.checked_at,
+            "last_warmup_s": self.last_warmup_s,
+            "error": self.error,
+        }
+
+
+readiness = ModelReadiness()
+
+
+def _same_model(name: str, model: str) -> bool:
+    # Ollama reports "name:tag"; an untagged model name means ":latest"
+    tagged = model if ":" in model else f"{model}:latest"
+    return name in (model, tagged)
+
+
+async def check_resident() -> bool:
+    """Ask Ollama (``/api/ps``) whether the OCR model is currently loaded."""
+    async with httpx.AsyncClient(timeout=10.0) as client:
+        response = await client.get(f"{settings.OLLAMA_URL}/api/ps")
+    response.raise_for_status()
+    loaded = [m for m in response.json().get("models", []) if _same_model(m.get("name", ""), settings.OLLAMA_MODEL)]
+    readiness.resident = bool(loaded)
+    readiness.expires_at = loaded[0].get("expires_at") if loaded else None
+    readiness.checked_at = datetime.now(timezone.utc).isoformat()
+    return readiness.resident
+
+
+async def warm_up() -> float:
+    """Load the OCR model with an empty prompt; returns the seconds it took."""
+    cfg = _MODEL_CONFIGS.get(settings.OLLAMA_MODEL, _DEFAULT_CONFIG)
+    start = time.monotonic()
+    with span("ollama.warmup", model=settings.OLLAMA_MODEL):
+        async with httpx.AsyncClient(timeout=600.0) as client:
+            response = await client.post(
+                f"{settings.OLLAMA_URL}/api/generate",
+                json={"model": settings.OLLAMA_MODEL, "prompt": "", "stream": False, **_runtime_fields(cfg)},
+            )
+    response.raise_for_status()
+    elapsed = time.monotonic() - start
+    readiness.last_warmup_s = elapsed
+    metrics.observe("ollama_warmup_s", elapsed, model=settings.OLLAMA_MODEL)
+    return elapsed
+
+
+async def ensure_warm() -> bool:
+    """Load the OCR model unless Ollama already has it resident."""
+    try:
+        if not await check_resident():
+            logger.info("OCR model %s is not loaded, warming up", settings.OLLAMA_MODEL)
+            elapsed = await warm_up()
+            logger.info("OCR model %s loaded in %.1fs", settings.OLLAMA_MODEL, elapsed)
+            await check_resident()
+        readiness.error = None
+    except Exception as exc:
+        readiness.resident = False
+        readiness.error = f"{type(exc).__name__}: {exc}"
+        logger.warning("OCR model warm-up failed: %s", readiness.error)
+    return readiness.resident
+
+
+async def keep_warm(interval: float) -> None:
+    """Background task: re-check residency every ``interval`` seconds and reload when evicted."""
+    while True:
+        await ensure_warm()
+        await asyncio.sleep(interval)
@@ -1,26 +1,176 @@
+import logging
+from typing import Optional
+
 import fitz  # PyMuPDF
 
-from app.services.ocr import extract_text_from_image
+from app import metrics
+from app.config import settings
+from app.services import prefilter
+from app.services.ocr import extract_text_from_image, extract_text_from_images, ocr_batch_size
+from app.tracing import span
+
+logger = logging.getLogger(__name__)
+
+MIN_REGION_PT = 36  # images smaller than half an inch are decoration
+TEXT_LAYER_DENSITY = 5  # characters per square inch over an image that mean it already has a text layer
+
+
+def count_pages(pdf_bytes: bytes) -> int:
+    """Return the number of pages in a PDF (0 if it cannot be opened)."""
+    try:
+        with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+            return len(doc)
+    except Exception:
+        return 0
+
+
+def _grow(rect: fitz.Rect, d: float) -> fitz.Rect:
+    return fitz.Rect(rect.x0 - d, rect.y0 - d, rect.x1 + d, rect.y1 + d)
+
+
+def _image_regions(page: "fitz.Page") -> list[tuple[fitz.Rect, float]]:
+    """Bounding boxes of the images drawn on a page with their native DPI.
+
+    Tiny images (logos, bullets) are ignored and images that touch without
+    overlapping, such as a scan stored as strips, are merged into one region.
+    An image drawn on top of another (a scan over a letterhead) stays separate.
+    """
+    regions = []
+    for info in page.get_image_info():
+        bbox = fitz.Rect(info["bbox"])
+        rect = bbox & page.rect
+        if rect.width < MIN_REGION_PT or rect.height < MIN_REGION_PT:
+            continue
+        native_dpi = 72 * max(info["width"] / max(bbox.width, 1), info["height"] / max(bbox.height, 1))
+        regions.append((rect, native_dpi))
+
+    merged = True
+    while merged:
+        merged = False
+        for a in range(len(regions)):
+            for b in range(a + 1, len(regions)):
+                ra, rb = regions[a][0], regions[b][0]
+                overlap = (ra & rb).get_area() if ra.intersects(rb) else 0.0
+                if _grow(ra, 2).intersects(rb) and overlap < 0.1 * min(ra.get_area(), rb.get_area()):
+                    regions[a] = (ra | rb, max(regions[a][1], regions[b][1]))
+                    del regions[b]
+                    merged = True
+                    break
+            if merged:
+                break
+    return regions
+
+
+def _region_dpi(rect: fitz.Rect, native_dpi: Optional[float]) -> int:
+    """Resolution that gives the vision model about OCR_TARGET_PIXELS on the long side.
+
+    Never upsamples past the embedded image's own resolution and stays within
+    OCR_MIN_DPI..OCR_MAX_DPI.
+    """
+    dpi = min(settings.OCR_TARGET_PIXELS * 72 / max(rect.width, rect.height, 1), settings.OCR_MAX_DPI)
+    if native_dpi:
+        dpi = min(dpi, native_dpi)
+    return int(max(dpi, settings.OCR_MIN_DPI))
+
+
+def _layout(page: "fitz.Page") -> tuple[list[tuple[fitz.Rect, str]], list[tuple[fitz.Rect, int]]]:
+    """Split a page into native text blocks and image regions that need OCR."""
+    blocks = [
+        (fitz.Rect(b[:4]), b[4].strip())
+        for b in page.get_text("blocks")
+        if b[6] == 0 and b[4].strip()
+    ]
+
+    regions = []
+    for rect, native_dpi in _image_regions(page):
+        # Scans with an OCR text layer (searchable PDFs) already have their text
+        chars = sum(len(text) * (block & rect).get_area() / max(block.get_area(), 1) for block, text in blocks)
+        if chars >= TEXT_LAYER_DENSITY * rect.get_area() / (72 * 72):
+            continue
+        regions.append((rect, _region_dpi(rect, native_dpi)))
+
+    # An image inside another image that is OCR'd anyway would be read twice
+    regions = [
+        (rect, dpi) for n, (rect, dpi) in enumerate(regions)
+        if not any(m != n and other.contains(rect) for m, (other, _) in enumerate(regions))
+    ]
+
+    if not regions and sum(len(text) for _, text in blocks) < 10:
+        # No text and no images: text drawn as vector outlines, OCR the whole page
+        regions.append((page.rect, _region_dpi(page.rect, None)))
+
+    # Text inside an OCR'd region is read again by the model
+    blocks = [(rect, text) for rect, text in blocks if not any(r.contains(rect) for r, _ in regions)]
+    return blocks, regions
+
+
+def _render(doc: "fitz.Document", page_num: int, rect: fitz.Rect, dpi: int) -> bytes:
+    with span("pdf.render", page=page_num, dpi=dpi) as s:
+        pix = doc[page_num].get_pixmap(dpi=dpi, clip=rect)
+        image_bytes = pix.tobytes("png")
+        if s is not None:
+            s.set_attribute("pixels", pix.width * pix.height)
+    metrics.inc("ocr_pixels_sent", pix.width * pix.height)
+    return image_bytes
 
 
 async def extract_from_pdf(pdf_bytes: bytes) -> str:
-    """Extract text from a PDF. Uses OCR for scanned (image-only) pages."""
-    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-    all_text = []
+    """Extract text from a PDF, keeping native text and OCR'ing only image regions.
 
+    Each page is split into text blocks and image regions. Image regions
+    without a text layer are cropped and rendered at a DPI that depends on
+    their size, then OCR'd (several per request when the model supports
+    batching); the results are merged back in reading order.
+    Blank regions are skipped and near-duplicate regions reuse the text of
+    the one they repeat (see ``prefilter``).
+    """
+    with span("pdf.open", bytes=len(pdf_bytes)):
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+
+    pages = []  # per page: [(y0, x0, text or index into regions)]
+    regions = []  # (page_num, rect, dpi)
     for page_num in range(len(doc)):
-        page = doc[page_num]
-        text = page.get_text().strip()
+        with span("pdf.text", page=page_num):
+            blocks, page_regions = _layout(doc[page_num])
+        items = [(rect.y0, rect.x0, text) for rect, text in blocks]
+        for rect, dpi in page_regions:
+            items.append((rect.y0, rect.x0, len(regions)))
+            regions.append((page_num, rect, dpi))
+        pages.append(sorted(items, key=lambda item: (item[0], item[1])))
+
+    with span("pdf.prefilter", regions=len(regions)):
+        blank, duplicate_of = prefilter.analyze(
+            [prefilter.thumbnail_from_page(doc[page_num], clip=rect) for page_num, rect, _ in regions]
+        )
+
+    # Regions are rendered and OCR'd one vision request (batch) at a time
+    ocr_texts = [""] * len(regions)
+    pending = [k for k in range(len(regions)) if not blank[k] and duplicate_of[k] == -1]
+    batch_size = ocr_batch_size()
+    for start in range(0, len(pending), batch_size):
+        chunk = pending[start:start + batch_size]
+        images = [_render(doc, *regions[k]) for k in chunk]
+        if len(images) == 1:
+            texts = [await extract_text_from_image(images[0])]
+        else:
+            texts = await extract_text_from_images(images)
+        for k, text in zip(chunk, texts):
+            ocr_texts[k] = text
 
-        if len(text) < 10:
-            # Page has little or no text -- likely a scanned image.
-            # Render page to an image and OCR it.
-            pix = page.get_pixmap(dpi=300)
-            image_bytes = pix.tobytes("png")
-            text = await extract_text_from_image(image_bytes)
+    for k in range(len(regions)):
+        if blank[k]:
+            metrics.inc("ocr_calls_avoided", reason="blank")
+        elif duplicate_of[k] != -1:
+            metrics.inc("ocr_calls_avoided", reason="duplicate")
+            ocr_texts[k] = ocr_texts[duplicate_of[k]]
 
-        if text:
-            all_text.append(text)
+    skipped = sum(blank) + sum(1 for d in duplicate_of if d != -1)
+    if skipped:
+        logger.info("PDF prefilter skipped %d of %d OCR regions", skipped, len(regions))
 
     doc.close()
-    return "\n\n".join(all_text)
+    page_texts = []
+    for items in pages:
+        parts = [ocr_texts[ref] if isinstance(ref, int) else ref for _, _, ref in items]
+        page_texts.append("\n".join(part for part in parts if part))
+    return "\n\n".join(text for text in page_texts if text)
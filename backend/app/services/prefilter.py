@@ -0,0 +1,153 @@
+"""Cheap pre-OCR checks for blank pages and near-duplicate scans.
+
+Each page or image is reduced to a small grayscale thumbnail and all
+thumbnails of a document are analysed together with NumPy: ink coverage flags
+blank pages, and a DCT perceptual hash confirmed by thumbnail correlation
+finds re-scans of an earlier page whose OCR text can be reused. Uploads that
+arrive one photo at a time use ``compare_last``, which checks each new
+thumbnail against the earlier ones without analysing them again.
+"""
+import io
+from dataclasses import dataclass, field
+from typing import Optional, Sequence
+
+import fitz  # PyMuPDF
+import numpy as np
+from PIL import Image
+
+from app.config import settings
+
+THUMB_SIZE = 512  # ~60 DPI on A4, enough to see a single short line of text
+CORR_SIZE = 128
+HASH_INPUT = 32
+HASH_SIZE = 8
+INK_CONTRAST = 60  # grey levels below the page background that count as ink
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    m = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2 / n)
+    m[0] /= np.sqrt(2)
+    return m
+
+
+_DCT = _dct_matrix(HASH_INPUT)
+
+
+def thumbnail_from_image(image_bytes: bytes) -> Optional[np.ndarray]:
+    """Decode an image into a square grayscale thumbnail (None if undecodable)."""
+    try:
+        img = Image.open(io.BytesIO(image_bytes))
+        img.draft("L", (THUMB_SIZE * 2, THUMB_SIZE * 2))  # JPEG: downscale while decoding
+        img = img.convert("L").resize((THUMB_SIZE, THUMB_SIZE), Image.BILINEAR)
+        return np.asarray(img, dtype=np.uint8)
+    except Exception:
+        return None
+
+
+def thumbnail_from_page(page: "fitz.Page", clip: Optional["fitz.Rect"] = None) -> Optional[np.ndarray]:
+    """Render a PDF page (or the ``clip`` region of it) to a square grayscale thumbnail."""
+    try:
+        rect = clip if clip is not None else page.rect
+        matrix = fitz.Matrix(THUMB_SIZE / rect.width, THUMB_SIZE / rect.height)
+        pix = page.get_pixmap(matrix=matrix, clip=rect, colorspace=fitz.csGRAY, alpha=False)
+        img = Image.frombytes("L", (pix.width, pix.height), pix.samples)
+        if img.size != (THUMB_SIZE, THUMB_SIZE):
+            img = img.resize((THUMB_SIZE, THUMB_SIZE), Image.BILINEAR)
+        return np.asarray(img, dtype=np.uint8)
+    except Exception:
+        return None
+
+
+def _block_mean(x: np.ndarray, size: int) -> np.ndarray:
+    f = x.shape[1] // size
+    return x.reshape(len(x), size, f, size, f).mean(axis=(2, 4), dtype=np.float32)
+
+
+def _features(x: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Blank flags, perceptual hash bits and unit correlation vectors of stacked (N, T, T) thumbnails."""
+    n = len(x)
+
+    # Ink coverage: share of pixels clearly darker than the page background
+    background = np.median(x.reshape(n, -1), axis=1).astype(np.int16)
+    ink = (x < (background - INK_CONTRAST)[:, None, None]).mean(axis=(1, 2))
+    is_blank = ink < settings.PREFILTER_BLANK_INK
+
+    # DCT perceptual hash: sign of the lowest frequencies against their median
+    low = (_DCT @ _block_mean(x, HASH_INPUT) @ _DCT.T)[:, :HASH_SIZE, :HASH_SIZE].reshape(n, -1)[:, 1:]
+    bits = low > np.median(low, axis=1, keepdims=True)
+
+    # The hash only sees layout; correlation rejects same-template pages with different text
+    flat = _block_mean(x, CORR_SIZE).reshape(n, -1)
+    flat -= flat.mean(axis=1, keepdims=True)
+    norms = np.linalg.norm(flat, axis=1)
+    norms[norms == 0] = 1.0
+    return is_blank, bits, flat / norms[:, None]
+
+
+def _similar(hamming: np.ndarray, corr: np.ndarray) -> np.ndarray:
+    return (hamming <= settings.PREFILTER_DUP_HAMMING) & (corr >= settings.PREFILTER_DUP_CORRELATION)
+
+
+def analyze(thumbs: Sequence[Optional[np.ndarray]]) -> tuple[list[bool], list[int]]:
+    """Classify the thumbnails of one document or upload.
+
+    Returns ``(blank, duplicate_of)``: ``blank[i]`` is True for pages without
+    meaningful ink and ``duplicate_of[i]`` is the index of an earlier page that
+    ``i`` is a near-duplicate of, or -1. Missing thumbnails are never skipped.
+    """
+    blank = [False] * len(thumbs)
+    duplicate_of = [-1] * len(thumbs)
+    valid = [i for i, t in enumerate(thumbs) if t is not None]
+    if not valid:
+        return blank, duplicate_of
+
+    is_blank, bits, flat = _features(np.stack([thumbs[i] for i in valid]))  # from (V, T, T) uint8
+    similar = _similar((bits[:, None, :] != bits[None, :, :]).sum(axis=2), flat @ flat.T)
+    for a, i in enumerate(valid):
+        if is_blank[a]:
+            blank[i] = True
+            continue
+        for b in np.flatnonzero(similar[a, :a]):
+            j = valid[b]
+            if not blank[j] and duplicate_of[j] == -1:
+                duplicate_of[i] = j
+                break
+    return blank, duplicate_of
+
+
+@dataclass
+class Seen:
+    """The earlier thumbnails of an upload that a new one can be a duplicate of."""
+
+    count: int = 0  # thumbnails compared so far, including missing ones
+    index: list[int] = field(default_factory=list)
+    bits: list[np.ndarray] = field(default_factory=list)
+    flat: list[np.ndarray] = field(default_factory=list)
+
+
+def compare_last(seen: Seen, thumb: Optional[np.ndarray]) -> tuple[bool, int]:
+    """Classify ``thumb`` as the next thumbnail after ``seen``, and remember it.
+
+    Returns ``(blank, duplicate_of)`` as ``analyze`` would for the last of all
+    the thumbnails so far, comparing only against the earlier pages that can
+    be duplicated (neither blank nor duplicates themselves).
+    """
+    i = seen.count
+    seen.count += 1
+    if thumb is None:
+        return False, -1
+    is_blank, bits, flat = _features(thumb[None])
+    if is_blank[0]:
+        return True, -1
+    if seen.index:
+        hamming = (np.stack(seen.bits) != bits).sum(axis=1)
+        corr = np.stack(seen.flat) @ flat[0]
+        match = np.flatnonzero(_similar(hamming, corr))
+        if len(match):
+            return False, seen.index[match[0]]
+    seen.index.append(i)
+    seen.bits.append(bits[0])
+    seen.flat.append(flat[0])
+    return False, -1
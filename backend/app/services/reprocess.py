@@ -0,0 +1,304 @@
+"""Re-run OCR or translation on stored report files after a model or agent change.
+
+Each ``Translation`` records the ``OLLAMA_MODEL`` and ``TRANSLATOR_AGENT_ID``
+it was made with. A reprocess job selects report files by those, or by
+date, and writes a new, higher ``version`` of each file's translation next
+to the old ones; the record detail lists every version, newest first, so
+they can be compared. In ``ocr`` mode the stored file is OCR'd and
+translated again; in ``translate`` mode the current OCR text is only
+translated again. A file whose OCR failed is OCR'd again in either mode,
+rather than translating the error text.
+
+Files are selected when the job is created and each one's status is
+stored as it finishes, so ``resume`` picks up where a stopped job left
+off. Jobs run ``--concurrency`` files at a time, started at most
+``--per-minute`` per minute, as their own scheduler user (see
+``SCHEDULER_USER_WEIGHTS``) so interactive uploads keep priority.
+
+Usage (from ``backend/``)::
+
+    python -m app.services.reprocess start --mode ocr --stale --username batch
+    python -m app.services.reprocess start --mode translate --agent 3 --since 2025-01-01 --username batch
+    python -m app.services.reprocess resume 4 --username batch
+    python -m app.services.reprocess status 4
+"""
+import argparse
+import asyncio
+import getpass
+import json
+import logging
+import os
+import time
+from datetime import date, datetime, timedelta
+from typing import Callable, Optional
+
+from sqlalchemy import func, insert, or_, select, update
+from sqlalchemy.orm import Session, undefer
+
+from app import metrics
+from app.config import settings
+from app.models import (
+    PREVIEW_CHARS, Record, ReprocessItem, ReprocessJob, Translation, UploadedFile, UpstreamUsage,
+)
+from app.services import blobs, langid, usage
+from app.services.ocr import extract_text_from_image
+from app.services.pdf import extract_from_pdf
+from app.services.scheduler import JobContext, job_context
+from app.services.uppermind import translate
+
+logger = logging.getLogger(__name__)
+
+MODES = ("ocr", "translate")
+
+
+def _ocr_model():
+    """The OCR model of a translation; rows from before it was recorded fall back to their usage."""
+    recorded = (
+        select(UpstreamUsage.model)
+        .where(UpstreamUsage.translation_id == Translation.id, UpstreamUsage.stage == "ocr")
+        .limit(1)
+        .scalar_subquery()
+    )
+    return func.coalesce(Translation.ocr_model, recorded)
+
+
+def select_files(db: Session, mode: str, ocr_model: Optional[str] = None, agent_id: Optional[int] = None,
+                 since: Optional[date] = None, until: Optional[date] = None, stale: bool = False) -> list[int]:
+    """Ids of report files whose current translation matches every given filter.
+
+    ``stale`` matches translations not made with the current ``OLLAMA_MODEL``
+    (``ocr`` mode) or ``TRANSLATOR_AGENT_ID`` (``translate`` mode), and files
+    whose OCR or translation failed; ``since`` and ``until`` are inclusive
+    dates on the translation's creation time.
+    """
+    latest = (
+        select(Translation.file_id, func.max(Translation.version).label("version"))
+        .group_by(Translation.file_id)
+        .subquery()
+    )
+    query = (
+        db.query(Translation.file_id)
+        .join(latest, (latest.c.file_id == Translation.file_id) & (latest.c.version == Translation.version))
+        .join(UploadedFile, UploadedFile.id == Translation.file_id)
+        .join(Record, Record.id == UploadedFile.record_id)
+        .filter(Record.record_type == "report")
+    )
+    if ocr_model is not None:
+        query = query.filter(_ocr_model() == ocr_model)
+    if agent_id is not None:
+        query = query.filter(Translation.translator_agent_id == agent_id)
+    if since is not None:
+        query = query.filter(Translation.created_at >= datetime.combine(since, datetime.min.time()))
+    if until is not None:
+        query = query.filter(Translation.created_at < datetime.combine(until + timedelta(days=1), datetime.min.time()))
+    if stale and mode == "ocr":
+        query = query.filter(or_(
+            UploadedFile.status == "failed", _ocr_model().is_(None), _ocr_model() != settings.OLLAMA_MODEL,
+        ))
+    elif stale:
+        query = query.filter(or_(
+            UploadedFile.status == "failed", Translation.translator_agent_id.is_(None),
+            Translation.translator_agent_id != settings.TRANSLATOR_AGENT_ID,
+        ))
+    return sorted({file_id for (file_id,) in query.all()})
+
+
+def create_job(db: Session, mode: str, created_by: str, **criteria) -> ReprocessJob:
+    """Store a job for the files ``select_files`` picks with ``criteria``."""
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of: {', '.join(MODES)}")
+    file_ids = select_files(db, mode, **criteria)
+    job = ReprocessJob(mode=mode, criteria=json.dumps(criteria, default=str), created_by=created_by)
+    db.add(job)
+    db.flush()
+    db.bulk_insert_mappings(ReprocessItem, [{"job_id": job.id, "file_id": fid} for fid in file_ids])
+    db.commit()
+    return job
+
+
+def progress(db: Session, job_id: int) -> Optional[dict]:
+    """Counts and throughput of a job, None if it does not exist."""
+    job = db.get(ReprocessJob, job_id)
+    if job is None:
+        return None
+    counts = dict(
+        db.query(ReprocessItem.status, func.count()).filter(ReprocessItem.job_id == job_id)
+        .group_by(ReprocessItem.status).all()
+    )
+    result = {
+        "id": job.id,
+        "mode": job.mode,
+        "criteria": json.loads(job.criteria),
+        "status": job.status,
+        "files": {"total": sum(counts.values()), "done": counts.get("done", 0), "failed": counts.get("failed", 0),
+                  "pending": counts.get("pending", 0)},
+        "files_per_hour": None,
+    }
+    if job.started_at is not None:
+        elapsed = max(((job.finished_at or datetime.utcnow()) - job.started_at).total_seconds(), 1e-3)
+        finished_this_run = (
+            db.query(func.count()).select_from(ReprocessItem)
+            .filter(ReprocessItem.job_id == job_id, ReprocessItem.finished_at >= job.started_at).scalar()
+        )
+        result["elapsed_s"] = round(elapsed, 1)
+        result["files_per_hour"] = round(finished_this_run / elapsed * 3600, 1)
+    return result
+
+
+async def _translate(text: str, token: str) -> tuple[str, int]:
+    """Translate ``text`` the way uploads do; returns it and the Turkish segments passed through."""
+    if not text.strip():
+        return text, 0
+    pieces = langid.plan(text) if settings.LANGID_SKIP_TURKISH else [(text, True)]
+    skipped = sum(1 for piece, foreign in pieces if not foreign and piece.strip())
+    translated = iter(await asyncio.gather(*(translate(piece, token) for piece, foreign in pieces if foreign)))
+    return "".join(next(translated) if foreign else piece for piece, foreign in pieces), skipped
+
+
+async def _reprocess(item_id: int, file_id: int, mode: str, token: str,
+                     session_factory: Callable[[], Session]) -> int:
+    """Write the next translation version of one file; returns its id."""
+    with session_factory() as db:
+        uploaded = db.get(UploadedFile, file_id)
+        current = (
+            db.query(Translation).options(undefer(Translation.original_text))
+            .filter(Translation.file_id == file_id)
+            .order_by(Translation.version.desc()).first()
+        )
+        ext, version = uploaded.file_type, current.version + 1
+        ocr_text, ocr_model = current.original_text, current.ocr_model
+        # A failed OCR stored its error as the text and no model
+        redo_ocr = mode == "ocr" or (uploaded.status == "failed" and ocr_model is None)
+        db.expunge(uploaded)
+    content = await asyncio.to_thread(blobs.read, uploaded) if redo_ocr else None
+
+    ocr_ms = None
+    with usage.metering() as meter:
+        if redo_ocr:
+            start = time.monotonic()
+            ocr_text = await (extract_from_pdf(content) if ext == "pdf" else extract_text_from_image(content))
+            ocr_ms, ocr_model = int((time.monotonic() - start) * 1000), settings.OLLAMA_MODEL
+            content = None
+        start = time.monotonic()
+        translated, skipped = await _translate(ocr_text, token)
+        translate_ms = int((time.monotonic() - start) * 1000)
+
+    with session_factory() as db:
+        translation_id = db.scalar(insert(Translation).returning(Translation.id).values(
+            file_id=file_id, version=version, original_text=ocr_text, translated_text=translated,
+            translated_preview=translated[:PREVIEW_CHARS], ocr_duration_ms=ocr_ms,
+            translation_duration_ms=translate_ms, translation_calls_skipped=skipped,
+            ocr_model=ocr_model, translator_agent_id=settings.TRANSLATOR_AGENT_ID,
+        ))
+        rows = [{**row, "translation_id": translation_id} for row in usage.rows(meter)]
+        if rows:
+            db.execute(insert(UpstreamUsage), rows)
+        db.execute(update(UploadedFile).where(UploadedFile.id == file_id).values(status="translated"))
+        db.execute(update(ReprocessItem).where(ReprocessItem.id == item_id).values(
+            status="done", translation_id=translation_id, error=None, finished_at=datetime.utcnow(),
+        ))
+        db.commit()
+    return translation_id
+
+
+async def run_job(job_id: int, user: dict, session_factory: Callable[[], Session], concurrency: int = 0,
+                  per_minute: float = 0) -> None:
+    """Reprocess the job's files that are not done yet, ``concurrency`` at a time."""
+    concurrency = concurrency or settings.REPROCESS_CONCURRENCY
+    per_minute = per_minute or settings.REPROCESS_PER_MINUTE
+    with session_factory() as db:
+        job = db.get(ReprocessJob, job_id)
+        if job is None:
+            raise ValueError(f"No reprocess job {job_id}")
+        mode = job.mode
+        items = db.query(ReprocessItem.id, ReprocessItem.file_id).filter(
+            ReprocessItem.job_id == job_id, ReprocessItem.status != "done",
+        ).order_by(ReprocessItem.id).all()
+        job.status, job.started_at, job.finished_at = "running", datetime.utcnow(), None
+        db.commit()
+
+    username = user.get("username", user.get("email", "unknown"))
+    queue = iter(items)
+    interval = 60 / per_minute if per_minute > 0 else 0
+    next_start = [time.monotonic()]
+
+    async def consume():
+        for item_id, file_id in queue:
+            # Space the starts out to stay within the per-minute budget
+            wait = next_start[0] - time.monotonic()
+            next_start[0] = max(next_start[0], time.monotonic()) + interval
+            if wait > 0:
+                await asyncio.sleep(wait)
+            try:
+                with job_context(JobContext(user=username, upload=f"reprocess-{job_id}")):
+                    await _reprocess(item_id, file_id, mode, user.get("token", ""), session_factory)
+                metrics.inc("reprocess_files", mode=mode)
+            except Exception as exc:
+                logger.exception("Reprocessing file %d for job %d failed", file_id, job_id)
+                metrics.inc("reprocess_failures", mode=mode)
+                with session_factory() as db:
+                    db.execute(update(ReprocessItem).where(ReprocessItem.id == item_id).values(
+                        status="failed", error=repr(exc), finished_at=datetime.utcnow(),
+                    ))
+                    db.commit()
+
+    await asyncio.gather(*(consume() for _ in range(max(concurrency, 1))))
+
+    with session_factory() as db:
+        job = db.get(ReprocessJob, job_id)
+        job.status, job.finished_at = "complete", datetime.utcnow()
+        db.commit()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.services.reprocess", description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_start = sub.add_parser("start", help="select files and reprocess them")
+    p_start.add_argument("--mode", choices=MODES, required=True)
+    p_start.add_argument("--ocr-model", default=None, help="files OCR'd with this model")
+    p_start.add_argument("--agent", type=int, default=None, help="files translated by this agent id")
+    p_start.add_argument("--since", type=date.fromisoformat, default=None, help="translations made on or after (YYYY-MM-DD)")
+    p_start.add_argument("--until", type=date.fromisoformat, default=None, help="translations made on or before")
+    p_start.add_argument("--stale", action="store_true", help="files not made with the current model/agent")
+    p_start.add_argument("--dry-run", action="store_true", help="only count the files that would be reprocessed")
+    p_resume = sub.add_parser("resume", help="reprocess the files of a job that are not done yet")
+    p_resume.add_argument("job_id", type=int)
+    p_status = sub.add_parser("status", help="print a job's progress")
+    p_status.add_argument("job_id", type=int)
+    for p in (p_start, p_resume):
+        p.add_argument("--username", required=True, help="UpperMind user to translate as")
+        p.add_argument("--concurrency", type=int, default=0, help="files at a time (default REPROCESS_CONCURRENCY)")
+        p.add_argument("--per-minute", type=float, default=0, help="files started per minute (default REPROCESS_PER_MINUTE)")
+    args = parser.parse_args(argv)
+
+    from app.database import SessionLocal, init_db
+    from app.services.uppermind import login
+
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    db = SessionLocal()
+    try:
+        if args.command == "status":
+            print(json.dumps(progress(db, args.job_id), indent=2))
+            return
+        if args.command == "start":
+            criteria = {"ocr_model": args.ocr_model, "agent_id": args.agent, "since": args.since,
+                        "until": args.until, "stale": args.stale}
+            if args.dry_run:
+                print(f"{len(select_files(db, args.mode, **criteria))} files match")
+                return
+        password = os.environ.get("UPPERMIND_PASSWORD") or getpass.getpass(f"UpperMind password for {args.username}: ")
+        user = asyncio.run(login(args.username, password))
+        if args.command == "start":
+            job_id = create_job(db, args.mode, user.get("username", args.username), **criteria).id
+            print(f"created reprocess job {job_id}; resume with: python -m app.services.reprocess resume {job_id}")
+        else:
+            job_id = args.job_id
+        asyncio.run(run_job(job_id, user, SessionLocal, args.concurrency, args.per_minute))
+        print(json.dumps(progress(db, job_id), indent=2))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
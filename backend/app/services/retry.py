@@ -0,0 +1,69 @@
+"""Retry primitives shared by upstream clients: budget, backoff and latency window."""
+import random
+import time
+from collections import deque
+from typing import Optional
+
+from app import metrics
+
+
+class RetryBudget:
+    """Caps retries and hedges to a fraction of recent traffic.
+
+    Every first attempt deposits ``ratio`` tokens and a trickle of
+    ``min_per_s`` tokens keeps low-traffic periods able to retry; each retry
+    or hedge spends a whole token. During an outage the bucket drains and
+    calls fail fast instead of multiplying load on a struggling backend.
+    """
+
+    def __init__(self, name: str, ratio: float, min_per_s: float, cap: float = 10.0, clock=time.monotonic):
+        self.name = name
+        self.ratio = ratio
+        self.min_per_s = min_per_s
+        self.cap = cap
+        self.clock = clock
+        self.tokens = cap
+        self.updated = clock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self.tokens = min(self.cap, self.tokens + (now - self.updated) * self.min_per_s)
+        self.updated = now
+
+    def deposit(self) -> None:
+        self._refill()
+        self.tokens = min(self.cap, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        self._refill()
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        metrics.inc("retry_budget_exhausted", budget=self.name)
+        return False
+
+
+def backoff_delay(attempt: int, base: float, cap: float, retry_after: Optional[float] = None) -> float:
+    """Full-jitter exponential backoff for retry ``attempt`` (0-based), honouring Retry-After."""
+    delay = random.uniform(0, min(cap, base * 2 ** attempt))
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, cap))
+    return delay
+
+
+class LatencyWindow:
+    """Recent latency samples for picking a hedge delay."""
+
+    def __init__(self, size: int = 200, min_samples: int = 20):
+        self.samples: deque[float] = deque(maxlen=size)
+        self.min_samples = min_samples
+
+    def add(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """The ``q`` quantile of the window, or None until enough samples are in."""
+        if len(self.samples) < self.min_samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
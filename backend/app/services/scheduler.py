@@ -0,0 +1,194 @@
+import asyncio
+import contextvars
+import logging
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from typing import Callable, Optional, Union
+
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class JobContext:
+    """Who a unit of GPU work belongs to."""
+    user: str = "anonymous"
+    upload: Optional[Union[int, str]] = None
+    small: bool = False  # single-page jobs go through the priority lane
+
+
+_job_context: contextvars.ContextVar[JobContext] = contextvars.ContextVar("job_context", default=JobContext())
+
+
+@contextmanager
+def job_context(ctx: JobContext):
+    """Attribute scheduler calls made inside the block (and tasks created in it) to ``ctx``."""
+    token = _job_context.set(ctx)
+    try:
+        yield ctx
+    finally:
+        _job_context.reset(token)
+
+
+def current_job() -> JobContext:
+    return _job_context.get()
+
+
+class _Job:
+    __slots__ = ("ctx", "cost", "future", "enqueued_at")
+
+    def __init__(self, ctx: JobContext, cost: float, future: asyncio.Future):
+        self.ctx = ctx
+        self.cost = cost
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+
+class _UserQueue:
+    def __init__(self, weight: float):
+        self.weight = max(weight, 0.01)
+        self.deficit = 0.0
+        self.uploads: OrderedDict = OrderedDict()  # upload -> deque[_Job]
+
+    def head(self) -> Optional[_Job]:
+        for jobs in self.uploads.values():
+            while jobs and jobs[0].future.done():
+                jobs.popleft()  # cancelled while queued
+            if jobs:
+                return jobs[0]
+        return None
+
+    def pop(self) -> _Job:
+        upload, jobs = next((u, j) for u, j in self.uploads.items() if j)
+        job = jobs.popleft()
+        # Round-robin across this user's uploads
+        del self.uploads[upload]
+        if jobs:
+            self.uploads[upload] = jobs
+        return job
+
+    def compact(self) -> None:
+        for upload in [u for u, j in self.uploads.items() if not j]:
+            del self.uploads[upload]
+
+
+class FairScheduler:
+    """Fair-share dispatcher for GPU-bound upstream calls.
+
+    Jobs are queued per user and, within a user, per upload. Users are served
+    by deficit round robin (each visit adds ``quantum * weight`` to the user's
+    budget and a job runs once the budget covers its cost); a user's uploads
+    take turns. Jobs flagged ``small`` skip the fair queues through a priority
+    lane so single-page requests stay interactive under heavy batch load. At
+    most ``capacity()`` jobs run at once.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        capacity: Union[int, Callable[[], int]],
+        quantum: float = 1.0,
+        weights: Optional[dict] = None,
+        small_cost: float = 1.0,
+    ):
+        self.name = name
+        self._capacity = capacity if callable(capacity) else (lambda: capacity)
+        self.quantum = quantum
+        self.weights = weights or {}
+        self.small_cost = small_cost
+        self.in_flight = 0
+        self._priority: deque[_Job] = deque()
+        self._users: OrderedDict[str, _UserQueue] = OrderedDict()
+
+        metrics.register_gauge("scheduler_in_flight", lambda: self.in_flight, scheduler=name)
+        metrics.register_gauge("scheduler_queued", lambda: self.queued, scheduler=name)
+
+    @property
+    def queued(self) -> int:
+        count = sum(1 for j in self._priority if not j.future.done())
+        for uq in self._users.values():
+            count += sum(1 for jobs in uq.uploads.values() for j in jobs if not j.future.done())
+        return count
+
+    def queued_for(self, user: str) -> int:
+        uq = self._users.get(user)
+        return sum(1 for jobs in uq.uploads.values() for j in jobs if not j.future.done()) if uq else 0
+
+    def _enqueue(self, job: _Job) -> None:
+        if job.ctx.small and job.cost <= self.small_cost:
+            self._priority.append(job)
+            return
+        uq = self._users.get(job.ctx.user)
+        if uq is None:
+            uq = self._users[job.ctx.user] = _UserQueue(self.weights.get(job.ctx.user, 1.0))
+        uq.uploads.setdefault(job.ctx.upload, deque()).append(job)
+
+    def _next_job(self) -> Optional[_Job]:
+        while self._priority:
+            job = self._priority.popleft()
+            if not job.future.done():
+                return job
+
+        while self._users:
+            user, uq = next(iter(self._users.items()))
+            head = uq.head()
+            if head is None:
+                # Idle users lose their accumulated budget
+                del self._users[user]
+                continue
+            if uq.deficit < head.cost:
+                uq.deficit += self.quantum * uq.weight
+                self._users.move_to_end(user)
+                continue
+            job = uq.pop()
+            uq.deficit -= job.cost
+            uq.compact()
+            return job
+        return None
+
+    def _dispatch(self) -> None:
+        while self.in_flight < max(1, self._capacity()):
+            job = self._next_job()
+            if job is None:
+                return
+            self.in_flight += 1
+            job.future.set_result(None)
+
+    def _done(self) -> None:
+        self.in_flight -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, cost: float = 1.0):
+        """Wait for this job's turn, then hold a slot for the enclosed call."""
+        ctx = _job_context.get()
+        job = _Job(ctx, cost, asyncio.get_running_loop().create_future())
+        self._enqueue(job)
+        self._dispatch()
+        try:
+            await job.future
+        except asyncio.CancelledError:
+            if job.future.done() and not job.future.cancelled():
+                self._done()  # dispatched just as we were cancelled
+            raise
+
+        wait = time.monotonic() - job.enqueued_at
+        metrics.observe("scheduler_queue_wait_s", wait, scheduler=self.name, user=ctx.user)
+        if wait > 1.0:
+            logger.info("Scheduler %s: user=%s upload=%s waited %.1fs", self.name, ctx.user, ctx.upload, wait)
+        try:
+            yield
+        finally:
+            self._done()
+
+
+def parse_weights(spec: str) -> dict:
+    """Parse ``"alice:2,bob:0.5"`` into ``{"alice": 2.0, "bob": 0.5}``."""
+    weights = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        user, _, weight = item.rpartition(":")
+        weights[user] = float(weight)
+    return weights
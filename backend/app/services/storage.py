@@ -0,0 +1,281 @@
+"""Where uploaded bytes live.
+
+Objects are addressed by a relative key such as ``blobs/ab/cd/<sha256>``.
+``LocalStorage`` keeps them under ``UPLOAD_DIR``; ``S3Storage`` keeps them in
+an S3-compatible bucket (AWS, MinIO, ...) so several API workers on
+different hosts can share one store. ``STORAGE_BACKEND`` picks the one
+``backend()`` returns.
+
+The methods are blocking; async callers run them in a worker thread.
+"""
+import os
+import shutil
+import uuid
+from abc import ABC, abstractmethod
+from datetime import timezone
+from typing import BinaryIO, Iterator, Optional
+from urllib.parse import quote
+
+from app.config import settings
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class Storage(ABC):
+    """Interface of a storage backend."""
+
+    name = ""
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    def size(self, key: str) -> int:
+        ...
+
+    @abstractmethod
+    def write(self, key: str, stream: BinaryIO) -> None:
+        """Store ``stream`` (read from its current position) under ``key``; readers never see a partial object."""
+
+    @abstractmethod
+    def touch(self, key: str) -> None:
+        """Mark ``key`` as recently written so the orphan sweep skips it."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    def read(self, key: str) -> bytes:
+        size = self.size(key)
+        return b"".join(self.iter_range(key, 0, size - 1)) if size else b""
+
+    @abstractmethod
+    def iter_range(self, key: str, start: int, end: int) -> Iterator[bytes]:
+        """Yield bytes ``start`` through ``end`` (inclusive) in chunks."""
+
+    @abstractmethod
+    def listing(self, prefix: str) -> Iterator[tuple[str, float]]:
+        """Yield ``(key, modified_timestamp)`` for every object under ``prefix``."""
+
+    def cleanup_partial(self, older_than: float) -> int:
+        """Drop leftovers of interrupted writes started before ``older_than``; returns how many."""
+        return 0
+
+    def presigned_url(self, key: str, filename: str) -> Optional[str]:
+        """A time-limited URL clients can download from directly, if the backend has one."""
+        return None
+
+
+class LocalStorage(Storage):
+    """Objects as files under ``UPLOAD_DIR``, written to ``tmp/`` and renamed into place."""
+
+    name = "local"
+
+    @property
+    def root(self) -> str:
+        return settings.UPLOAD_DIR
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split("/"))
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self.path(key))
+
+    def size(self, key: str) -> int:
+        return os.path.getsize(self.path(key))
+
+    def write(self, key: str, stream: BinaryIO) -> None:
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_dir = os.path.join(self.root, "tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        tmp_path = os.path.join(tmp_dir, uuid.uuid4().hex)
+        try:
+            with open(tmp_path, "wb") as out:
+                shutil.copyfileobj(stream, out, CHUNK_SIZE)
+                out.flush()
+                os.fsync(out.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def touch(self, key: str) -> None:
+        os.utime(self.path(key))
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def iter_range(self, key: str, start: int, end: int) -> Iterator[bytes]:
+        with open(self.path(key), "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    def listing(self, prefix: str) -> Iterator[tuple[str, float]]:
+        base = self.path(prefix)
+        for dirpath, _, filenames in os.walk(base):
+            for name in filenames:
+                full = os.path.join(dirpath, name)
+                try:
+                    mtime = os.path.getmtime(full)
+                except FileNotFoundError:
+                    continue
+                yield "/".join([prefix.rstrip("/"), *os.path.relpath(full, base).split(os.sep)]), mtime
+
+    def cleanup_partial(self, older_than: float) -> int:
+        tmp_dir = os.path.join(self.root, "tmp")
+        removed = 0
+        for name in os.listdir(tmp_dir) if os.path.isdir(tmp_dir) else []:
+            path = os.path.join(tmp_dir, name)
+            try:
+                if os.path.getmtime(path) < older_than:
+                    os.remove(path)
+                    removed += 1
+            except FileNotFoundError:
+                continue
+        return removed
+
+
+class _KeepOpen:
+    """Stream wrapper that ignores ``close()``; s3transfer closes the streams it uploads."""
+
+    def __init__(self, stream: BinaryIO):
+        self._stream = stream
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+    def close(self) -> None:
+        pass
+
+
+class S3Storage(Storage):
+    """Objects in an S3-compatible bucket; large writes use multipart upload."""
+
+    name = "s3"
+
+    def __init__(self):
+        import boto3
+        from boto3.s3.transfer import TransferConfig
+        from botocore.config import Config
+
+        self.bucket = settings.STORAGE_S3_BUCKET
+        self.prefix = settings.STORAGE_S3_PREFIX
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=settings.STORAGE_S3_ENDPOINT_URL or None,
+            region_name=settings.STORAGE_S3_REGION or None,
+            aws_access_key_id=settings.STORAGE_S3_ACCESS_KEY_ID or None,
+            aws_secret_access_key=settings.STORAGE_S3_SECRET_ACCESS_KEY or None,
+            config=Config(signature_version="s3v4"),
+        )
+        part = settings.STORAGE_S3_PART_SIZE_MB * 1024 * 1024
+        self.transfer = TransferConfig(multipart_threshold=part, multipart_chunksize=part)
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    def _missing(self, exc) -> bool:
+        return exc.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound")
+
+    def exists(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+            return True
+        except ClientError as e:
+            if self._missing(e):
+                return False
+            raise
+
+    def size(self, key: str) -> int:
+        from botocore.exceptions import ClientError
+
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self._key(key))["ContentLength"]
+        except ClientError as e:
+            if self._missing(e):
+                raise FileNotFoundError(key) from e
+            raise
+
+    def write(self, key: str, stream: BinaryIO) -> None:
+        self.client.upload_fileobj(_KeepOpen(stream), self.bucket, self._key(key), Config=self.transfer)
+
+    def touch(self, key: str) -> None:
+        # S3 has no utime; an in-place copy renews LastModified
+        self.client.copy_object(
+            Bucket=self.bucket, Key=self._key(key),
+            CopySource={"Bucket": self.bucket, "Key": self._key(key)}, MetadataDirective="REPLACE",
+        )
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+    def iter_range(self, key: str, start: int, end: int) -> Iterator[bytes]:
+        body = self.client.get_object(Bucket=self.bucket, Key=self._key(key), Range=f"bytes={start}-{end}")["Body"]
+        try:
+            yield from body.iter_chunks(CHUNK_SIZE)
+        finally:
+            body.close()
+
+    def listing(self, prefix: str) -> Iterator[tuple[str, float]]:
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self._key(prefix)):
+            for obj in page.get("Contents", []):
+                modified = obj["LastModified"].replace(tzinfo=obj["LastModified"].tzinfo or timezone.utc)
+                yield obj["Key"][len(self.prefix):], modified.timestamp()
+
+    def cleanup_partial(self, older_than: float) -> int:
+        aborted = 0
+        paginator = self.client.get_paginator("list_multipart_uploads")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for upload in page.get("Uploads", []):
+                if upload["Initiated"].timestamp() < older_than:
+                    self.client.abort_multipart_upload(Bucket=self.bucket, Key=upload["Key"], UploadId=upload["UploadId"])
+                    aborted += 1
+        return aborted
+
+    def presigned_url(self, key: str, filename: str) -> Optional[str]:
+        if not settings.STORAGE_PRESIGN_DOWNLOADS:
+            return None
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={
+                "Bucket": self.bucket,
+                "Key": self._key(key),
+                "ResponseContentDisposition": attachment(filename),
+            },
+            ExpiresIn=settings.STORAGE_PRESIGN_EXPIRES_S,
+        )
+
+
+def attachment(filename: str) -> str:
+    """``Content-Disposition`` value that downloads as ``filename``."""
+    return f"attachment; filename*=utf-8''{quote(filename)}"
+
+
+_BACKENDS = {"local": LocalStorage, "s3": S3Storage}
+_instances: dict[tuple, Storage] = {}
+
+
+def backend(name: Optional[str] = None) -> Storage:
+    """The configured storage backend (or the one called ``name``), created once per configuration."""
+    name = name or settings.STORAGE_BACKEND
+    if name not in _BACKENDS:
+        raise ValueError(f"Unknown STORAGE_BACKEND {name!r}, expected one of: {', '.join(_BACKENDS)}")
+    config = (name, settings.STORAGE_S3_BUCKET, settings.STORAGE_S3_PREFIX, settings.STORAGE_S3_ENDPOINT_URL) if name == "s3" else (name,)
+    if config not in _instances:
+        _instances[config] = _BACKENDS[name]()
+    return _instances[config]
@@ -0,0 +1,142 @@
+"""Local verification of UpperMind access tokens.
+
+When UpperMind issues signed JWTs and a key is configured (``JWT_KEY``, or a
+``JWT_JWKS_URL`` key set refreshed every ``JWT_JWKS_REFRESH_S``), the
+signature, expiry and configured issuer/audience are checked in-process.
+The user comes from the token's claims; tokens without user claims are
+resolved through ``/auth/me`` once and cached until they expire. A verified
+token stays valid until its ``exp`` even if it is revoked upstream sooner.
+"""
+import logging
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import httpx
+import jwt
+
+from app import metrics
+from app.config import settings
+from app.tracing import span
+
+logger = logging.getLogger(__name__)
+
+_MAX_CACHED_USERS = 10000
+_MIN_JWKS_RETRY_S = 30  # unknown "kid" refetches at most this often
+
+
+class TokenVerifier:
+    def __init__(self):
+        self._jwks: Optional[jwt.PyJWKSet] = None
+        self._jwks_fetched = float("-inf")
+        self._jwks_attempted = float("-inf")
+        self._users: OrderedDict[str, tuple[dict, float]] = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(settings.JWT_KEY or settings.JWT_JWKS_URL)
+
+    async def _refresh_jwks(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._jwks_fetched < settings.JWT_JWKS_REFRESH_S:
+            return
+        if now - self._jwks_attempted < _MIN_JWKS_RETRY_S:
+            return
+        self._jwks_attempted = now
+        try:
+            with span("auth.jwks_fetch"):
+                async with httpx.AsyncClient(timeout=10.0) as client:
+                    response = await client.get(settings.JWT_JWKS_URL)
+                    response.raise_for_status()
+            self._jwks = jwt.PyJWKSet.from_dict(response.json())
+            self._jwks_fetched = now
+        except Exception:
+            # Keep verifying with the previous key set while UpperMind is unreachable
+            metrics.inc("auth_jwks_refresh_failures")
+            logger.exception("Could not refresh the JWT key set from %s", settings.JWT_JWKS_URL)
+
+    async def _signing_key(self, token: str):
+        """The key to check ``token`` with, or None if no key set could be loaded yet."""
+        if settings.JWT_KEY:
+            return settings.JWT_KEY
+        await self._refresh_jwks()
+        if self._jwks is None:
+            return None
+        kid = jwt.get_unverified_header(token).get("kid")
+        for attempt in range(2):
+            for key in self._jwks.keys:
+                if kid is None or key.key_id == kid:
+                    return key.key
+            if attempt == 0:
+                await self._refresh_jwks(force=True)  # the signing key may have been rotated
+        raise jwt.InvalidKeyError(f"No signing key for kid {kid!r}")
+
+    async def verify(self, token: str) -> Optional[dict]:
+        """Return the token's verified claims, or None if it cannot be checked locally.
+
+        None means the token is not a JWT or no key set is available yet; the
+        caller then falls back to ``/auth/me``. Raises ``jwt.InvalidTokenError``
+        for a JWT that fails verification.
+        """
+        try:
+            jwt.get_unverified_header(token)
+        except jwt.DecodeError:
+            return None
+        key = await self._signing_key(token)
+        if key is None:
+            return None
+        return jwt.decode(
+            token,
+            key,
+            algorithms=[a.strip() for a in settings.JWT_ALGORITHMS.split(",") if a.strip()],
+            issuer=settings.JWT_ISSUER or None,
+            audience=settings.JWT_AUDIENCE or None,
+            leeway=settings.JWT_LEEWAY_S,
+            options={"require": ["exp"], "verify_aud": bool(settings.JWT_AUDIENCE)},
+        )
+
+    async def user_for(self, token: str, fetch_user) -> Optional[dict]:
+        """The user behind a locally verified token, or None if it has to be checked remotely.
+
+        ``fetch_user`` (``/auth/me``) is only awaited for a token whose claims
+        carry no username, the first time it is seen.
+        """
+        claims = await self.verify(token)
+        if claims is None:
+            return None
+        user = user_from_claims(claims) or self.cached_user(token)
+        if user is None:
+            user = await fetch_user(token)
+            self.remember(token, user, claims["exp"])
+        return user
+
+    def cached_user(self, token: str) -> Optional[dict]:
+        entry = self._users.get(token)
+        if entry is None:
+            return None
+        user, expires = entry
+        if expires <= time.time():
+            del self._users[token]
+            return None
+        self._users.move_to_end(token)
+        return user
+
+    def remember(self, token: str, user: dict, expires: float) -> None:
+        self._users[token] = (user, expires)
+        self._users.move_to_end(token)
+        while len(self._users) > _MAX_CACHED_USERS:
+            self._users.popitem(last=False)
+
+
+def user_from_claims(claims: dict) -> Optional[dict]:
+    """Build the ``/auth/me``-shaped user from token claims, or None if they lack a username."""
+    username = claims.get("username") or claims.get("preferred_username")
+    if not username:
+        return None
+    user = {"id": claims.get("id", claims.get("sub")), "username": username}
+    if claims.get("email"):
+        user["email"] = claims["email"]
+    return user
+
+
+verifier = TokenVerifier()
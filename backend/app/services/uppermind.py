@@ -1,57 +1,185 @@
+import asyncio
 import logging
+import re
+import secrets
+import time
+from typing import Optional
 
 import httpx
+import jwt
 
+from app import metrics
 from app.config import settings
+from app.services import usage
+from app.services.limiter import AdaptiveLimiter
+from app.services.retry import LatencyWindow, RetryBudget, backoff_delay
+from app.services.scheduler import FairScheduler, parse_weights
+from app.tracing import inject, span
 
 logger = logging.getLogger(__name__)
 
+# Shared by every upload so the vLLM backend sees one adaptive in-flight limit
+translation_limiter = AdaptiveLimiter(
+    "translation",
+    initial=settings.TRANSLATE_CONCURRENCY_INITIAL,
+    min_limit=settings.TRANSLATE_CONCURRENCY_MIN,
+    max_limit=settings.TRANSLATE_CONCURRENCY_MAX,
+    tolerance=settings.TRANSLATE_LATENCY_TOLERANCE,
+)
+
+# Decides whose translation gets the next limiter slot
+translation_scheduler = FairScheduler(
+    "translation",
+    capacity=lambda: int(translation_limiter.limit),
+    weights=parse_weights(settings.SCHEDULER_USER_WEIGHTS),
+)
+
+# Shared by retries and hedges so neither can multiply load during an outage
+translation_retry_budget = RetryBudget(
+    "translation",
+    ratio=settings.TRANSLATE_RETRY_BUDGET_RATIO,
+    min_per_s=settings.TRANSLATE_RETRY_BUDGET_MIN_PER_S,
+)
+
+# Upstream seconds per kilo-character of successful requests, for the hedge delay
+translation_latency = LatencyWindow()
+
+_RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+_RENEW_BEFORE_S = 600  # a command-line job logs in again this long before its token expires
+
+
+class TranslationError(RuntimeError):
+    """A failed translator request; ``retryable`` when trying again may succeed."""
+
+    def __init__(self, message: str, retryable: bool = False, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after
+
 
 async def authenticate(username: str, password: str) -> dict:
     """Authenticate with UpperMind and return token data."""
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            f"{settings.UPPERMIND_URL}/auth/token",
-            data={"username": username, "password": password},
-            headers={"Content-Type": "application/x-www-form-urlencoded"},
-        )
-        response.raise_for_status()
-        return response.json()
+    with span("uppermind.auth_token"):
+        async with httpx.AsyncClient() as client:
+            response = await client.post(
+                f"{settings.UPPERMIND_URL}/auth/token",
+                data={"username": username, "password": password},
+                headers=inject({"Content-Type": "application/x-www-form-urlencoded"}),
+            )
+            response.raise_for_status()
+            return response.json()
 
 
 async def get_user(token: str) -> dict:
     """Get user info from UpperMind using a Bearer token."""
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            f"{settings.UPPERMIND_URL}/auth/me",
-            headers={"Authorization": f"Bearer {token}"},
-        )
-        response.raise_for_status()
-        return response.json()
+    with span("uppermind.auth_me"):
+        async with httpx.AsyncClient() as client:
+            response = await client.get(
+                f"{settings.UPPERMIND_URL}/auth/me",
+                headers=inject({"Authorization": f"Bearer {token}"}),
+            )
+            response.raise_for_status()
+            return response.json()
 
 
-async def translate(text: str, token: str) -> str:
-    """Translate text via UpperMind non-interactive chat."""
+async def login(username: str, password: str) -> dict:
+    """The ``/auth/me`` user for a username and password, with its ``token`` (for command-line jobs)."""
+    token = (await authenticate(username, password))["access_token"]
+    return {**(await get_user(token)), "token": token}
+
+
+def token_expiry(token: str) -> Optional[float]:
+    """When an access token expires (its unverified JWT ``exp``), or None if it does not say."""
     try:
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            response = await client.post(
-                f"{settings.UPPERMIND_URL}/chat/noninteractive",
-                json={
-                    "content": text,
-                    "agent_id": settings.TRANSLATOR_AGENT_ID,
-                },
-                headers={
-                    "Authorization": f"Bearer {token}",
-                    "Content-Type": "application/json",
-                },
-            )
-            logger.info("UpperMind translate HTTP status: %s", response.status_code)
-            logger.info("UpperMind translate raw HTTP body: %.500s", response.text)
-            if response.status_code != 200:
-                error_detail = response.text
-                logger.error("UpperMind translate error (HTTP %s): %s", response.status_code, error_detail)
-                raise RuntimeError(f"Translation failed (HTTP {response.status_code}): {error_detail}")
-            data = response.json()
+        return float(jwt.decode(token, options={"verify_signature": False})["exp"])
+    except (jwt.InvalidTokenError, KeyError, TypeError, ValueError):
+        return None
+
+
+class Login:
+    """A command-line job's credentials and the user they are logged in as.
+
+    An import can run for hours, longer than one access token lasts;
+    ``user()`` logs in again once the token expires within
+    ``_RENEW_BEFORE_S``. Tokens that are not JWTs are kept as they are.
+    """
+
+    def __init__(self, username: str, password: str):
+        self.username = username
+        self.password = password
+        self._user: Optional[dict] = None
+        self._expires: Optional[float] = None
+
+    async def user(self) -> dict:
+        if self._user is None or (self._expires is not None and self._expires - time.time() < _RENEW_BEFORE_S):
+            if self._user is not None:
+                logger.info("Access token for %s expires soon; logging in again", self.username)
+            self._user = await login(self.username, self.password)
+            self._expires = token_expiry(self._user["token"])
+        return self._user
+
+
+def _record_usage(data, elapsed: float) -> None:
+    """Report a translator request to the usage meter.
+
+    Token counts are taken from an OpenAI-style ``usage`` object or
+    Ollama-style counters when UpperMind includes them; it reports no
+    compute time, so the request time stands in for GPU time.
+    """
+    counts = data.get("usage") if isinstance(data, dict) and isinstance(data.get("usage"), dict) else \
+        data if isinstance(data, dict) else {}
+    usage.record(
+        "translation",
+        f"agent:{settings.TRANSLATOR_AGENT_ID}",
+        prompt_tokens=counts.get("prompt_tokens") or counts.get("prompt_eval_count") or 0,
+        output_tokens=counts.get("completion_tokens") or counts.get("eval_count") or 0,
+        gpu_ms=elapsed * 1000,
+    )
+
+
+async def _attempt(text: str, token: str, started: Optional[list] = None) -> str:
+    """Translate text with one UpperMind non-interactive chat request.
+
+    ``started`` receives the monotonic time the request left the scheduler
+    and limiter queues, so a hedge is timed from when upstream work began.
+    """
+    try:
+        async with translation_scheduler.slot(cost=max(1.0, len(text) / 2000)), \
+                translation_limiter.slot(units=len(text) / 1000):
+            with span("uppermind.chat", agent_id=settings.TRANSLATOR_AGENT_ID, chars=len(text)):
+                sent = time.monotonic()
+                if started is not None:
+                    started.append(sent)
+                async with httpx.AsyncClient(timeout=120.0) as client:
+                    try:
+                        response = await client.post(
+                            f"{settings.UPPERMIND_URL}/chat/noninteractive",
+                            json={
+                                "content": text,
+                                "agent_id": settings.TRANSLATOR_AGENT_ID,
+                            },
+                            headers=inject({
+                                "Authorization": f"Bearer {token}",
+                                "Content-Type": "application/json",
+                            }),
+                        )
+                    except httpx.TransportError as exc:
+                        raise TranslationError(f"Translation request failed: {exc!r}", retryable=True) from exc
+                    logger.info("UpperMind translate HTTP status: %s", response.status_code)
+                    logger.info("UpperMind translate raw HTTP body: %.500s", response.text)
+                    if response.status_code != 200:
+                        error_detail = response.text
+                        logger.error("UpperMind translate error (HTTP %s): %s", response.status_code, error_detail)
+                        retry_after = response.headers.get("Retry-After")
+                        raise TranslationError(
+                            f"Translation failed (HTTP {response.status_code}): {error_detail}",
+                            retryable=response.status_code in _RETRYABLE_STATUS,
+                            retry_after=float(retry_after) if isinstance(retry_after, str) and retry_after.isdigit() else None,
+                        )
+                    data = response.json()
+                elapsed = time.monotonic() - sent
+                translation_latency.add(elapsed / max(len(text) / 1000, 1.0))
+                _record_usage(data, elapsed)
 
         # Debug: log raw API response
         logger.info("UpperMind raw response type: %s", type(data).__name__)
@@ -79,3 +207,209 @@ async def translate(text: str, token: str) -> str:
     except Exception:
         logger.exception("translate() failed")
         raise
+
+
+async def _hedged(text: str, token: str) -> str:
+    """One attempt, plus a duplicate once it runs past the recent latency quantile.
+
+    Whichever copy answers first wins and the other is cancelled; a failed
+    copy waits for the other one. Hedges spend the retry budget.
+    """
+    quantile = settings.TRANSLATE_HEDGE_QUANTILE
+    per_kchar = translation_latency.quantile(quantile) if quantile > 0 else None
+    if per_kchar is None:
+        return await _attempt(text, token)
+    delay = per_kchar * max(len(text) / 1000, 1.0)
+
+    started: list = []
+    primary = asyncio.create_task(_attempt(text, token, started))
+    tasks = {primary}
+    try:
+        # Still queued for a slot counts as not started: a hedge would only queue too
+        while not started or time.monotonic() - started[0] < delay:
+            timeout = delay - (time.monotonic() - started[0]) if started else 0.1
+            done, _ = await asyncio.wait(tasks, timeout=max(timeout, 0))
+            if done:
+                break
+        else:
+            if translation_retry_budget.try_spend():
+                metrics.inc("translation_hedges")
+                tasks.add(asyncio.create_task(_attempt(text, token)))
+
+        pending, error = set(tasks), None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is not primary:
+                        metrics.inc("translation_hedge_wins")
+                    return task.result()
+                error = error or task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def _chat(text: str, token: str) -> str:
+    """Translate text, retrying transient failures with jittered exponential backoff."""
+    translation_retry_budget.deposit()
+    attempt = 0
+    while True:
+        try:
+            return await _hedged(text, token)
+        except TranslationError as exc:
+            if (not exc.retryable or attempt >= settings.TRANSLATE_RETRIES
+                    or not translation_retry_budget.try_spend()):
+                raise
+            delay = backoff_delay(attempt, settings.TRANSLATE_RETRY_BASE_S, settings.TRANSLATE_RETRY_MAX_S,
+                                  exc.retry_after)
+            attempt += 1
+            metrics.inc("translation_retries")
+            logger.warning("Retrying translation in %.2fs (attempt %d): %s", delay, attempt + 1, exc)
+            await asyncio.sleep(delay)
+
+
+_PACK_INSTRUCTIONS = (
+    "The message below contains {n} separate documents. Each one starts on a line "
+    "of its own with a marker such as {example}. Translate every document "
+    "independently and reply with each translation under its own marker line, "
+    "copying the marker lines unchanged and in the same order, with nothing else."
+)
+
+
+def _pack(texts: list[str], nonce: str) -> str:
+    body = "\n\n".join(f"<<<{nonce}:{k}>>>\n{text}" for k, text in enumerate(texts, 1))
+    return _PACK_INSTRUCTIONS.format(n=len(texts), example=f"<<<{nonce}:1>>>") + "\n\n" + body
+
+
+def _unpack(reply: str, nonce: str, n: int) -> Optional[list[str]]:
+    """Split a packed reply back into ``n`` translations, or None if the markers were not kept."""
+    parts = re.split(rf"^[ \t]*<<<{re.escape(nonce)}:(\d+)>>>[ \t]*$", reply, flags=re.MULTILINE)
+    numbers = [int(k) for k in parts[1::2]]
+    texts = [t.strip() for t in parts[2::2]]
+    if numbers != list(range(1, n + 1)) or not all(texts):
+        return None
+    return texts
+
+
+class TranslationBatcher:
+    """Packs small texts queued within a short window into one translator request.
+
+    Each agent round trip carries a fixed prompt and agent overhead, so a
+    one-line prescription or lab label costs almost as much as a page. Texts
+    up to ``item_chars`` wait at most ``window_ms`` for company, then go out
+    as a single request with numbered, per-batch nonce markers; a batch is
+    sent early once it reaches ``max_items`` or ``max_chars``. Batches are
+    kept per bearer token so a request never carries another user's text.
+    A reply whose markers cannot be matched falls back to one request per
+    text, and a batch whose callers have all gone away is cancelled. Usage
+    of a packed request is split between the callers' meters by length.
+    """
+
+    def __init__(self, max_items: int, item_chars: int, max_chars: int, window_ms: float):
+        self.max_items = max_items
+        self.item_chars = item_chars
+        self.max_chars = max_chars
+        self.window_ms = window_ms
+        self._pending: dict[str, list[tuple[str, asyncio.Future, Optional[usage.UsageMeter]]]] = {}
+        self._timers: dict[str, asyncio.Task] = {}
+        self._running: set[asyncio.Task] = set()
+
+    async def submit(self, text: str, token: str) -> str:
+        # Replies come back stripped, packed or not; the text's own surrounding
+        # whitespace (line breaks between langid pieces) is put back around them
+        core = text.strip()
+        head = text[:len(text) - len(text.lstrip())]
+        return head + await self._submit(core, token) + text[len(head) + len(core):]
+
+    async def _submit(self, text: str, token: str) -> str:
+        if self.max_items <= 1 or len(text) > self.item_chars:
+            return await _chat(text, token)
+        future = asyncio.get_running_loop().create_future()
+        queue = self._pending.setdefault(token, [])
+        queue.append((text, future, usage.current()))
+        if len(queue) >= self.max_items or sum(len(t) for t, _, _ in queue) >= self.max_chars:
+            self._dispatch(token)
+        elif token not in self._timers:
+            self._timers[token] = asyncio.create_task(self._expire(token))
+        return await future
+
+    async def _expire(self, token: str):
+        await asyncio.sleep(self.window_ms / 1000)
+        self._timers.pop(token, None)
+        self._dispatch(token)
+
+    def _dispatch(self, token: str):
+        timer = self._timers.pop(token, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(token, [])
+        if not batch:
+            return
+        task = asyncio.create_task(self._run(batch, token))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+        def abandon(_):
+            if all(f.cancelled() for _, f, _ in batch):
+                task.cancel()
+
+        for _, future, _ in batch:
+            future.add_done_callback(abandon)
+
+    @staticmethod
+    async def _chat_for(text: str, token: str, meter: Optional[usage.UsageMeter]) -> str:
+        with usage.metering() as own:
+            try:
+                return await _chat(text, token)
+            finally:
+                if meter is not None:
+                    meter.add(own)
+
+    async def _run(self, batch: list, token: str):
+        live = [item for item in batch if not item[1].done()]
+        if not live:
+            return
+        texts = [text for text, _, _ in live]
+        if len(texts) == 1:
+            results = await asyncio.gather(self._chat_for(texts[0], token, live[0][2]), return_exceptions=True)
+        else:
+            metrics.observe("translation_batch_items", len(texts))
+            nonce = secrets.token_hex(4)
+            with span("translate.batch", items=len(texts)), usage.metering() as shared:
+                try:
+                    results = _unpack(await _chat(_pack(texts, nonce), token), nonce, len(texts))
+                except Exception as exc:
+                    results = [exc] * len(texts)
+                finally:
+                    total = sum(len(text) for text in texts)
+                    for text, _, meter in live:
+                        if meter is not None:
+                            meter.add(shared, share=len(text) / total)
+            if results is None:
+                logger.warning("Packed translation of %d texts lost its markers, translating one by one", len(texts))
+                metrics.inc("translation_batch_fallbacks")
+                results = await asyncio.gather(
+                    *(self._chat_for(text, token, meter) for text, _, meter in live), return_exceptions=True,
+                )
+        for (_, future, _), result in zip(live, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+translation_batcher = TranslationBatcher(
+    max_items=settings.TRANSLATE_BATCH_MAX_ITEMS,
+    item_chars=settings.TRANSLATE_BATCH_ITEM_CHARS,
+    max_chars=settings.TRANSLATE_BATCH_MAX_CHARS,
+    window_ms=settings.TRANSLATE_BATCH_WINDOW_MS,
+)
+
+
+async def translate(text: str, token: str) -> str:
+    """Translate text via UpperMind, packing small texts with others queued nearby."""
+    return await translation_batcher.submit(text, token)
@@ -0,0 +1,88 @@
+"""Upstream token and GPU-time accounting.
+
+OCR and translation calls report what they cost to the meter of the task
+they run in (a context variable, like the scheduler's job context); the
+upload handler opens one meter per file and stores it as ``UpstreamUsage``
+rows. Requests that serve several files at once (batched OCR, packed
+translations) split their usage between the files' meters.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, fields
+from typing import Iterator, Optional
+
+STAGES = ("ocr", "translation")
+
+
+@dataclass
+class StageUsage:
+    model: str = ""
+    requests: int = 0
+    prompt_tokens: int = 0
+    output_tokens: int = 0
+    gpu_ms: float = 0.0  # upstream compute time: Ollama's eval durations, or request time when not reported
+    load_ms: float = 0.0  # model load time paid inside requests
+
+    def add(self, other: "StageUsage", share: float = 1.0) -> None:
+        self.model = self.model or other.model
+        for f in fields(self):
+            if f.name != "model":
+                setattr(self, f.name, getattr(self, f.name) + getattr(other, f.name) * share)
+
+
+class UsageMeter:
+    """Per-stage usage collected for one file (or one shared request)."""
+
+    def __init__(self):
+        self.stages: dict[str, StageUsage] = {}
+
+    def stage(self, name: str) -> StageUsage:
+        return self.stages.setdefault(name, StageUsage())
+
+    def add(self, other: "UsageMeter", share: float = 1.0) -> None:
+        for name, usage in other.stages.items():
+            self.stage(name).add(usage, share)
+
+
+_meter: ContextVar[Optional[UsageMeter]] = ContextVar("usage_meter", default=None)
+
+
+def current() -> Optional[UsageMeter]:
+    return _meter.get()
+
+
+@contextmanager
+def metering() -> Iterator[UsageMeter]:
+    """Collect usage reported inside the block (and tasks started from it) into a new meter."""
+    meter = UsageMeter()
+    token = _meter.set(meter)
+    try:
+        yield meter
+    finally:
+        _meter.reset(token)
+
+
+def record(stage: str, model: str, prompt_tokens: int = 0, output_tokens: int = 0,
+           gpu_ms: float = 0.0, load_ms: float = 0.0) -> None:
+    """Add one upstream request to the current meter, if any."""
+    meter = _meter.get()
+    if meter is None:
+        return
+    meter.stage(stage).add(StageUsage(
+        model=model, requests=1, prompt_tokens=prompt_tokens or 0, output_tokens=output_tokens or 0,
+        gpu_ms=gpu_ms, load_ms=load_ms,
+    ))
+
+
+def rows(meter: Optional[UsageMeter]) -> list[dict]:
+    """``UpstreamUsage`` values for each stage of ``meter``, without the translation id."""
+    if meter is None:
+        return []
+    return [
+        {
+            "stage": stage, "model": u.model, "requests": u.requests,
+            "prompt_tokens": round(u.prompt_tokens), "output_tokens": round(u.output_tokens),
+            "gpu_ms": round(u.gpu_ms), "load_ms": round(u.load_ms),
+        }
+        for stage, u in meter.stages.items()
+    ]
@@ -0,0 +1,271 @@
+"""Lightweight in-process request tracing.
+
+Every HTTP request gets a ``Trace`` stored in a context variable. Code paths
+open spans with ``span("name")`` and the middleware turns the finished spans
+into a ``Server-Timing`` header (non-streaming responses only) and hands the
+trace to the configured exporter (JSON lines file or an OTLP/HTTP collector).
+"""
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import secrets
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+import httpx
+from starlette.datastructures import MutableHeaders
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "intpatient-backend"
+
+_current_trace: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("current_trace", default=None)
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+# Keep references to in-flight OTLP uploads so they are not garbage collected.
+_pending_exports: set = set()
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: Optional[dict] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = dict(attributes or {})
+        self.error: Optional[str] = None
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end - self.start_ns) / 1_000_000
+
+    def set_attribute(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class Trace:
+    """All spans recorded while serving one request."""
+
+    def __init__(self, name: str, trace_id: Optional[str] = None, parent_id: Optional[str] = None):
+        self.trace_id = trace_id or secrets.token_hex(16)
+        self.root = Span(name, self.trace_id, parent_id)
+        self.spans: list[Span] = [self.root]
+
+    def start_span(self, name: str, parent: Optional[Span], attributes: Optional[dict] = None) -> Span:
+        s = Span(name, self.trace_id, (parent or self.root).span_id, attributes)
+        self.spans.append(s)
+        return s
+
+    def finish(self) -> None:
+        if self.root.end_ns is None:
+            self.root.end_ns = time.time_ns()
+
+    def server_timing(self) -> str:
+        """Build a ``Server-Timing`` header value, summing spans that share a name."""
+        totals: dict[str, float] = {}
+        for s in self.spans[1:]:
+            if s.end_ns is None:
+                continue
+            totals[s.name] = totals.get(s.name, 0.0) + s.duration_ms
+        entries = [f"{name};dur={dur:.1f}" for name, dur in totals.items()]
+        entries.append(f"total;dur={self.root.duration_ms:.1f}")
+        return ", ".join(entries)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Record a span around the enclosed block. A no-op outside a traced request."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+
+    s = trace.start_span(name, _current_span.get(), attributes)
+    token = _current_span.set(s)
+    try:
+        yield s
+    except BaseException as exc:
+        s.error = f"{type(exc).__name__}: {exc}"
+        raise
+    finally:
+        s.end_ns = time.time_ns()
+        _current_span.reset(token)
+
+
+def record_span(name: str, start_ns: int, end_ns: Optional[int] = None, **attributes) -> None:
+    """Record a span for a stage that has already happened (e.g. request body parsing)."""
+    trace = _current_trace.get()
+    if trace is None:
+        return
+    s = trace.start_span(name, _current_span.get(), attributes)
+    s.start_ns = start_ns
+    s.end_ns = end_ns if end_ns is not None else time.time_ns()
+
+
+def record_since_request_start(name: str, **attributes) -> None:
+    """Record a span from the start of the request until now."""
+    trace = _current_trace.get()
+    if trace is not None:
+        record_span(name, trace.root.start_ns, **attributes)
+
+
+def inject(headers: dict) -> dict:
+    """Add a W3C ``traceparent`` header so upstream calls join the current trace."""
+    trace = _current_trace.get()
+    if trace is not None:
+        parent = _current_span.get() or trace.root
+        headers["traceparent"] = f"00-{trace.trace_id}-{parent.span_id}-01"
+    return headers
+
+
+def _parse_traceparent(value: Optional[str]) -> tuple[Optional[str], Optional[str]]:
+    if not value:
+        return None, None
+    parts = value.split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None, None
+    return parts[1], parts[2]
+
+
+# ---------------------------------------------------------------------------
+# Exporters
+# ---------------------------------------------------------------------------
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _to_otlp(trace: Trace) -> dict:
+    spans = []
+    for s in trace.spans:
+        otlp_span = {
+            "traceId": s.trace_id,
+            "spanId": s.span_id,
+            "name": s.name,
+            "kind": 2 if s is trace.root else 1,  # SERVER / INTERNAL
+            "startTimeUnixNano": str(s.start_ns),
+            "endTimeUnixNano": str(s.end_ns or s.start_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()],
+            "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+        }
+        if s.parent_id:
+            otlp_span["parentSpanId"] = s.parent_id
+        spans.append(otlp_span)
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+            "scopeSpans": [{"scope": {"name": __name__}, "spans": spans}],
+        }]
+    }
+
+
+async def _post_otlp(payload: dict) -> None:
+    try:
+        async with httpx.AsyncClient(timeout=5.0) as client:
+            await client.post(settings.TRACE_OTLP_ENDPOINT, json=payload)
+    except Exception as exc:
+        logger.warning("OTLP trace export failed: %s", exc)
+
+
+def _write_json(trace: Trace) -> None:
+    line = json.dumps({"trace_id": trace.trace_id, "spans": [s.to_dict() for s in trace.spans]})
+    path = settings.TRACE_JSON_PATH
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as out:
+        out.write(line + "\n")
+
+
+def export(trace: Trace) -> None:
+    """Send a finished trace to the configured exporter (``TRACE_EXPORTER``)."""
+    exporter = settings.TRACE_EXPORTER
+    if not exporter:
+        return
+    try:
+        if exporter == "json":
+            _write_json(trace)
+        elif exporter == "otlp":
+            task = asyncio.get_running_loop().create_task(_post_otlp(_to_otlp(trace)))
+            _pending_exports.add(task)
+            task.add_done_callback(_pending_exports.discard)
+        else:
+            logger.warning("Unknown TRACE_EXPORTER=%r", exporter)
+    except Exception:
+        logger.exception("Trace export failed")
+
+
+# ---------------------------------------------------------------------------
+# Middleware
+# ---------------------------------------------------------------------------
+
+class TracingMiddleware:
+    """ASGI middleware that opens a trace per request and adds ``Server-Timing``."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = None
+        for key, value in scope.get("headers", []):
+            if key == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+        trace_id, parent_id = _parse_traceparent(traceparent)
+
+        trace = Trace(f"{scope['method']} {scope['path']}", trace_id, parent_id)
+        trace.root.set_attribute("http.method", scope["method"])
+        trace.root.set_attribute("http.target", scope["path"])
+        token = _current_trace.set(trace)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                trace.root.set_attribute("http.status_code", message["status"])
+                headers = MutableHeaders(scope=message)
+                if not headers.get("content-type", "").startswith("text/event-stream"):
+                    headers.append("Server-Timing", trace.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            trace.finish()
+            _current_trace.reset(token)
+            export(trace)
@@ -0,0 +1,70 @@
+"""Compare two benchmark result files produced by ``bench.run``.
+
+Prints per-scenario deltas for latency percentiles, throughput and peak RSS,
+and exits non-zero when a metric regresses by more than ``--threshold``.
+
+Usage::
+
+    python -m bench.compare base.json head.json --threshold 0.10
+"""
+import argparse
+import json
+import sys
+
+# metric path -> True when higher is better
+METRICS = {
+    ("latency_ms", "p50"): False,
+    ("latency_ms", "p95"): False,
+    ("latency_ms", "p99"): False,
+    ("throughput_rps",): True,
+    ("extra", "pages_per_s"): True,
+    ("errors",): False,
+    ("peak_rss_mb",): False,
+}
+
+
+def _get(data: dict, path: tuple):
+    for key in path:
+        data = data.get(key, {}) if isinstance(data, dict) else {}
+    return data if isinstance(data, (int, float)) else None
+
+
+def compare(base: dict, head: dict, threshold: float) -> list:
+    """Return ``(scenario, metric, base, head, change, regressed)`` rows."""
+    rows = []
+    for name, head_result in head["scenarios"].items():
+        base_result = base["scenarios"].get(name)
+        if base_result is None:
+            continue
+        for path, higher_is_better in METRICS.items():
+            b, h = _get(base_result, path), _get(head_result, path)
+            if b is None or h is None:
+                continue
+            change = (h - b) / b if b else (0.0 if h == b else float("inf"))
+            worse = -change if higher_is_better else change
+            rows.append((name, ".".join(path), b, h, change, worse > threshold))
+    return rows
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed relative regression")
+    args = parser.parse_args(argv)
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+
+    rows = compare(base, head, args.threshold)
+    print(f"{'scenario':<20} {'metric':<16} {'base':>10} {'head':>10} {'change':>9}")
+    for name, metric, b, h, change, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<20} {metric:<16} {b:>10.1f} {h:>10.1f} {change:>+8.1%}{flag}")
+    sys.exit(1 if any(r[-1] for r in rows) else 0)
+
+
+if __name__ == "__main__":
+    main()
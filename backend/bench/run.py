@@ -0,0 +1,277 @@
+"""Run the benchmark scenarios against a freshly started backend.
+
+For every scenario the runner starts the two upstream simulators and a new
+backend process (temporary database and upload directory), drives the load,
+then records latency percentiles, throughput and the backend's peak RSS.
+Results are written as JSON so runs from different commits can be compared
+with ``python -m bench.compare``.
+
+Usage (from ``backend/``)::
+
+    python -m bench.run --scenario pdf_burst --output bench-results.json
+    python -m bench.run --ocr-latency-ms 1500 --ollama-concurrency 1 --uploads 20
+
+``--matrix KEY=V1,V2`` runs every scenario once per value of a backend
+setting, e.g. batched against single-page OCR::
+
+    python -m bench.run --scenario pdf_burst --ocr-per-image-ms 150 --matrix OCR_BATCH_SIZE=1,4
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+from bench.scenarios import SCENARIOS
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(url: str, proc: subprocess.Popen, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"Process for {url} exited with code {proc.returncode}")
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Timed out waiting for {url}")
+
+
+def _peak_rss_mb(pid: int):
+    """Peak resident set size of a live process (Linux), in MiB."""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _simulator_profiles(opts) -> tuple[dict, dict]:
+    if opts.profile:
+        with open(opts.profile) as f:
+            profiles = json.load(f)
+        return profiles.get("uppermind", {}), profiles.get("ollama", {})
+    uppermind = {
+        "latency": {"distribution": opts.distribution, "median_ms": opts.translate_latency_ms, "sigma": opts.sigma,
+                    "stall_rate": opts.translate_stall_rate, "stall_ms": opts.translate_stall_ms},
+        "failure_rate": opts.failure_rate if opts.translate_failure_rate is None else opts.translate_failure_rate,
+        "concurrency": opts.uppermind_concurrency,
+    }
+    ollama = {
+        "latency": {"distribution": opts.distribution, "median_ms": opts.ocr_latency_ms, "sigma": opts.sigma,
+                    "per_item_ms": opts.ocr_per_image_ms},
+        "failure_rate": opts.failure_rate,
+        "concurrency": opts.ollama_concurrency,
+        "load_ms": opts.ocr_load_ms,
+    }
+    return uppermind, ollama
+
+
+def run_scenario(name: str, opts, extra_env: tuple = ()) -> dict:
+    uppermind_profile, ollama_profile = _simulator_profiles(opts)
+    procs = []
+    with tempfile.TemporaryDirectory(prefix="intpatient-bench-") as tmp:
+        try:
+            sim_urls = {}
+            for upstream, profile in (("uppermind", uppermind_profile), ("ollama", ollama_profile)):
+                port = _free_port()
+                proc = subprocess.Popen(
+                    [sys.executable, "-m", "bench.simulators", upstream, "--port", str(port),
+                     "--profile", json.dumps(profile), "--seed", str(opts.seed)],
+                    cwd=BACKEND_DIR,
+                )
+                procs.append(proc)
+                sim_urls[upstream] = f"http://127.0.0.1:{port}"
+                _wait_ready(f"{sim_urls[upstream]}/_sim/stats", proc)
+
+            app_port = _free_port()
+            env = {
+                **os.environ,
+                "UPPERMIND_URL": sim_urls["uppermind"],
+                "OLLAMA_URL": sim_urls["ollama"],
+                "DATABASE_URL": f"sqlite:///{tmp}/bench.db",
+                "UPLOAD_DIR": os.path.join(tmp, "uploads"),
+                **dict(kv.split("=", 1) for kv in [*opts.env, *extra_env]),
+            }
+            app = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(app_port), "--log-level", "warning"],
+                cwd=BACKEND_DIR,
+                env=env,
+            )
+            procs.append(app)
+            base_url = f"http://127.0.0.1:{app_port}"
+            _wait_ready(f"{base_url}/api/health", app)
+            if env.get("OLLAMA_WARMUP_INTERVAL", "") != "0":
+                # Like a readiness probe: send traffic once the OCR model is resident
+                deadline = time.monotonic() + opts.ready_timeout
+                while time.monotonic() < deadline and httpx.get(f"{base_url}/api/health/ready").status_code != 200:
+                    time.sleep(0.2)
+
+            async def drive():
+                limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+                async with httpx.AsyncClient(base_url=base_url, timeout=opts.timeout, limits=limits) as client:
+                    return await SCENARIOS[name](client, opts)
+
+            result = asyncio.run(drive())
+            peak_rss = _peak_rss_mb(app.pid)
+            upstream_stats = {u: httpx.get(f"{url}/_sim/stats").json() for u, url in sim_urls.items()}
+        finally:
+            for proc in reversed(procs):
+                proc.terminate()
+            for proc in procs:
+                try:
+                    proc.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    proc.kill()
+
+    if peak_rss is None:
+        # Non-Linux fallback: largest terminated child, which includes the simulators
+        peak_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+
+    lat = result.latencies_ms
+    completed = len(lat)
+    return {
+        "requests": completed + result.errors,
+        "completed": completed,
+        "errors": result.errors,
+        "error_kinds": result.error_kinds,
+        "degraded": result.degraded,
+        "items": result.items,
+        "duration_s": round(result.duration_s, 3),
+        "throughput_rps": round(completed / result.duration_s, 3) if result.duration_s else 0.0,
+        "latency_ms": {
+            "p50": round(_percentile(lat, 50), 1),
+            "p95": round(_percentile(lat, 95), 1),
+            "p99": round(_percentile(lat, 99), 1),
+            "max": round(max(lat), 1) if lat else 0.0,
+            "mean": round(statistics.fmean(lat), 1) if lat else 0.0,
+        },
+        "peak_rss_mb": round(peak_rss, 1),
+        "upstreams": upstream_stats,
+        **({"extra": result.extra} if result.extra else {}),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="Scenario to run (repeatable, default: all)")
+    parser.add_argument("--output", help="Write results JSON to this path (default: stdout only)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=600.0, help="Client timeout per request (s)")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Extra environment for the backend process (repeatable)")
+    parser.add_argument("--matrix", metavar="KEY=V1,V2",
+                        help="Run each scenario once per value of this backend setting")
+    # Upstream simulation
+    parser.add_argument("--profile", help="JSON file with 'uppermind' and 'ollama' UpstreamProfile objects")
+    parser.add_argument("--distribution", default="lognormal",
+                        choices=["constant", "uniform", "exponential", "lognormal"])
+    parser.add_argument("--sigma", type=float, default=0.4)
+    parser.add_argument("--ocr-latency-ms", type=float, default=400.0)
+    parser.add_argument("--ocr-per-image-ms", type=float, default=0.0,
+                        help="Extra Ollama delay per image, on top of the per-request latency")
+    parser.add_argument("--ocr-load-ms", type=float, default=0.0, help="Ollama model load time (cold start)")
+    parser.add_argument("--ready-timeout", type=float, default=60.0,
+                        help="Max wait for /api/health/ready before driving load")
+    parser.add_argument("--translate-latency-ms", type=float, default=600.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--translate-failure-rate", type=float, default=None,
+                        help="UpperMind failure rate (default: --failure-rate)")
+    parser.add_argument("--translate-stall-rate", type=float, default=0.0,
+                        help="Fraction of translations stuck for --translate-stall-ms")
+    parser.add_argument("--translate-stall-ms", type=float, default=0.0)
+    parser.add_argument("--ollama-concurrency", type=int, default=2)
+    parser.add_argument("--uppermind-concurrency", type=int, default=8)
+    # Scenario shape
+    parser.add_argument("--users", type=int, default=5, help="Distinct users issuing uploads")
+    parser.add_argument("--uploads", type=int, default=50, help="pdf_burst: concurrent uploads")
+    parser.add_argument("--pages", type=int, default=4, help="pdf_burst: pages per PDF")
+    parser.add_argument("--seed-records", type=int, default=10, help="dashboard_polling: records created first")
+    parser.add_argument("--poll-users", type=int, default=20)
+    parser.add_argument("--poll-duration", type=float, default=15.0)
+    parser.add_argument("--poll-interval", type=float, default=0.2)
+    parser.add_argument("--radiology-uploads", type=int, default=5)
+    parser.add_argument("--radiology-mb", type=int, default=20)
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    opts = parse_args(argv)
+    names = opts.scenario or list(SCENARIOS)
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "options": {k: v for k, v in vars(opts).items() if k not in ("output", "scenario")},
+        },
+        "scenarios": {},
+    }
+    variants = [("", ())]
+    if opts.matrix:
+        key, _, values = opts.matrix.partition("=")
+        variants = [(f"[{key}={v}]", (f"{key}={v}",)) for v in values.split(",")]
+    for name in names:
+        for suffix, extra_env in variants:
+            print(f"running {name}{suffix} ...", file=sys.stderr)
+            report["scenarios"][name + suffix] = run_scenario(name, opts, extra_env)
+    if opts.matrix:
+        # Side-by-side throughput of the variants
+        report["matrix"] = {
+            name: {
+                suffix: report["scenarios"][name + suffix].get("extra", {}).get(
+                    "pages_per_s", report["scenarios"][name + suffix]["throughput_rps"])
+                for suffix, _ in variants
+            }
+            for name in names
+        }
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if opts.output:
+        with open(opts.output, "w") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""Scripted load scenarios run against a live backend.
+
+Each scenario is an async function taking an ``httpx.AsyncClient`` pointed at
+the backend plus the parsed CLI options, and returning a ``ScenarioResult``.
+"""
+import asyncio
+import json
+import random
+import time
+from dataclasses import dataclass, field
+
+import fitz  # PyMuPDF
+import httpx
+
+
+@dataclass
+class ScenarioResult:
+    latencies_ms: list = field(default_factory=list)
+    errors: int = 0
+    error_kinds: dict = field(default_factory=dict)
+    degraded: int = 0  # requests that succeeded but carried OCR/translation error text
+    items: int = 0  # work units processed (pages, files, polls)
+    duration_s: float = 0.0
+    extra: dict = field(default_factory=dict)
+
+    def error(self, kind: str) -> None:
+        self.errors += 1
+        self.error_kinds[kind] = self.error_kinds.get(kind, 0) + 1
+
+
+def make_scanned_pdf(pages: int, seed: int) -> bytes:
+    """Build a PDF whose pages are images only, so every page goes through OCR."""
+    rng = random.Random(seed)
+    src = fitz.open()
+    out = fitz.open()
+    for p in range(pages):
+        page = src.new_page(width=595, height=842)
+        y = 60
+        while y < 780:
+            words = " ".join(f"word{rng.randint(0, 9999)}" for _ in range(rng.randint(4, 10)))
+            page.insert_text((50, y), f"Page {p + 1}: {words}", fontsize=11)
+            y += 18
+        pix = page.get_pixmap(dpi=100)
+        scanned = out.new_page(width=595, height=842)
+        scanned.insert_image(scanned.rect, stream=pix.tobytes("jpg", jpg_quality=75))
+    data = out.tobytes()
+    src.close()
+    out.close()
+    return data
+
+
+def _auth(user: str) -> dict:
+    # The UpperMind simulator derives the username from a "bench-<user>" token
+    return {"Authorization": f"Bearer bench-{user}"}
+
+
+async def _upload_report(client: httpx.AsyncClient, files: list, user: str, result: ScenarioResult) -> None:
+    start = time.perf_counter()
+    try:
+        async with client.stream("POST", "/api/reports/upload", files=files, headers=_auth(user)) as response:
+            if response.status_code != 200:
+                await response.aread()
+                result.error(f"http_{response.status_code}")
+                return
+            complete = None
+            async for line in response.aiter_lines():
+                if line.startswith("data: "):
+                    event = json.loads(line[6:])
+                    if event.get("phase") == "complete":
+                        complete = event
+    except httpx.HTTPError as exc:
+        result.error(type(exc).__name__)
+        return
+    if complete is None:
+        result.error("incomplete_stream")
+        return
+    result.latencies_ms.append((time.perf_counter() - start) * 1000)
+    if "[OCR error" in json.dumps(complete) or "[Translation error" in json.dumps(complete):
+        result.degraded += 1
+
+
+async def pdf_burst(client: httpx.AsyncClient, opts) -> ScenarioResult:
+    """N users upload a multi-page scanned PDF at the same moment."""
+    result = ScenarioResult()
+    pdf = make_scanned_pdf(opts.pages, opts.seed)
+    started = time.perf_counter()
+    await asyncio.gather(*[
+        _upload_report(client, [("files", (f"scan{i}.pdf", pdf, "application/pdf"))], f"user{i % opts.users}", result)
+        for i in range(opts.uploads)
+    ])
+    result.duration_s = time.perf_counter() - started
+    result.items = len(result.latencies_ms) * opts.pages
+    result.extra["pages_per_s"] = result.items / result.duration_s if result.duration_s else 0.0
+    result.extra["pdf_bytes"] = len(pdf)
+    return result
+
+
+async def dashboard_polling(client: httpx.AsyncClient, opts) -> ScenarioResult:
+    """Virtual users poll the record lists while a few uploads populate the DB."""
+    result = ScenarioResult()
+    seed_result = ScenarioResult()
+    pdf = make_scanned_pdf(1, opts.seed)
+    await asyncio.gather(*[
+        _upload_report(client, [("files", (f"seed{i}.pdf", pdf, "application/pdf"))], "seeder", seed_result)
+        for i in range(opts.seed_records)
+    ])
+
+    deadline = time.perf_counter() + opts.poll_duration
+    paths = ["/api/reports/records", "/api/radiology/records"]
+
+    async def poller(user: int):
+        rng = random.Random(opts.seed + user)
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                response = await client.get(rng.choice(paths), headers=_auth(f"user{user}"))
+                if response.status_code == 200:
+                    result.latencies_ms.append((time.perf_counter() - start) * 1000)
+                else:
+                    result.error(f"http_{response.status_code}")
+            except httpx.HTTPError as exc:
+                result.error(type(exc).__name__)
+            await asyncio.sleep(opts.poll_interval)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[poller(u) for u in range(opts.poll_users)])
+    result.duration_s = time.perf_counter() - started
+    result.items = len(result.latencies_ms)
+    result.extra["seed_records"] = len(seed_result.latencies_ms)
+    return result
+
+
+async def radiology_large(client: httpx.AsyncClient, opts) -> ScenarioResult:
+    """Concurrent uploads of large DICOM-sized files to the radiology endpoint."""
+    result = ScenarioResult()
+    payload = random.Random(opts.seed).randbytes(opts.radiology_mb * 1024 * 1024)
+
+    async def upload(i: int):
+        start = time.perf_counter()
+        try:
+            response = await client.post(
+                "/api/radiology/upload",
+                files=[("files", (f"study{i}.dcm", payload, "application/dicom"))],
+                headers=_auth(f"user{i % opts.users}"),
+            )
+        except httpx.HTTPError as exc:
+            result.error(type(exc).__name__)
+            return
+        if response.status_code == 200:
+            result.latencies_ms.append((time.perf_counter() - start) * 1000)
+        else:
+            result.error(f"http_{response.status_code}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*[upload(i) for i in range(opts.radiology_uploads)])
+    result.duration_s = time.perf_counter() - started
+    result.items = len(result.latencies_ms)
+    result.extra["mb_per_s"] = result.items * opts.radiology_mb / result.duration_s if result.duration_s else 0.0
+    return result
+
+
+SCENARIOS = {
+    "pdf_burst": pdf_burst,
+    "dashboard_polling": dashboard_polling,
+    "radiology_large": radiology_large,
+}
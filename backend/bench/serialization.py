@@ -0,0 +1,183 @@
+"""Measure what rendering the record endpoints' JSON costs, before and after typed responses.
+
+"before" is the old path: a hand-built dict with ISO date strings, walked by
+``jsonable_encoder`` and rendered with the standard library encoder. "after"
+builds the response models and serializes them through the route's own
+response field (pydantic-core) and orjson, as FastAPI does for the endpoint.
+Both produce the same document; the bytes column also shows it gzipped at
+``JSON_GZIP_LEVEL`` and the time that takes. SSE progress events are timed
+with ``json.dumps`` against ``responses.sse``.
+
+Usage (from ``backend/``)::
+
+    python -m bench.serialization --files 10 --versions 2 --records 500
+    python -m bench.serialization --output serialization.json
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.routing import serialize_response
+from starlette.responses import JSONResponse
+
+from app.config import settings
+from app.main import app
+from app.responses import CompressedJSONResponse, sse
+from app.routers import reports
+from app.schemas import ReportFileOut, ReportRecordOut, ReportRecordSummary, TranslationOut
+from bench.textcodec import make_document
+
+
+def _response_field(path: str):
+    return next(r.response_field for r in app.routes if getattr(r, "path", None) == path)
+
+
+def make_record(rng: random.Random, files: int, versions: int) -> dict:
+    """Row values of one report record, shaped like the ORM objects the handler reads."""
+    created = datetime(2025, 3, 1, 9, 30) + timedelta(seconds=rng.randint(0, 10**6), microseconds=rng.randint(0, 999999))
+    record = {"id": 1, "record_type": "report", "patient_note": "Ahmet Y.", "created_at": created,
+              "created_by": "intake1", "status": "complete", "files": []}
+    for f in range(files):
+        translations = []
+        for v in range(versions, 0, -1):
+            original, translated = make_document(rng, rng.choice([1, 1, 2, 3]))
+            translations.append({
+                "id": f * versions + v, "original_text": original, "translated_text": translated,
+                "ocr_duration_ms": rng.randint(800, 9000), "translation_duration_ms": rng.randint(300, 4000),
+                "translation_calls_skipped": rng.randint(0, 3), "version": v, "ocr_model": "qwen2.5vl:7b",
+                "translator_agent_id": 7, "created_at": created,
+            })
+        record["files"].append({"id": f + 1, "original_filename": f"page{f + 1}.jpg", "file_type": "jpg",
+                                "sha256": f"{rng.getrandbits(256):064x}", "status": "translated",
+                                "translations": translations})
+    return record
+
+
+def detail_before(r: dict) -> dict:
+    return {
+        **{k: r[k] for k in ("id", "record_type", "patient_note", "created_by", "status")},
+        "created_at": r["created_at"].isoformat(),
+        "files": [
+            {
+                **{k: f[k] for k in ("id", "original_filename", "file_type", "sha256", "status")},
+                "download_url": f"/api/reports/files/{f['id']}",
+                "translations": [{**t, "created_at": t["created_at"].isoformat()} for t in f["translations"]],
+            }
+            for f in r["files"]
+        ],
+    }
+
+
+def detail_after(r: dict) -> ReportRecordOut:
+    return ReportRecordOut(
+        **{k: r[k] for k in ("id", "record_type", "patient_note", "created_at", "created_by", "status")},
+        files=[
+            ReportFileOut(
+                **{k: f[k] for k in ("id", "original_filename", "file_type", "sha256", "status")},
+                download_url=f"/api/reports/files/{f['id']}",
+                translations=[TranslationOut(**t) for t in f["translations"]],
+            )
+            for f in r["files"]
+        ],
+    )
+
+
+def _summary(r: dict) -> dict:
+    return {"id": r["id"], "patient_note": r["patient_note"], "created_by": r["created_by"],
+            "file_count": len(r["files"]), "status": r["status"],
+            "translation_preview": r["files"][0]["translations"][0]["translated_text"][:200]}
+
+
+def list_before(records: list) -> list:
+    return [{**_summary(r), "created_at": r["created_at"].isoformat()} for r in records]
+
+
+def list_after(records: list) -> list:
+    return [ReportRecordSummary(**_summary(r), created_at=r["created_at"]) for r in records]
+
+
+def _time(fn, repeat: int) -> tuple[float, bytes]:
+    fn()  # warm up
+    started = time.perf_counter()
+    for _ in range(repeat):
+        body = fn()
+    return (time.perf_counter() - started) * 1e6 / repeat, body
+
+
+def _render_before(build, data):
+    return lambda: JSONResponse(jsonable_encoder(build(data))).body
+
+
+def _render_after(build, data, field):
+    loop = asyncio.new_event_loop()  # serialize_response is a coroutine; its loop overhead counts against "after"
+    return lambda: CompressedJSONResponse(
+        loop.run_until_complete(serialize_response(field=field, response_content=build(data)))
+    ).body
+
+
+def run(opts) -> dict:
+    rng = random.Random(opts.seed)
+    record = make_record(rng, opts.files, opts.versions)
+    listing = [{**make_record(rng, 1, 1), "id": i} for i in range(opts.records)]
+    prefix = reports.router.prefix
+    scenarios = {
+        "detail": (detail_before, detail_after, record, _response_field(f"/api{prefix}/records/{{record_id}}")),
+        "list": (list_before, list_after, listing, _response_field(f"/api{prefix}/records")),
+    }
+    results = {}
+    for name, (before, after, data, field) in scenarios.items():
+        before_us, before_body = _time(_render_before(before, data), opts.repeat)
+        after_us, after_body = _time(_render_after(after, data, field), opts.repeat)
+        assert json.loads(before_body) == json.loads(after_body), f"{name}: the documents differ"
+        gzip_us, gzipped = _time(lambda: gzip.compress(after_body, settings.JSON_GZIP_LEVEL, mtime=0), opts.repeat)
+        results[name] = {
+            "before_us": round(before_us, 1),
+            "after_us": round(after_us, 1),
+            "speedup": round(before_us / after_us, 2),
+            "before_bytes": len(before_body),
+            "after_bytes": len(after_body),
+            "gzip_bytes": len(gzipped),
+            "gzip_us": round(gzip_us, 1),
+        }
+
+    events = [{"phase": "ocr", "done": i + 1, "total": opts.files} for i in range(opts.files)]
+    sse_before, old = _time(lambda: [f"data: {json.dumps(e)}\n\n".encode() for e in events], opts.repeat)
+    sse_after, new = _time(lambda: [sse(e) for e in events], opts.repeat)
+    results["sse"] = {
+        "before_us": round(sse_before / len(events), 2),
+        "after_us": round(sse_after / len(events), 2),
+        "speedup": round(sse_before / sse_after, 2),
+        "before_bytes": sum(map(len, old)),
+        "after_bytes": sum(map(len, new)),
+    }
+    return {"files": opts.files, "versions": opts.versions, "records": opts.records, "results": results}
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=10, help="files in the detail record")
+    parser.add_argument("--versions", type=int, default=2, help="translation versions per file")
+    parser.add_argument("--records", type=int, default=500, help="records in the listing")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="", help="also write the results as JSON here")
+    opts = parser.parse_args(argv)
+
+    result = run(opts)
+    print(f"{'scenario':<8} {'before us':>10} {'after us':>9} {'speedup':>8} {'bytes':>9} {'orjson':>9} "
+          f"{'gzip':>8} {'gzip us':>8}")
+    for name, r in result["results"].items():
+        print(f"{name:<8} {r['before_us']:>10} {r['after_us']:>9} {r['speedup']:>8} {r['before_bytes']:>9} "
+              f"{r['after_bytes']:>9} {r.get('gzip_bytes', '-'):>8} {r.get('gzip_us', '-'):>8}")
+    if opts.output:
+        with open(opts.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""Stand-in UpperMind and Ollama servers for benchmarks.
+
+Both simulators answer the endpoints the backend uses with canned payloads
+after a sampled delay. Latency distribution, failure rate and a concurrency
+limit (with an optional bounded queue, beyond which requests get 503) are
+configured per upstream through ``UpstreamProfile``.
+
+Run standalone::
+
+    python -m bench.simulators ollama --port 11500 --profile '{"latency": {"median_ms": 800}}'
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+from dataclasses import asdict, dataclass, field
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+@dataclass
+class Latency:
+    distribution: str = "lognormal"  # constant | uniform | exponential | lognormal
+    median_ms: float = 100.0
+    sigma: float = 0.5  # lognormal shape, or +/- fraction for uniform
+    per_kb_ms: float = 0.0  # extra delay per KiB of request payload
+    per_item_ms: float = 0.0  # extra delay per item in the request (images for Ollama)
+    stall_rate: float = 0.0  # fraction of requests that get stuck behind a slow batch
+    stall_ms: float = 0.0  # extra delay of a stuck request
+
+    def sample(self, rng: random.Random, payload_bytes: int = 0, items: int = 1) -> float:
+        """Return a delay in seconds."""
+        if self.distribution == "constant":
+            base = self.median_ms
+        elif self.distribution == "uniform":
+            base = rng.uniform(self.median_ms * (1 - self.sigma), self.median_ms * (1 + self.sigma))
+        elif self.distribution == "exponential":
+            base = rng.expovariate(math.log(2) / self.median_ms)  # median of Exp(l) is ln2/l
+        elif self.distribution == "lognormal":
+            base = rng.lognormvariate(math.log(self.median_ms), self.sigma)
+        else:
+            raise ValueError(f"Unknown latency distribution: {self.distribution}")
+        if self.stall_rate and rng.random() < self.stall_rate:
+            base += self.stall_ms
+        return max(0.0, base + self.per_kb_ms * payload_bytes / 1024 + self.per_item_ms * items) / 1000
+
+
+@dataclass
+class UpstreamProfile:
+    latency: Latency = field(default_factory=Latency)
+    failure_rate: float = 0.0  # fraction of requests answered with HTTP 500
+    concurrency: int = 0  # requests served at once, 0 = unlimited
+    max_queue: int = 0  # requests allowed to wait for a slot, 0 = unbounded
+    load_ms: float = 0.0  # Ollama: one-off model load paid by the first request for a model
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "UpstreamProfile":
+        data = dict(data)
+        latency = Latency(**data.pop("latency", {}))
+        return cls(latency=latency, **data)
+
+
+class _Gate:
+    """Concurrency limit with a bounded waiting room, like a GPU inference queue."""
+
+    def __init__(self, profile: UpstreamProfile):
+        self.profile = profile
+        self.semaphore = asyncio.Semaphore(profile.concurrency) if profile.concurrency > 0 else None
+        self.waiting = 0
+        self.stats = {"requests": 0, "rejected": 0, "failed": 0, "max_waiting": 0}
+
+    def admit(self) -> bool:
+        self.stats["requests"] += 1
+        if self.semaphore is not None and self.profile.max_queue > 0 and self.semaphore.locked() \
+                and self.waiting >= self.profile.max_queue:
+            self.stats["rejected"] += 1
+            return False
+        return True
+
+    async def __aenter__(self):
+        if self.semaphore is not None:
+            self.waiting += 1
+            self.stats["max_waiting"] = max(self.stats["max_waiting"], self.waiting)
+            try:
+                await self.semaphore.acquire()
+            finally:
+                self.waiting -= 1
+
+    async def __aexit__(self, *exc):
+        if self.semaphore is not None:
+            self.semaphore.release()
+
+
+def _stats_route(app: FastAPI, gate: _Gate) -> None:
+    @app.get("/_sim/stats")
+    async def stats():
+        return {**gate.stats, "waiting": gate.waiting, "profile": asdict(gate.profile)}
+
+
+def create_uppermind_app(profile: UpstreamProfile, seed: int = 0) -> FastAPI:
+    """UpperMind stand-in: token issue, ``/auth/me`` and the translator chat."""
+    app = FastAPI()
+    rng = random.Random(seed)
+    gate = _Gate(profile)
+    auth_latency = Latency(distribution="constant", median_ms=5)
+    _stats_route(app, gate)
+
+    @app.post("/auth/token")
+    async def token(request: Request):
+        form = await request.form()
+        await asyncio.sleep(auth_latency.sample(rng))
+        return {"access_token": f"bench-{form.get('username', 'user')}", "token_type": "bearer"}
+
+    @app.get("/auth/me")
+    async def me(request: Request):
+        auth = request.headers.get("Authorization", "")
+        username = auth.removeprefix("Bearer ").removeprefix("bench-") or "bench"
+        await asyncio.sleep(auth_latency.sample(rng))
+        return {"id": 1, "username": username, "email": f"{username}@bench.local"}
+
+    @app.post("/chat/noninteractive")
+    async def chat(request: Request):
+        body = await request.body()
+        if not gate.admit():
+            return JSONResponse({"detail": "queue full"}, status_code=503)
+        async with gate:
+            await asyncio.sleep(profile.latency.sample(rng, len(body)))
+        if rng.random() < profile.failure_rate:
+            gate.stats["failed"] += 1
+            return JSONResponse({"detail": "simulated failure"}, status_code=500)
+        content = json.loads(body).get("content", "")
+        return {"ai_message": f"analysis of the request assistantfinal [TR] {content}"}
+
+    return app
+
+
+def create_ollama_app(profile: UpstreamProfile, seed: int = 0) -> FastAPI:
+    """Ollama stand-in: ``/api/generate`` with and without streaming, and ``/api/ps``."""
+    app = FastAPI()
+    rng = random.Random(seed)
+    gate = _Gate(profile)
+    _stats_route(app, gate)
+    loaded: dict[str, asyncio.Task] = {}
+
+    async def load(model: str) -> float:
+        """Wait for ``model`` to be resident; returns the load time this request paid."""
+        task = loaded.get(model)
+        if task is None:
+            task = loaded[model] = asyncio.ensure_future(asyncio.sleep(profile.load_ms / 1000))
+            gate.stats["loads"] = gate.stats.get("loads", 0) + 1
+        if task.done():
+            return 0.0
+        start = time.monotonic()
+        await asyncio.shield(task)
+        return time.monotonic() - start
+
+    @app.get("/api/ps")
+    async def ps():
+        return {"models": [
+            {"name": m if ":" in m else f"{m}:latest", "model": m, "expires_at": "2099-01-01T00:00:00Z"}
+            for m, task in loaded.items() if task.done()
+        ]}
+
+    @app.post("/api/generate")
+    async def generate(request: Request):
+        body = await request.body()
+        if not gate.admit():
+            return JSONResponse({"error": "server busy"}, status_code=503)
+        payload = json.loads(body)
+        n_images = len(payload.get("images") or [])
+        started = time.monotonic_ns()
+        load_s = await load(payload.get("model", ""))
+        async with gate:
+            await asyncio.sleep(profile.latency.sample(rng, len(body), n_images))
+        if rng.random() < profile.failure_rate:
+            gate.stats["failed"] += 1
+            return JSONResponse({"error": "simulated failure"}, status_code=500)
+
+        gate.stats["images"] = gate.stats.get("images", 0) + n_images
+        lines = []
+        for page in range(n_images):
+            if n_images > 1:
+                lines.append(f"=== PAGE {page + 1} ===")  # delimiter format requested by batched OCR
+            lines.extend(f"Simulated OCR line {i + 1} of the scanned page." for i in range(12))
+        text = "\n".join(lines)
+        elapsed = time.monotonic_ns() - started
+        stats = {
+            "done": True,
+            "model": payload.get("model", ""),
+            "prompt_eval_count": 64 + 256 * n_images,
+            "eval_count": len(text.split()),
+            "eval_duration": int(elapsed * 0.8),
+            "prompt_eval_duration": int(elapsed * 0.2),
+            "load_duration": int(load_s * 1e9),
+            "total_duration": elapsed,
+        }
+        if payload.get("stream", True):
+            async def chunks():
+                for line in lines:
+                    yield json.dumps({"response": line + "\n", "done": False}) + "\n"
+                yield json.dumps({"response": "", **stats}) + "\n"
+            return StreamingResponse(chunks(), media_type="application/x-ndjson")
+        return {"response": text, **stats}
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("upstream", choices=["uppermind", "ollama"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--profile", default="{}", help="UpstreamProfile as JSON")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    profile = UpstreamProfile.from_dict(json.loads(args.profile))
+    factory = create_uppermind_app if args.upstream == "uppermind" else create_ollama_app
+    uvicorn.run(factory(profile, args.seed), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
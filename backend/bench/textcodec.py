@@ -0,0 +1,150 @@
+"""Measure what compressing the translation text columns costs and saves.
+
+Builds a corpus of report-like documents (or reads the translations of an
+existing database with ``--database``), then for each codec reports the
+compression ratio, compress/decompress time per document, and the size of
+a SQLite file holding the corpus plus the time to write and read it back.
+
+Usage (from ``backend/``)::
+
+    python -m bench.textcodec --documents 2000
+    python -m bench.textcodec --database sqlite:///./data/intpatient.db --output codec.json
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from unittest.mock import patch
+
+import zstandard as zstd
+from sqlalchemy import Column, Integer, MetaData, Table, Text, create_engine, insert, select
+
+from app import compression
+from app.config import settings
+from app.services.langid import _SAMPLES
+
+_SECTIONS = {
+    "tr": ["HASTA BİLGİLERİ", "KLİNİK BİLGİ", "BULGULAR", "SONUÇ", "ÖNERİLER"],
+    "en": ["PATIENT INFORMATION", "CLINICAL HISTORY", "FINDINGS", "IMPRESSION", "RECOMMENDATIONS"],
+}
+_TESTS = ["Hemoglobin", "Lökosit", "Trombosit", "Glukoz", "Üre", "Kreatinin", "ALT", "AST", "CRP", "Sodyum", "Potasyum"]
+
+
+def make_document(rng: random.Random, pages: int) -> tuple[str, str]:
+    """One OCR'd report and its translation, ``pages`` pages long."""
+    parts = {"tr": [], "en": []}
+    for page in range(pages):
+        for lang in ("tr", "en"):
+            sentences = [s.strip() for s in _SAMPLES[lang].split(".") if s.strip()]
+            parts[lang].append(f"Sayfa {page + 1} / {pages}" if lang == "tr" else f"Page {page + 1} of {pages}")
+            parts[lang].append(f"Protokol No: {rng.randint(100000, 999999)}  Tarih: {rng.randint(1, 28):02d}.{rng.randint(1, 12):02d}.2025")
+            for title in _SECTIONS[lang]:
+                parts[lang].append(title)
+                parts[lang].append(". ".join(rng.sample(sentences, k=min(3, len(sentences)))) + ".")
+            for test in rng.sample(_TESTS, k=6):
+                parts[lang].append(f"{test:<12} {rng.uniform(0.5, 250):8.2f}  ({rng.randint(1, 50)}-{rng.randint(60, 300)})")
+    return "\n".join(parts["tr"]), "\n".join(parts["en"])
+
+
+def load_corpus(opts) -> list[str]:
+    if opts.database:
+        engine = create_engine(opts.database)
+        with engine.connect() as conn:
+            rows = conn.exec_driver_sql("SELECT original_text, translated_text FROM translations").all()
+        return [compression.decompress(v) for row in rows for v in row if v]
+    rng = random.Random(opts.seed)
+    return [text for _ in range(opts.documents) for text in make_document(rng, rng.choice([1, 1, 2, 3, 5]))]
+
+
+def _codecs(train_docs: list[str], dict_dir: str) -> dict:
+    data = compression.train(train_docs, 112640)
+    dict_id = zstd.ZstdCompressionDict(data).dict_id()
+    with open(os.path.join(dict_dir, f"{dict_id}.zdict"), "wb") as f:
+        f.write(data)
+    return {
+        "text": None,
+        "zstd-3": {"TEXT_ZSTD_LEVEL": 3, "TEXT_ZSTD_DICT_ID": 0},
+        "zstd-9": {"TEXT_ZSTD_LEVEL": 9, "TEXT_ZSTD_DICT_ID": 0},
+        "zstd-9+dict": {"TEXT_ZSTD_LEVEL": 9, "TEXT_ZSTD_DICT_ID": dict_id},
+    }
+
+
+def _db_roundtrip(docs: list[str], column_type, path: str) -> dict:
+    engine = create_engine(f"sqlite:///{path}")
+    table = Table("translations", MetaData(), Column("id", Integer, primary_key=True), Column("body", column_type))
+    table.metadata.create_all(engine)
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        conn.execute(insert(table), [{"body": d} for d in docs])
+    write_s = time.perf_counter() - started
+    started = time.perf_counter()
+    with engine.connect() as conn:
+        read = conn.execute(select(table.c.body)).scalars().all()
+    read_s = time.perf_counter() - started
+    assert read == docs
+    engine.dispose()
+    return {
+        "db_mb": round(os.path.getsize(path) / 1e6, 2),
+        "db_write_ms_per_doc": round(write_s * 1000 / len(docs), 4),
+        "db_read_ms_per_doc": round(read_s * 1000 / len(docs), 4),
+    }
+
+
+def run(opts) -> dict:
+    corpus = load_corpus(opts)
+    rng = random.Random(opts.seed)
+    rng.shuffle(corpus)
+    train_docs, docs = corpus[: len(corpus) // 5], corpus[len(corpus) // 5:]
+    raw_bytes = sum(len(d.encode("utf-8")) for d in docs)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, overrides in _codecs(train_docs, tmp).items():
+            if overrides is None:
+                results[name] = {"ratio": 1.0, **_db_roundtrip(docs, Text, os.path.join(tmp, f"{name}.db"))}
+                continue
+            with patch.multiple(settings, TEXT_ZSTD_DICT_DIR=tmp, **overrides):
+                started = time.perf_counter()
+                stored = [compression.compress(d) for d in docs]
+                compress_s = time.perf_counter() - started
+                started = time.perf_counter()
+                for value in stored:
+                    compression.decompress(value)
+                decompress_s = time.perf_counter() - started
+                results[name] = {
+                    "ratio": round(raw_bytes / sum(len(v) for v in stored), 2),
+                    "compress_us_per_doc": round(compress_s * 1e6 / len(docs), 1),
+                    "decompress_us_per_doc": round(decompress_s * 1e6 / len(docs), 1),
+                    **_db_roundtrip(docs, compression.CompressedText, os.path.join(tmp, f"{name}.db")),
+                }
+    return {
+        "documents": len(docs),
+        "median_doc_bytes": statistics.median(len(d.encode("utf-8")) for d in docs),
+        "raw_mb": round(raw_bytes / 1e6, 2),
+        "codecs": results,
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=2000, help="synthetic reports (each gives two texts)")
+    parser.add_argument("--database", default="", help="read the corpus from this database's translations instead")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="", help="also write the results as JSON here")
+    opts = parser.parse_args(argv)
+
+    result = run(opts)
+    print(f"{result['documents']} texts, median {result['median_doc_bytes']} bytes, {result['raw_mb']} MB raw")
+    print(f"{'codec':<12} {'ratio':>6} {'comp us':>8} {'decomp us':>9} {'db MB':>7} {'write ms':>9} {'read ms':>8}")
+    for name, r in result["codecs"].items():
+        print(f"{name:<12} {r['ratio']:>6} {r.get('compress_us_per_doc', '-'):>8} {r.get('decompress_us_per_doc', '-'):>9} "
+              f"{r['db_mb']:>7} {r['db_write_ms_per_doc']:>9} {r['db_read_ms_per_doc']:>8}")
+    if opts.output:
+        with open(opts.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
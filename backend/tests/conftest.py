@@ -2,6 +2,9 @@ import os
 import pytest
 from unittest.mock import AsyncMock, patch
 
+# No background model warm-up against a real Ollama while testing
+os.environ.setdefault("OLLAMA_WARMUP_INTERVAL", "0")
+
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
@@ -0,0 +1,75 @@
+import io
+from unittest.mock import patch
+
+import pytest
+
+from app.services.admission import controller
+
+
+@pytest.fixture()
+def admission_limits():
+    """Patch admission thresholds; reset the controller's counters afterwards."""
+    with patch("app.services.admission.settings") as mock_settings:
+        mock_settings.ADMISSION_MAX_QUEUED_PAGES = 10
+        mock_settings.ADMISSION_MAX_GPU_JOBS = 100
+        mock_settings.ADMISSION_MAX_INFLIGHT_MB = 1
+        mock_settings.ADMISSION_MAX_RETRY_AFTER = 300
+        mock_settings.OCR_CONCURRENCY = 2
+        yield mock_settings
+    controller.pending_pages = 0
+    controller.in_flight_bytes = 0
+    controller.ocr_seconds_per_page = 5.0
+
+
+class TestAdmissionControl:
+    def test_rejects_when_page_backlog_full(self, client, admission_limits, mock_ocr, mock_uppermind_translate):
+        """Test uploads get 503 with Retry-After and never reach OCR when pages are backed up."""
+        controller.pending_pages = 14
+        controller.ocr_seconds_per_page = 2.0
+
+        response = client.post(
+            "/api/reports/upload",
+            files=[("files", ("report.png", io.BytesIO(b"\x89PNG" + b"\x00" * 50), "image/png"))],
+        )
+
+        assert response.status_code == 503
+        # 5 excess pages at 2 OCR slots x 0.5 pages/s each
+        assert response.headers["retry-after"] == "5"
+        mock_ocr.assert_not_called()
+
+    def test_rejects_when_in_flight_bytes_exceeded(self, client, admission_limits, mock_ocr):
+        """Test a new upload is rejected when other uploads already hold the byte budget."""
+        controller.in_flight_bytes = 900 * 1024
+
+        response = client.post(
+            "/api/reports/upload",
+            files=[("files", ("report.png", io.BytesIO(b"\x00" * 200 * 1024), "image/png"))],
+        )
+
+        assert response.status_code == 503
+        assert int(response.headers["retry-after"]) >= 1
+
+    def test_accepts_and_releases(self, client, admission_limits, mock_ocr, mock_uppermind_translate):
+        """Test admitted uploads count towards the backlog only while they run."""
+        response = client.post(
+            "/api/reports/upload",
+            files=[
+                ("files", ("a.png", io.BytesIO(b"\x89PNG" + b"\x00" * 50), "image/png")),
+                ("files", ("b.png", io.BytesIO(b"\x89PNG" + b"\x00" * 50), "image/png")),
+            ],
+        )
+
+        assert response.status_code == 200
+        assert controller.pending_pages == 0
+        assert controller.in_flight_bytes == 0
+
+    def test_other_endpoints_unaffected(self, client, admission_limits):
+        """Test the backlog only gates report uploads."""
+        controller.pending_pages = 1000
+
+        response = client.post(
+            "/api/radiology/upload",
+            files=[("files", ("xray.png", io.BytesIO(b"\x89PNG" + b"\x00" * 50), "image/png"))],
+        )
+
+        assert response.status_code == 200
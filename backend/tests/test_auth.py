@@ -1,10 +1,17 @@
+import json
+import time
+
+import httpx
+import jwt
 import pytest
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 from fastapi.testclient import TestClient
 
+from app.config import settings
 from app.main import app
 from app.database import get_db
+from app.services.tokens import verifier
 from tests.conftest import override_get_db
 
 
@@ -80,3 +87,101 @@ class TestMe:
                 headers={"Authorization": "Bearer invalid-token"},
             )
             assert response.status_code == 401
+
+
+def _jwt(key, algorithm="HS256", kid=None, expires_in=300, **claims):
+    payload = {"sub": "1", "exp": int(time.time()) + expires_in, **claims}
+    return jwt.encode(payload, key, algorithm=algorithm, headers={"kid": kid} if kid else None)
+
+
+@pytest.fixture()
+def hmac_key():
+    with patch.object(settings, "JWT_KEY", "s3cret-" * 6), patch.object(settings, "JWT_ALGORITHMS", "HS256"):
+        verifier._users.clear()
+        yield settings.JWT_KEY
+
+
+class TestLocalVerification:
+    def test_claims_user_needs_no_uppermind_call(self, auth_client, hmac_key):
+        """Test a signed token carrying the username is accepted without /auth/me."""
+        token = _jwt(hmac_key, username="drkaya", email="kaya@example.com")
+        with patch("app.routers.auth.get_user", new_callable=AsyncMock) as mock_user:
+            mock_user.side_effect = Exception("UpperMind unreachable")
+            response = auth_client.get("/api/auth/me", headers={"Authorization": f"Bearer {token}"})
+
+        assert response.status_code == 200
+        assert response.json() == {"id": "1", "username": "drkaya", "email": "kaya@example.com"}
+        mock_user.assert_not_called()
+
+    def test_token_without_user_claims_fetched_once(self, auth_client, hmac_key, mock_uppermind_get_user):
+        """Test /auth/me is only asked the first time a claim-less token is seen."""
+        token = _jwt(hmac_key)
+        for _ in range(3):
+            response = auth_client.get("/api/auth/me", headers={"Authorization": f"Bearer {token}"})
+            assert response.status_code == 200
+            assert response.json()["username"] == "testuser"
+
+        mock_uppermind_get_user.assert_called_once_with(token)
+
+    def test_bad_signature_and_expired_rejected(self, auth_client, hmac_key, mock_uppermind_get_user):
+        """Test forged or expired tokens are refused locally."""
+        forged = _jwt("another-secret-" * 3, username="drkaya")
+        expired = _jwt(hmac_key, expires_in=-3600, username="drkaya")
+        for token in (forged, expired):
+            response = auth_client.get("/api/auth/me", headers={"Authorization": f"Bearer {token}"})
+            assert response.status_code == 401
+        mock_uppermind_get_user.assert_not_called()
+
+    def test_opaque_token_falls_back_to_uppermind(self, auth_client, hmac_key, mock_uppermind_get_user):
+        """Test a token that is not a JWT is still validated remotely."""
+        response = auth_client.get("/api/auth/me", headers={"Authorization": "Bearer opaque-token"})
+
+        assert response.status_code == 200
+        mock_uppermind_get_user.assert_called_once_with("opaque-token")
+
+    def test_login_skips_auth_me_for_signed_token(self, auth_client, hmac_key):
+        """Test login takes the user from the token it just received."""
+        token = _jwt(hmac_key, username="testuser")
+        with patch("app.routers.auth.authenticate", new_callable=AsyncMock) as mock_auth, \
+                patch("app.routers.auth.get_user", new_callable=AsyncMock) as mock_user:
+            mock_auth.return_value = {"access_token": token}
+            response = auth_client.post("/api/auth/login", json={"username": "testuser", "password": "x"})
+
+        assert response.status_code == 200
+        assert response.json()["user"]["username"] == "testuser"
+        mock_user.assert_not_called()
+
+
+class TestJWKS:
+    @pytest.mark.asyncio
+    async def test_rotated_key_is_fetched_and_outage_keeps_old_keys(self):
+        """Test an unknown kid triggers a refetch, and a failed refresh keeps the cached keys."""
+        from cryptography.hazmat.primitives.asymmetric import rsa
+        from app.services.tokens import TokenVerifier
+
+        old, new = (rsa.generate_private_key(public_exponent=65537, key_size=2048) for _ in range(2))
+
+        def jwks(*keys):
+            response = MagicMock()
+            response.raise_for_status = MagicMock()
+            response.json.return_value = {"keys": [
+                {**json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(k.public_key())), "kid": kid, "use": "sig"}
+                for kid, k in keys
+            ]}
+            return response
+
+        client = AsyncMock()
+        client.get.side_effect = [jwks(("k1", old)), jwks(("k1", old), ("k2", new)), httpx.ConnectError("down")]
+        client.__aenter__ = AsyncMock(return_value=client)
+        client.__aexit__ = AsyncMock(return_value=False)
+
+        tv = TokenVerifier()
+        with patch.object(settings, "JWT_KEY", ""), patch.object(settings, "JWT_JWKS_URL", "http://um/jwks"), \
+                patch.object(settings, "JWT_ALGORITHMS", "RS256"), \
+                patch("app.services.tokens._MIN_JWKS_RETRY_S", 0), patch("httpx.AsyncClient", return_value=client):
+            assert (await tv.verify(_jwt(old, "RS256", kid="k1", username="a")))["username"] == "a"
+            assert (await tv.verify(_jwt(new, "RS256", kid="k2", username="b")))["username"] == "b"
+            with patch.object(settings, "JWT_JWKS_REFRESH_S", 0):
+                assert (await tv.verify(_jwt(old, "RS256", kid="k1", username="c")))["username"] == "c"
+
+        assert client.get.call_count == 3
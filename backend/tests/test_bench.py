@@ -0,0 +1,94 @@
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+from bench.compare import compare
+from bench.simulators import Latency, UpstreamProfile, create_ollama_app, create_uppermind_app
+
+
+class TestSimulators:
+    @pytest.mark.parametrize("distribution", ["constant", "uniform", "exponential", "lognormal"])
+    def test_latency_median(self, distribution):
+        """Test sampled delays are centred on the configured median."""
+        latency = Latency(distribution=distribution, median_ms=100, sigma=0.3)
+        rng = random.Random(1)
+        samples = sorted(latency.sample(rng) for _ in range(2001))
+        assert samples[1000] == pytest.approx(0.1, rel=0.2)
+
+    def test_latency_scales_with_payload(self):
+        """Test per-KiB latency is added on top of the base delay."""
+        latency = Latency(distribution="constant", median_ms=10, per_kb_ms=1)
+        assert latency.sample(random.Random(0), 10 * 1024) == pytest.approx(0.02)
+
+    def test_ollama_generate(self):
+        """Test the Ollama stand-in answers both streaming and plain requests."""
+        app = create_ollama_app(UpstreamProfile(latency=Latency(distribution="constant", median_ms=0)))
+        with TestClient(app) as c:
+            plain = c.post("/api/generate", json={"model": "m", "images": ["x"], "stream": False}).json()
+            streamed = c.post("/api/generate", json={"model": "m", "images": ["x"]}).text.splitlines()
+
+        assert plain["response"].startswith("Simulated OCR line 1")
+        assert plain["eval_count"] > 0
+        assert '"done": true' in streamed[-1]
+
+    def test_ollama_batched_pages_are_delimited(self):
+        """Test multi-image requests get one marked section per image and per-image delay."""
+        app = create_ollama_app(UpstreamProfile(latency=Latency(distribution="constant", median_ms=0)))
+        with TestClient(app) as c:
+            plain = c.post("/api/generate", json={"model": "m", "images": ["x", "y", "z"], "stream": False}).json()
+            stats = c.get("/_sim/stats").json()
+
+        from app.services.ocr import _split_pages
+        assert len(_split_pages(plain["response"], 3)) == 3
+        assert stats["images"] == 3
+        assert Latency(distribution="constant", median_ms=10, per_item_ms=5).sample(random.Random(0), items=4) \
+            == pytest.approx(0.03)
+
+    def test_ollama_cold_load(self):
+        """Test only the first request pays load_ms and /api/ps lists the model afterwards."""
+        profile = UpstreamProfile(latency=Latency(distribution="constant", median_ms=0), load_ms=50)
+        with TestClient(create_ollama_app(profile)) as c:
+            before = c.get("/api/ps").json()
+            first = c.post("/api/generate", json={"model": "m", "prompt": "", "stream": False}).json()
+            second = c.post("/api/generate", json={"model": "m", "images": ["x"], "stream": False}).json()
+            after = c.get("/api/ps").json()
+
+        assert before["models"] == []
+        assert first["load_duration"] >= 40e6
+        assert second["load_duration"] == 0
+        assert after["models"][0]["name"] == "m:latest"
+
+    def test_uppermind_failure_rate(self):
+        """Test the UpperMind stand-in fails every request when failure_rate is 1."""
+        profile = UpstreamProfile(latency=Latency(distribution="constant", median_ms=0), failure_rate=1.0)
+        with TestClient(create_uppermind_app(profile)) as c:
+            response = c.post("/chat/noninteractive", json={"content": "hello", "agent_id": 1})
+            stats = c.get("/_sim/stats").json()
+
+        assert response.status_code == 500
+        assert stats["failed"] == 1
+
+
+class TestCompare:
+    def test_flags_regressions(self):
+        """Test latency increases and throughput drops beyond the threshold are flagged."""
+        base = {"scenarios": {"s": {"latency_ms": {"p50": 100, "p95": 200, "p99": 300}, "throughput_rps": 10}}}
+        head = {"scenarios": {"s": {"latency_ms": {"p50": 105, "p95": 300, "p99": 300}, "throughput_rps": 5}}}
+
+        flagged = {metric for _, metric, _, _, _, regressed in compare(base, head, 0.1) if regressed}
+        assert flagged == {"latency_ms.p95", "throughput_rps"}
+
+
+class TestSerialization:
+    def test_typed_responses_render_the_same_document(self):
+        """Test the benchmark's before and after paths agree and report sizes for each scenario."""
+        from argparse import Namespace
+
+        from bench.serialization import run
+
+        result = run(Namespace(files=2, versions=2, records=3, repeat=1, seed=0))["results"]
+
+        assert set(result) == {"detail", "list", "sse"}
+        assert result["detail"]["before_bytes"] == result["detail"]["after_bytes"]
+        assert result["detail"]["gzip_bytes"] < result["detail"]["after_bytes"]
@@ -0,0 +1,232 @@
+import asyncio
+import io
+import os
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+
+from app.models import Blob, Record, UploadedFile
+from app.services import blobs, storage
+
+
+@pytest.fixture()
+def blob_dir(tmp_path):
+    with patch.object(blobs.settings, "UPLOAD_DIR", str(tmp_path)):
+        yield tmp_path / "blobs"
+
+
+def _upload(client, *contents):
+    files = [("files", (f"scan{i}.png", io.BytesIO(c), "image/png")) for i, c in enumerate(contents)]
+    response = client.post("/api/radiology/upload", files=files)
+    assert response.status_code == 200
+    return response.json()
+
+
+def _stored_files(root):
+    return [os.path.join(d, n) for d, _, names in os.walk(root) for n in names if os.path.basename(d) != "tmp"]
+
+
+class TestBlobStore:
+    def test_incomplete_backend_fails_when_created(self):
+        """Test a backend missing part of the interface is refused up front, not on first use."""
+        class Partial(storage.Storage):
+            def exists(self, key):
+                return False
+
+        with pytest.raises(TypeError, match="abstract"):
+            Partial()
+
+    def test_identical_uploads_share_one_blob(self, client, db_session, blob_dir):
+        """Test the same bytes uploaded twice across records are stored once and counted twice."""
+        first = _upload(client, b"\x89PNG same bytes")
+        second = _upload(client, b"\x89PNG same bytes", b"\x89PNG other bytes")
+
+        sha = first["files"][0]["sha256"]
+        assert second["files"][0]["sha256"] == sha
+        assert len(_stored_files(blob_dir)) == 2
+        assert storage.backend().path(blobs.key_for(sha)) == str(blob_dir / sha[:2] / sha[2:4] / sha)
+        assert db_session.get(Blob, sha).ref_count == 2
+
+    def test_download_etag(self, client, blob_dir):
+        """Test downloads carry the content hash as ETag and revalidate with 304."""
+        data = _upload(client, b"\x89PNG etag bytes")
+        url = data["files"][0]["download_url"]
+
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.content == b"\x89PNG etag bytes"
+        assert response.headers["etag"] == f'"{data["files"][0]["sha256"]}"'
+
+        cached = client.get(url, headers={"If-None-Match": response.headers["etag"]})
+        assert cached.status_code == 304
+        assert cached.content == b""
+
+    def test_ranged_download(self, client, blob_dir):
+        """Test a single byte range is served as 206 and an impossible one as 416."""
+        data = _upload(client, b"\x89PNG 0123456789")
+        url = data["files"][0]["download_url"]
+
+        partial = client.get(url, headers={"Range": "bytes=5-8"})
+        assert partial.status_code == 206
+        assert partial.content == b"0123"
+        assert partial.headers["content-range"] == "bytes 5-8/15"
+        assert client.get(url, headers={"Range": "bytes=-3"}).content == b"789"
+        assert client.get(url, headers={"Range": "bytes=99-"}).status_code == 416
+
+    def test_gc_keeps_referenced_and_recent_blobs(self, client, db_session, blob_dir):
+        """Test GC removes only blobs that are unreferenced and past the grace period."""
+        data = _upload(client, b"\x89PNG kept", b"\x89PNG released")
+        kept, released = (f["sha256"] for f in data["files"])
+
+        record = db_session.get(Record, data["id"])
+        db_session.delete(next(f for f in record.files if f.blob_sha256 == released))
+        db_session.commit()
+        assert db_session.get(Blob, released).ref_count == 0
+
+        assert blobs.collect_garbage(db_session) == {"removed": 0, "orphans": 0}
+        assert db_session.get(Blob, released) is not None
+
+        assert blobs.collect_garbage(db_session, grace_s=0) == {"removed": 1, "orphans": 0}
+        assert db_session.get(Blob, released) is None
+        assert not os.path.exists(storage.backend().path(blobs.key_for(released)))
+        assert os.path.exists(storage.backend().path(blobs.key_for(kept)))
+
+    def test_reupload_rescues_unreferenced_blob(self, client, db_session, blob_dir):
+        """Test uploading released bytes again resets the grace period and the count."""
+        data = _upload(client, b"\x89PNG again")
+        sha = data["files"][0]["sha256"]
+        db_session.delete(db_session.get(Record, data["id"]))
+        db_session.commit()
+        db_session.get(Blob, sha).last_used_at = datetime.utcnow() - timedelta(days=1)
+        db_session.commit()
+
+        _upload(client, b"\x89PNG again")
+        db_session.expire_all()
+
+        assert blobs.collect_garbage(db_session, grace_s=3600)["removed"] == 0
+        assert db_session.get(Blob, sha).ref_count == 1
+
+    def test_gc_removes_orphaned_files(self, db_session, blob_dir):
+        """Test files whose upload never committed are swept after the grace period."""
+        blobs.put(db_session, b"rolled back")
+        db_session.rollback()
+        old = datetime.now().timestamp() - 7200
+        for path in _stored_files(blob_dir):
+            os.utime(path, (old, old))
+
+        assert blobs.collect_garbage(db_session)["orphans"] == 1
+        assert _stored_files(blob_dir) == []
+
+    def test_migrate_legacy_files(self, db_session, blob_dir, tmp_path):
+        """Test files stored before the blob store are moved in and deduplicated."""
+        record = Record(record_type="radiology", created_by="testuser")
+        db_session.add(record)
+        db_session.flush()
+        for name in ("a.png", "b.png"):
+            path = tmp_path / name
+            path.write_bytes(b"legacy bytes")
+            db_session.add(UploadedFile(record_id=record.id, original_filename=name, stored_path=str(path), file_type="png"))
+        db_session.commit()
+
+        assert blobs.migrate_legacy(db_session) == 2
+
+        files = db_session.query(UploadedFile).all()
+        assert len({f.blob_sha256 for f in files}) == 1
+        assert db_session.get(Blob, files[0].blob_sha256).ref_count == 2
+        assert not (tmp_path / "a.png").exists()
+        assert len(_stored_files(blob_dir)) == 1
+
+
+@pytest.fixture()
+def s3_store(tmp_path):
+    """S3 backend against moto's in-process S3."""
+    from moto import mock_aws
+
+    with mock_aws(), patch.multiple(
+        storage.settings, STORAGE_BACKEND="s3", STORAGE_S3_BUCKET="intpatient-test", STORAGE_S3_PREFIX="test/",
+        STORAGE_S3_REGION="us-east-1", STORAGE_S3_ACCESS_KEY_ID="testing", STORAGE_S3_SECRET_ACCESS_KEY="testing",
+        STORAGE_S3_PART_SIZE_MB=5, UPLOAD_DIR=str(tmp_path),
+    ):
+        storage._instances.clear()
+        store = storage.backend()
+        store.client.create_bucket(Bucket="intpatient-test")
+        yield store
+    storage._instances.clear()
+
+
+def _objects(store):
+    return [o["Key"] for o in store.client.list_objects_v2(Bucket=store.bucket).get("Contents", [])]
+
+
+class TestS3Storage:
+    def test_upload_and_proxied_download(self, client, s3_store):
+        """Test uploads land in the bucket (deduplicated) and downloads stream from it."""
+        data = _upload(client, b"\x89PNG s3 bytes", b"\x89PNG s3 bytes")
+        sha = data["files"][0]["sha256"]
+
+        assert _objects(s3_store) == [f"test/{blobs.key_for(sha)}"]
+        response = client.get(data["files"][1]["download_url"], headers={"Range": "bytes=5-6"})
+        assert response.status_code == 206
+        assert response.content == b"s3"
+
+    def test_large_upload_uses_multipart(self, client, s3_store):
+        """Test files above the part size are uploaded in parts."""
+        content = os.urandom(11 * 1024 * 1024)
+        with patch.object(s3_store.client, "create_multipart_upload", wraps=s3_store.client.create_multipart_upload) as started:
+            data = _upload(client, content)
+
+        assert started.call_count == 1
+        assert s3_store.read(blobs.key_for(data["files"][0]["sha256"])) == content
+
+    def test_presigned_download_redirects(self, client, s3_store):
+        """Test downloads redirect to a presigned URL when enabled."""
+        data = _upload(client, b"\x89PNG presigned")
+        with patch.object(storage.settings, "STORAGE_PRESIGN_DOWNLOADS", True):
+            response = client.get(data["files"][0]["download_url"], follow_redirects=False)
+
+        assert response.status_code == 307
+        assert "X-Amz-Signature=" in response.headers["location"]
+        assert "response-content-disposition" in response.headers["location"]
+
+    def test_gc_and_migration_from_local(self, client, db_session, s3_store, tmp_path):
+        """Test local blobs are copied to S3 and GC sweeps bucket orphans."""
+        local = storage.backend("local")
+        blob = blobs.put(db_session, b"was on local disk")
+        db_session.commit()
+        s3_store.delete(blobs.key_for(blob.sha256))
+        local.write(blobs.key_for(blob.sha256), io.BytesIO(b"was on local disk"))
+
+        with patch.object(local, "read", side_effect=AssertionError("objects must be streamed, not read whole")):
+            assert blobs.copy_between(db_session, local, s3_store) == 1
+        assert blobs.copy_between(db_session, local, s3_store) == 0
+        assert s3_store.read(blobs.key_for(blob.sha256)) == b"was on local disk"
+
+        s3_store.write(blobs.key_for("f" * 64), io.BytesIO(b"orphan"))
+        assert blobs.collect_garbage(db_session, grace_s=0) == {"removed": 1, "orphans": 1}
+        assert _objects(s3_store) == []
+
+
+class TestConcurrentUploads:
+    @pytest.mark.asyncio
+    async def test_concurrent_uploads_do_not_lock_the_database(self, client, db_session, blob_dir, mock_ocr,
+                                                              mock_uppermind_translate):
+        """Test overlapping uploads never wait on a write transaction held across an await."""
+        import httpx
+
+        from app.main import app
+
+        def files(n):
+            return [("files", (f"p{i}.png", io.BytesIO(b"\x89PNG" + bytes([n, i]) * 50), "image/png"))
+                    for i in range(3)]
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as c:
+            responses = await asyncio.wait_for(asyncio.gather(
+                *(c.post("/api/reports/upload", files=files(n)) for n in range(3)),
+                *(c.post("/api/radiology/upload", files=files(10 + n)) for n in range(3)),
+            ), timeout=8)  # a blocked writer gives up after SQLite's 5 s busy timeout
+
+        assert [r.status_code for r in responses] == [200] * 6
+        assert all('"phase":"complete"' in r.text for r in responses[:3])
+        assert db_session.query(UploadedFile).count() == 18
+        assert db_session.query(Blob).filter(Blob.ref_count == 1).count() == 18
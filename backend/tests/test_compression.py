@@ -0,0 +1,94 @@
+import random
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import text
+
+from app import compression
+from app.config import settings
+from app.models import Record, Translation, UploadedFile
+from bench.textcodec import make_document
+
+
+@pytest.fixture()
+def dictionary(tmp_path):
+    """A dictionary trained on synthetic reports, active for new values."""
+    rng = random.Random(0)
+    data = compression.train([t for _ in range(300) for t in make_document(rng, 1)], 16384)
+    dict_id = compression.zstd.ZstdCompressionDict(data).dict_id()
+    (tmp_path / f"{dict_id}.zdict").write_bytes(data)
+    with patch.multiple(settings, TEXT_ZSTD_DICT_DIR=str(tmp_path), TEXT_ZSTD_DICT_ID=dict_id):
+        yield dict_id
+
+
+def _translation(db, original, translated):
+    record = Record(record_type="report", created_by="testuser")
+    db.add(record)
+    db.flush()
+    uploaded = UploadedFile(record_id=record.id, original_filename="r.pdf", stored_path="x", file_type="pdf")
+    db.add(uploaded)
+    db.flush()
+    t = Translation(file_id=uploaded.id, original_text=original, translated_text=translated)
+    db.add(t)
+    db.commit()
+    return t.id
+
+
+def _raw(db, row_id):
+    return db.execute(text("SELECT original_text, translated_text FROM translations WHERE id = :id"), {"id": row_id}).one()
+
+
+class TestCompressedText:
+    def test_roundtrip_and_short_values(self, db_session):
+        """Test long text is stored as a zstd frame, short text as plain UTF-8, both read back unchanged."""
+        long_text = "Karaciğer boyutu normal, parankim homojen. " * 50
+        row_id = _translation(db_session, long_text, "Kısa çeviri")
+        db_session.expire_all()
+
+        original, translated = _raw(db_session, row_id)
+        assert original.startswith(compression.ZSTD_MAGIC)
+        assert len(original) < len(long_text.encode()) / 10
+        assert translated == "Kısa çeviri".encode()
+        t = db_session.get(Translation, row_id)
+        assert (t.original_text, t.translated_text) == (long_text, "Kısa çeviri")
+
+    def test_dictionary_frames_survive_a_dictionary_change(self, db_session, dictionary):
+        """Test values name their dictionary, so they decode after another one becomes active."""
+        doc = make_document(random.Random(7), 2)[0]
+        row_id = _translation(db_session, doc, doc)
+        assert compression.frame_dict_id(_raw(db_session, row_id)[0]) == dictionary
+
+        with patch.object(settings, "TEXT_ZSTD_DICT_ID", 0):
+            db_session.expire_all()
+            assert db_session.get(Translation, row_id).original_text == doc
+
+    def test_backfill_compresses_legacy_rows(self, db_session, dictionary):
+        """Test rows stored as TEXT before compression are rewritten and get a preview."""
+        row_id = _translation(db_session, "x", "y")
+        legacy = "Eski kayıt metni. " * 40
+        db_session.execute(
+            text("UPDATE translations SET original_text = :t, translated_text = :t, translated_preview = NULL WHERE id = :id"),
+            {"t": legacy, "id": row_id},
+        )
+        db_session.commit()
+        assert db_session.get(Translation, row_id).translated_text == legacy
+
+        assert compression.backfill(db_session) == 1
+        assert compression.backfill(db_session) == 0
+
+        original, translated = _raw(db_session, row_id)
+        assert compression.frame_dict_id(original) == dictionary
+        db_session.expire_all()
+        t = db_session.get(Translation, row_id)
+        assert t.translated_text == legacy
+        assert t.translated_preview == legacy[:200]
+
+    def test_listing_uses_preview(self, client, mock_ocr, mock_uppermind_translate):
+        """Test record listings show the stored preview of the translation."""
+        mock_uppermind_translate.return_value = "Çeviri " * 100
+        client.post("/api/reports/upload", files=[("files", ("a.png", b"img", "image/png"))])
+
+        records = client.get("/api/reports/records").json()
+        assert records[0]["translation_preview"] == ("Çeviri " * 100)[:200]
+        detail = client.get(f"/api/reports/records/{records[0]['id']}").json()
+        assert detail["files"][0]["translations"][0]["translated_text"] == "Çeviri " * 100
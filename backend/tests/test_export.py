@@ -0,0 +1,137 @@
+import io
+import json
+import os
+import tarfile
+import time
+import zipfile
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+import pytest
+
+from app.services import blobs, export, storage
+from tests.conftest import TestingSessionLocal
+
+
+@pytest.fixture()
+def blob_dir(tmp_path):
+    with patch.object(blobs.settings, "UPLOAD_DIR", str(tmp_path)):
+        yield tmp_path / "blobs"
+
+
+def _radiology(client, *contents, note=None):
+    files = [("files", (f"scan{i}.dcm", io.BytesIO(c), "application/dicom")) for i, c in enumerate(contents)]
+    response = client.post("/api/radiology/upload", files=files, data={"patient_note": note} if note else None)
+    assert response.status_code == 200
+    return response.json()
+
+
+def _report(client):
+    response = client.post("/api/reports/upload", files=[("files", ("lab.png", io.BytesIO(b"\x89PNG lab"), "image/png"))])
+    assert response.status_code == 200
+    complete = [json.loads(line[6:]) for line in response.text.split("\n") if line.startswith("data: ")][-1]
+    return client.get(f"/api/reports/records/{complete['result']['id']}").json()
+
+
+def _zip(response):
+    assert response.status_code == 200
+    return zipfile.ZipFile(io.BytesIO(response.content))
+
+
+class TestExport:
+    def test_record_zip_with_text_sidecars(self, client, blob_dir, mock_ocr, mock_uppermind_translate):
+        """Test a report record exports its upload, both texts and a manifest."""
+        record = _report(client)
+        file_id = record["files"][0]["id"]
+
+        response = client.get(f"/api/export/records/{record['id']}")
+        assert response.headers["content-type"] == "application/zip"
+        assert f"report-{record['id']}.zip" in response.headers["content-disposition"]
+        archive = _zip(response)
+
+        path = f"report-{record['id']}/{file_id}_lab.png"
+        assert sorted(archive.namelist()) == sorted(
+            [path, f"{path}.original.txt", f"{path}.translation.txt", "manifest.json"]
+        )
+        assert archive.read(path) == b"\x89PNG lab"
+        assert archive.getinfo(path).compress_type == zipfile.ZIP_STORED
+        assert archive.read(f"{path}.original.txt").decode() == "Extracted text from image"
+        assert archive.read(f"{path}.translation.txt").decode() == "Translated text content"
+        manifest = json.loads(archive.read("manifest.json"))
+        assert manifest["records"][0]["files"][0]["path"] == path
+        assert manifest["records"][0]["files"][0]["sha256"] == record["files"][0]["sha256"]
+
+    def test_json_sidecars_and_tar(self, client, blob_dir, mock_ocr, mock_uppermind_translate):
+        """Test JSON sidecars carry every translation and tar holds the same entries."""
+        record = _report(client)
+        path = f"report-{record['id']}/{record['files'][0]['id']}_lab.png"
+
+        response = client.get(f"/api/export/records/{record['id']}", params={"format": "tar", "sidecars": "json"})
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-tar"
+        assert len(response.content) % tarfile.RECORDSIZE == 0
+        with tarfile.open(fileobj=io.BytesIO(response.content)) as tar:
+            assert sorted(tar.getnames()) == sorted([path, f"{path}.json", "manifest.json"])
+            assert tar.extractfile(path).read() == b"\x89PNG lab"
+            sidecar = json.load(tar.extractfile(f"{path}.json"))
+        assert [t["translated_text"] for t in sidecar["translations"]] == ["Translated text content"]
+
+    def test_tar_mtime_is_utc(self, monkeypatch):
+        """Test tar members carry the stored (naive UTC) time whatever the server's time zone."""
+        monkeypatch.setenv("TZ", "Asia/Kolkata")
+        time.tzset()
+        try:
+            modified = datetime(2025, 3, 1, 9, 30)
+            data = b"".join(export._tar([export._text_entry("a.txt", "x", modified)]))
+        finally:
+            monkeypatch.undo()
+            time.tzset()
+        with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+            assert tar.getmember("a.txt").mtime == modified.replace(tzinfo=timezone.utc).timestamp()
+
+    def test_bulk_export_filters(self, client, blob_dir, mock_ocr, mock_uppermind_translate):
+        """Test the bulk export picks records by type and id."""
+        first = _radiology(client, b"DICM one", note="first")
+        second = _radiology(client, b"DICM two", b"DICM one")
+        _report(client)
+
+        archive = _zip(client.get("/api/export/records", params={"record_type": "radiology"}))
+        folders = {name.split("/")[0] for name in archive.namelist() if "/" in name}
+        assert folders == {f"radiology-{first['id']}", f"radiology-{second['id']}"}
+        assert archive.read(f"radiology-{second['id']}/{second['files'][1]['id']}_scan1.dcm") == b"DICM one"
+
+        archive = _zip(client.get("/api/export/records", params={"ids": str(second["id"])}))
+        assert len([n for n in archive.namelist() if n != "manifest.json"]) == 2
+
+    def test_errors(self, client, blob_dir):
+        """Test unknown records, empty filters, bad options and oversized exports are rejected."""
+        _radiology(client, b"DICM a")
+        _radiology(client, b"DICM b")
+        assert client.get("/api/export/records/999").status_code == 404
+        assert client.get("/api/export/records", params={"record_type": "report"}).status_code == 404
+        assert client.get("/api/export/records", params={"format": "rar"}).status_code == 400
+        assert client.get("/api/export/records", params={"ids": "1,x"}).status_code == 400
+        with patch("app.routers.export.settings.EXPORT_MAX_RECORDS", 1):
+            assert client.get("/api/export/records").status_code == 400
+
+    def test_missing_file_is_listed_not_fatal(self, client, blob_dir):
+        """Test a file missing from storage is noted in the manifest and the rest is exported."""
+        data = _radiology(client, b"DICM kept", b"DICM lost")
+        os.remove(storage.backend().path(blobs.key_for(data["files"][1]["sha256"])))
+
+        archive = _zip(client.get(f"/api/export/records/{data['id']}"))
+        files = json.loads(archive.read("manifest.json"))["records"][0]["files"]
+        assert [f.get("missing", False) for f in files] == [False, True]
+        assert len(archive.namelist()) == 2
+
+    def test_streams_in_chunks(self, client, blob_dir):
+        """Test a large file is emitted a chunk at a time rather than buffered whole."""
+        content = os.urandom(300_000)
+        data = _radiology(client, content)
+
+        with patch.object(storage, "CHUNK_SIZE", 64 * 1024):
+            pieces = list(export.archive(TestingSessionLocal, [data["id"]]))
+        assert len(pieces) > 4
+        assert max(len(p) for p in pieces) < 80 * 1024
+        archive = zipfile.ZipFile(io.BytesIO(b"".join(pieces)))
+        assert archive.read(f"radiology-{data['id']}/{data['files'][0]['id']}_scan0.dcm") == content
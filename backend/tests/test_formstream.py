@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+from starlette.datastructures import Headers
+from starlette.formparsers import MultiPartException
+
+from app.services import formstream
+
+
+def _body(boundary: bytes) -> bytes:
+    return (
+        b"--" + boundary + b"\r\n"
+        b'Content-Disposition: form-data; name="patient_note"\r\n\r\n'
+        b"Ahmet Y\xc4\xb1lmaz\r\n"
+        b"--" + boundary + b"\r\n"
+        b'Content-Disposition: form-data; name="files"; filename="lab.png"\r\n'
+        b"Content-Type: image/png\r\n\r\n"
+        b"\x89PNG lab\r\n"
+        b"--" + boundary + b"--\r\n"
+    )
+
+
+def _collect(body: bytes, content_type: str, chunk: int = 7) -> list:
+    async def stream():
+        for i in range(0, len(body), chunk):
+            yield body[i:i + chunk]
+
+    async def run():
+        out = []
+        async for name, value, last in formstream._parse(Headers({"content-type": content_type}), stream()):
+            out.append((name, value if isinstance(value, str) else (value.filename, value.headers["content-type"],
+                                                                   await value.read()), last))
+        return out
+
+    return asyncio.run(run())
+
+
+class TestFormStream:
+    def test_parts_arrive_in_order_with_the_last_flagged(self):
+        """Test fields and files split across small chunks come out whole, the last one marked."""
+        parts = _collect(_body(b"xyz"), "multipart/form-data; boundary=xyz")
+        assert parts == [
+            ("patient_note", "Ahmet Yılmaz", False),
+            ("files", ("lab.png", "image/png", b"\x89PNG lab"), True),
+        ]
+
+    def test_missing_boundary_is_rejected(self):
+        """Test a body without a boundary raises the same error as Starlette's parser."""
+        with pytest.raises(MultiPartException):
+            _collect(_body(b"xyz"), "multipart/form-data")
@@ -0,0 +1,131 @@
+import asyncio
+import io
+import json
+import time
+import zipfile
+from unittest.mock import AsyncMock, patch
+
+import jwt
+import pytest
+
+from app.models import IngestItem, Record
+from app.services import blobs, ingest, uppermind
+from tests.conftest import TestingSessionLocal, override_get_current_user
+
+
+@pytest.fixture()
+def blob_dir(tmp_path):
+    with patch.object(blobs.settings, "UPLOAD_DIR", str(tmp_path / "store")), \
+            patch("app.routers.ingest.settings.INGEST_DIR", str(tmp_path / "ingest")):
+        yield tmp_path
+
+
+def _archive(files: dict) -> bytes:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        for name, data in files.items():
+            zf.writestr(name, data)
+    return buf.getvalue()
+
+
+MANIFEST = "path,record,type,note\n" \
+           "ahmet/lab1.png,ahmet,report,Ahmet Y.\n" \
+           "ahmet/lab2.pdf,ahmet,report,\n" \
+           "ahmet/ct.dcm,ahmet-ct,radiology,Ahmet Y.\n"
+
+
+class TestIngest:
+    def test_endpoint_imports_archive(self, client, db_session, blob_dir, mock_ocr, mock_pdf_extract,
+                                      mock_uppermind_translate):
+        """Test an uploaded archive becomes one record per manifest group, in the background."""
+        archive = _archive({"ahmet/lab1.png": b"\x89PNG 1", "ahmet/lab2.pdf": b"%PDF-1.4 2", "ahmet/ct.dcm": b"DICM"})
+        response = client.post("/api/ingest", files=[
+            ("archive", ("backlog.zip", io.BytesIO(archive), "application/zip")),
+            ("manifest", ("manifest.csv", io.BytesIO(MANIFEST.encode()), "text/csv")),
+        ])
+        assert response.status_code == 202
+        job_id = response.json()["id"]
+        assert response.json()["records"]["total"] == 2
+
+        deadline = time.monotonic() + 10
+        while (status := client.get(f"/api/ingest/{job_id}").json())["status"] != "complete":
+            assert time.monotonic() < deadline
+            time.sleep(0.05)
+        assert status["records"] == {"total": 2, "done": 2, "failed": 0, "pending": 0}
+        assert status["records_per_hour"] > 0
+
+        records = {r.record_type: r for r in db_session.query(Record).all()}
+        assert sorted(f.original_filename for f in records["report"].files) == ["lab1.png", "lab2.pdf"]
+        assert records["report"].patient_note == "Ahmet Y."
+        assert records["report"].status == "complete"
+        assert [f.status for f in records["report"].files] == ["translated", "translated"]
+        assert [f.original_filename for f in records["radiology"].files] == ["ct.dcm"]
+        assert not list((blob_dir / "ingest").iterdir())  # the archive is dropped once imported
+
+    def test_manifest_problems_are_rejected(self, client, blob_dir):
+        """Test files missing from the archive or of the wrong type fail the request up front."""
+        manifest = json.dumps([
+            {"path": "a.png"},
+            {"path": "missing.png"},
+            {"path": "scan.dcm", "type": "report"},
+        ])
+        response = client.post("/api/ingest", files=[
+            ("archive", ("a.zip", io.BytesIO(_archive({"a.png": b"x", "scan.dcm": b"y"})), "application/zip")),
+            ("manifest", ("m.json", io.BytesIO(manifest.encode()), "application/json")),
+        ])
+        assert response.status_code == 400
+        assert "missing.png: not in the source" in response.json()["detail"]
+        assert "a report cannot be a .dcm file" in response.json()["detail"]
+        assert client.get("/api/ingest/1").status_code == 404
+
+    def test_resume_skips_done_and_redoes_partial(self, db_session, blob_dir, tmp_path, mock_ocr,
+                                                 mock_uppermind_translate):
+        """Test a resumed job keeps finished records and replaces the one cut off part-way."""
+        source = tmp_path / "backlog"
+        (source / "p1").mkdir(parents=True)
+        (source / "p1" / "report.png").write_bytes(b"\x89PNG report")
+        (source / "p1" / "scan.bmp").write_bytes(b"BM scan")
+        rows = ingest.parse_manifest(
+            b"path,record,type\np1/scan.bmp,scan,radiology\np1/report.png,report,report\n", "m.csv"
+        )
+        job = ingest.create_job(db_session, str(source), rows, "testuser")
+        user = override_get_current_user()
+
+        with patch("app.routers.reports.langid.plan", side_effect=RuntimeError("killed")):
+            asyncio.run(ingest.run_job(job.id, user, TestingSessionLocal))
+        failed = db_session.query(IngestItem).filter_by(key="report").one()
+        assert failed.status == "failed" and "killed" in failed.error
+        assert db_session.get(Record, failed.record_id).status == "failed"
+
+        asyncio.run(ingest.run_job(job.id, user, TestingSessionLocal))
+        db_session.expire_all()
+        assert ingest.progress(db_session, job.id)["records"] == {"total": 2, "done": 2, "failed": 0, "pending": 0}
+        # The partial record was deleted (SQLite may hand its id to the new one)
+        assert db_session.query(Record).count() == 2
+        assert db_session.query(Record).filter_by(record_type="radiology").count() == 1
+        report = db_session.query(Record).filter_by(record_type="report").one()
+        assert report.status == "complete"
+        assert db_session.query(IngestItem).filter_by(key="report").one().record_id == report.id
+
+    def test_command_line_login_is_renewed_before_the_token_expires(self, db_session, blob_dir, tmp_path, mock_ocr,
+                                                                     mock_uppermind_translate):
+        """Test a job run with a login logs in again once its token is about to expire."""
+        (tmp_path / "backlog").mkdir()
+        (tmp_path / "backlog" / "a.png").write_bytes(b"\x89PNG a")
+        (tmp_path / "backlog" / "b.png").write_bytes(b"\x89PNG b")
+        rows = ingest.parse_manifest(b"path\na.png\nb.png\n", "m.csv")
+        job = ingest.create_job(db_session, str(tmp_path / "backlog"), rows, "testuser")
+
+        def user(expires_in):
+            token = jwt.encode({"sub": "testuser", "exp": int(time.time()) + expires_in}, "k" * 32, algorithm="HS256")
+            return {**override_get_current_user(), "token": token}
+
+        expiring, fresh = user(60), user(3600)
+        with patch("app.services.uppermind.login", new_callable=AsyncMock, side_effect=[expiring, fresh]) as login:
+            credentials = uppermind.Login("testuser", "secret")
+            first = asyncio.run(credentials.user())
+            asyncio.run(ingest.run_job(job.id, first, TestingSessionLocal, concurrency=1, login=credentials))
+
+        assert login.await_count == 2
+        assert ingest.progress(db_session, job.id)["records"]["done"] == 2
+        assert {c.args[1] for c in mock_uppermind_translate.call_args_list} == {fresh["token"]}
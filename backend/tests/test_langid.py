@@ -0,0 +1,79 @@
+import json
+from unittest.mock import AsyncMock, patch
+
+from app.services import langid
+
+TURKISH = "Sol böbrek üst polde 12 mm basit kist izlendi, klinik takip önerilir."
+ENGLISH = "A simple cyst measuring 12 mm is seen in the upper pole of the left kidney."
+
+
+class TestDetect:
+    def test_common_languages(self):
+        """Test short report sentences are attributed to the right language."""
+        assert langid.detect(TURKISH) == "tr"
+        assert langid.detect("Sag bobrek ust polde basit kist izlendi, takip onerilir.") == "tr"
+        assert langid.detect(ENGLISH) == "en"
+        assert langid.detect("Kleine Zyste am oberen Nierenpol rechts, Verlaufskontrolle empfohlen.") == "de"
+        assert langid.detect("Острых изменений головного мозга не выявлено.") == "other"
+
+    def test_azerbaijani_is_not_turkish(self):
+        """Test Azerbaijani, which shares most of its vocabulary with Turkish, is still translated."""
+        assert langid.detect("Beyin maqnit rezonans müayinəsində kəskin infarkt əlamətləri aşkar edilməmişdir.") == "az"
+
+    def test_short_segments_are_undecided(self):
+        """Test dates, numbers and names are not classified."""
+        assert langid.detect("12.03.2024  L4-L5  5 mm") is None
+        assert langid.detect("Dr. Ayşe Kaya") is None
+
+
+class TestPlan:
+    def test_turkish_text_passes_through(self):
+        """Test an all-Turkish text needs no translation."""
+        assert langid.plan(TURKISH) == [(TURKISH, False)]
+
+    def test_undecidable_text_is_translated(self):
+        """Test text too short to classify is sent to the translator as before."""
+        assert langid.plan("Extracted text") == [("Extracted text", True)]
+
+    def test_mixed_text_splits_on_paragraphs(self):
+        """Test only the foreign paragraphs are flagged and the pieces rebuild the text."""
+        text = f"HASTANE RAPORU\n\n{TURKISH}\n\n{ENGLISH}\n\n12.03.2024\n\n{ENGLISH}"
+        pieces = langid.plan(text)
+
+        assert "".join(piece for piece, _ in pieces) == text
+        assert pieces == [
+            (f"HASTANE RAPORU\n\n{TURKISH}\n\n", False),
+            (f"{ENGLISH}\n\n12.03.2024\n\n{ENGLISH}", True),
+        ]
+
+
+class TestUploadSkipsTurkish:
+    def test_turkish_report_is_not_translated(self, client, mock_uppermind_translate):
+        """Test a report already in Turkish is stored as-is without a translator call."""
+        with patch("app.routers.reports.extract_text_from_image", new_callable=AsyncMock) as mock_ocr:
+            mock_ocr.return_value = TURKISH
+            response = client.post("/api/reports/upload", files=[("files", ("tr.png", b"img", "image/png"))])
+
+        assert response.status_code == 200
+        mock_uppermind_translate.assert_not_called()
+        complete = json.loads([line for line in response.text.splitlines() if '"complete"' in line][0][6:])
+        assert complete["result"]["files"][0]["status"] == "translated"
+
+        detail = client.get(f"/api/reports/records/{complete['result']['id']}").json()
+        translation = detail["files"][0]["translations"][0]
+        assert translation["translated_text"] == TURKISH
+        assert translation["translation_calls_skipped"] == 1
+
+    def test_only_foreign_segments_are_translated(self, client, mock_uppermind_translate):
+        """Test a mixed report keeps its Turkish paragraph and translates the rest."""
+        with patch("app.routers.reports.extract_text_from_image", new_callable=AsyncMock) as mock_ocr:
+            mock_ocr.return_value = f"{TURKISH}\n\n{ENGLISH}"
+            response = client.post("/api/reports/upload", files=[("files", ("mixed.png", b"img", "image/png"))])
+
+        mock_uppermind_translate.assert_called_once()
+        assert mock_uppermind_translate.call_args.args[0] == ENGLISH
+        complete = json.loads([line for line in response.text.splitlines() if '"complete"' in line][0][6:])
+        detail = client.get(f"/api/reports/records/{complete['result']['id']}").json()
+        translation = detail["files"][0]["translations"][0]
+        assert translation["translated_text"] == f"{TURKISH}\n\nTranslated text content"
+        assert translation["translation_calls_skipped"] == 1
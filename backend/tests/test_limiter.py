@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+from app.services.limiter import AdaptiveLimiter
+
+
+class TestAdaptiveLimiter:
+    @pytest.mark.asyncio
+    async def test_respects_limit(self):
+        """Test no more than `limit` calls run at once and the rest queue."""
+        limiter = AdaptiveLimiter("test-respect", initial=2, min_limit=2, max_limit=2)
+        running = 0
+        peak = 0
+        depths = []
+
+        async def call():
+            nonlocal running, peak
+            async with limiter.slot():
+                running += 1
+                peak = max(peak, running)
+                depths.append(limiter.queue_depth)
+                await asyncio.sleep(0.01)
+                running -= 1
+
+        await asyncio.gather(*[call() for _ in range(6)])
+
+        assert peak == 2
+        assert max(depths) > 0
+        assert limiter.in_flight == 0
+        assert limiter.queue_depth == 0
+
+    @pytest.mark.asyncio
+    async def test_grows_when_saturated_and_healthy(self):
+        """Test the limit increases while calls are fast and the limit is in use."""
+        limiter = AdaptiveLimiter("test-grow", initial=2, min_limit=1, max_limit=10)
+
+        async def call():
+            async with limiter.slot():
+                await asyncio.sleep(0.001)
+
+        for _ in range(3):
+            await asyncio.gather(*[call() for _ in range(int(limiter.limit))])
+
+        assert limiter.limit > 2
+
+    @pytest.mark.asyncio
+    async def test_shrinks_on_errors_once_per_window(self):
+        """Test errors cut the limit, but concurrent failures only cut it once."""
+        limiter = AdaptiveLimiter("test-shrink", initial=10, min_limit=1, max_limit=10, backoff=0.5)
+
+        async def failing():
+            async with limiter.slot():
+                await asyncio.sleep(0.001)
+                raise RuntimeError("HTTP 503")
+
+        results = await asyncio.gather(*[failing() for _ in range(5)], return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert limiter.limit == 5
+
+        with pytest.raises(RuntimeError):
+            await failing()
+        assert limiter.limit == 2.5
+
+    def test_shrinks_on_latency_spike(self):
+        """Test latency well above the long-term average cuts the limit."""
+        limiter = AdaptiveLimiter("test-latency", initial=8, min_limit=1, max_limit=8, tolerance=2.0)
+        for _ in range(20):
+            limiter.in_flight += 1
+            limiter.release(0.1, ok=True, in_flight_at_start=1)
+        assert limiter.limit == 8
+
+        for _ in range(5):
+            limiter.in_flight += 1
+            limiter.release(2.0, ok=True, in_flight_at_start=1)
+        assert limiter.limit < 8
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_does_not_leak_slot(self):
+        """Test cancelling a queued caller leaves the limiter consistent."""
+        limiter = AdaptiveLimiter("test-cancel", initial=1, min_limit=1, max_limit=1)
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        limiter.release(0.01, ok=True)
+
+        assert limiter.in_flight == 0
+        assert limiter.queue_depth == 0
+
+
+class TestMetricsEndpoint:
+    def test_translation_limiter_gauges(self, client):
+        """Test the shared translation limiter is exposed as metrics."""
+        response = client.get("/api/metrics")
+
+        assert response.status_code == 200
+        gauges = response.json()["gauges"]
+        assert 'limiter_limit{limiter="translation"}' in gauges
+        assert 'limiter_queue_depth{limiter="translation"}' in gauges
@@ -0,0 +1,154 @@
+import io
+import json
+from unittest.mock import AsyncMock, patch
+
+import fitz
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from app import metrics
+from app.services import prefilter
+
+
+def _page(lines, size=(850, 1100), noise=0, seed=0):
+    """Render a report-like page (header box + text lines) as PNG bytes."""
+    img = Image.new("L", size, 250)
+    draw = ImageDraw.Draw(img)
+    draw.rectangle([60, 60, size[0] - 60, 160], outline=0, width=3)
+    for n, line in enumerate(lines):
+        draw.text((80, 220 + n * 40), line, fill=0)
+    if noise:
+        arr = np.asarray(img, dtype=np.int16)
+        arr = arr + np.random.default_rng(seed).integers(-noise, noise + 1, arr.shape)
+        img = Image.fromarray(np.clip(arr, 0, 255).astype(np.uint8))
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+REPORT = [f"Line {n}: mild degenerative changes at level L{n}, no stenosis." for n in range(12)]
+OTHER = [f"Row {n}: kidneys normal size, no hydronephrosis seen {n * 7}." for n in range(12)]
+
+
+class TestAnalyze:
+    def test_blank_page_detected(self):
+        """Test an empty (slightly noisy) scan is flagged as blank."""
+        empty = np.clip(np.random.default_rng(0).normal(245, 3, (1100, 850)), 0, 255).astype(np.uint8)
+        buf = io.BytesIO()
+        Image.fromarray(empty).save(buf, format="PNG")
+        thumbs = [prefilter.thumbnail_from_image(_page([])), prefilter.thumbnail_from_image(buf.getvalue())]
+
+        blank, duplicate_of = prefilter.analyze(thumbs)
+
+        assert blank == [False, True]
+        assert duplicate_of == [-1, -1]
+
+    def test_single_short_line_is_not_blank(self):
+        """Test a page with one short sentence still goes to OCR."""
+        img = Image.new("L", (850, 1100), 250)
+        ImageDraw.Draw(img).text((80, 500), "No findings.", fill=0)
+        buf = io.BytesIO()
+        img.save(buf, format="PNG")
+
+        blank, _ = prefilter.analyze([prefilter.thumbnail_from_image(buf.getvalue())])
+
+        assert blank == [False]
+
+    def test_rescan_is_duplicate(self):
+        """Test a noisy re-scan of a page points back at the first scan."""
+        thumbs = [
+            prefilter.thumbnail_from_image(_page(REPORT)),
+            prefilter.thumbnail_from_image(_page(OTHER)),
+            prefilter.thumbnail_from_image(_page(REPORT, noise=8, seed=1)),
+        ]
+
+        blank, duplicate_of = prefilter.analyze(thumbs)
+
+        assert blank == [False, False, False]
+        assert duplicate_of == [-1, -1, 0]
+
+    def test_same_template_different_text_not_duplicate(self):
+        """Test pages sharing a layout but not their text are both OCR'd."""
+        thumbs = [
+            prefilter.thumbnail_from_image(_page(OTHER)),
+            prefilter.thumbnail_from_image(_page(REPORT, noise=8, seed=1)),
+        ]
+
+        _, duplicate_of = prefilter.analyze(thumbs)
+
+        assert duplicate_of == [-1, -1]
+
+    def test_undecodable_images_are_never_skipped(self):
+        """Test images Pillow cannot decode fall through to normal OCR."""
+        thumbs = [prefilter.thumbnail_from_image(b"fake-image"), prefilter.thumbnail_from_image(b"fake-image")]
+
+        assert thumbs == [None, None]
+        assert prefilter.analyze(thumbs) == ([False, False], [-1, -1])
+
+    def test_compare_last_matches_analyze(self):
+        """Test classifying photos one at a time gives what analyzing them all together gives for each."""
+        empty = Image.new("L", (850, 1100), 250)
+        buf = io.BytesIO()
+        empty.save(buf, format="PNG")
+        thumbs = [
+            prefilter.thumbnail_from_image(_page(REPORT)),
+            None,
+            prefilter.thumbnail_from_image(buf.getvalue()),
+            prefilter.thumbnail_from_image(_page(OTHER)),
+            prefilter.thumbnail_from_image(_page(REPORT, noise=8, seed=1)),
+            prefilter.thumbnail_from_image(_page(REPORT, noise=8, seed=2)),
+        ]
+
+        seen = prefilter.Seen()
+        incremental = [prefilter.compare_last(seen, t) for t in thumbs]
+
+        blank, duplicate_of = prefilter.analyze(thumbs)
+        assert incremental == list(zip(blank, duplicate_of))
+        assert duplicate_of == [-1, -1, -1, -1, 0, 0]
+        assert seen.index == [0, 3]  # only pages that can be duplicated are kept
+
+
+class TestPrefilteredOCR:
+    @pytest.mark.asyncio
+    async def test_pdf_skips_blank_and_duplicate_pages(self):
+        """Test a scanned PDF only OCRs its distinct, non-blank pages."""
+        metrics.reset()
+        doc = fitz.open()
+        for png in (_page(REPORT), None, _page(REPORT), _page(OTHER)):
+            page = doc.new_page(width=612, height=792)
+            if png is not None:
+                page.insert_image(page.rect, stream=png)
+        pdf_bytes = doc.tobytes()
+        doc.close()
+
+        with patch("app.services.pdf.extract_text_from_image", new_callable=AsyncMock) as mock_ocr:
+            mock_ocr.side_effect = ["first report", "second report"]
+
+            from app.services.pdf import extract_from_pdf
+            result = await extract_from_pdf(pdf_bytes)
+
+        assert mock_ocr.call_count == 2
+        assert result == "first report\n\nfirst report\n\nsecond report"
+        counters = metrics.snapshot()["counters"]
+        assert counters['ocr_calls_avoided{reason="blank"}'] == 1
+        assert counters['ocr_calls_avoided{reason="duplicate"}'] == 1
+
+    def test_upload_reuses_text_for_repeated_photo(self, client, mock_uppermind_translate):
+        """Test a repeated photo in one upload is OCR'd once and gets the same text."""
+        with patch("app.routers.reports.extract_text_from_image", new_callable=AsyncMock) as mock_ocr:
+            mock_ocr.return_value = "Rapor metni"
+            photo = _page(REPORT)
+            response = client.post(
+                "/api/reports/upload",
+                files=[
+                    ("files", ("a.png", photo, "image/png")),
+                    ("files", ("b.png", _page(REPORT, noise=6), "image/png")),
+                ],
+            )
+
+        assert response.status_code == 200
+        assert mock_ocr.call_count == 1
+        complete = json.loads([line for line in response.text.splitlines() if '"complete"' in line][0][6:])
+        detail = client.get(f"/api/reports/records/{complete['result']['id']}").json()
+        assert [f["translations"][0]["original_text"] for f in detail["files"]] == ["Rapor metni", "Rapor metni"]
@@ -23,6 +23,14 @@ def get_sse_result(text: str) -> dict:
     raise ValueError("No complete event in SSE stream")
 
 
+def get_stored_result(client, text: str) -> dict:
+    """Fetch the record named by the 'complete' event, with each file's first translation as "translation"."""
+    record = client.get(f"/api/reports/records/{get_sse_result(text)['id']}").json()
+    for f in record["files"]:
+        f["translation"] = f["translations"][0]
+    return record
+
+
 class TestReportUpload:
     def test_upload_image_with_ocr_and_translation(self, client, mock_ocr, mock_uppermind_translate):
         """Test uploading an image triggers OCR and translation."""
@@ -35,7 +43,7 @@ class TestReportUpload:
         )
 
         assert response.status_code == 200
-        data = get_sse_result(response.text)
+        data = get_stored_result(client, response.text)
         assert data["record_type"] == "report"
         assert data["patient_note"] == "Blood test results"
         assert len(data["files"]) == 1
@@ -61,7 +69,7 @@ class TestReportUpload:
         )
 
         assert response.status_code == 200
-        data = get_sse_result(response.text)
+        data = get_stored_result(client, response.text)
         assert len(data["files"]) == 1
         file_data = data["files"][0]
         assert file_data["file_type"] == "pdf"
@@ -252,7 +260,7 @@ class TestSSEEvents:
             response = client.post("/api/reports/upload", files=files)
 
         assert response.status_code == 200
-        data = get_sse_result(response.text)
+        data = get_stored_result(client, response.text)
         assert len(data["files"]) == 3
 
         # One file should have OCR error
@@ -268,6 +276,33 @@ class TestSSEEvents:
         # OCR error file should have no translation
         assert ocr_errors[0]["translation"]["translated_text"] == ""
 
+    def test_consecutive_photos_batched_when_model_supports_it(self, client, mock_uppermind_translate):
+        """Test photos share vision requests in batches while PDFs and progress stay per file."""
+        from unittest.mock import AsyncMock, patch
+
+        with patch("app.routers.reports.ocr_batch_size", return_value=2), \
+             patch("app.routers.reports.extract_text_from_images", new_callable=AsyncMock) as mock_batch, \
+             patch("app.routers.reports.extract_text_from_image", new_callable=AsyncMock) as mock_single, \
+             patch("app.routers.reports.extract_from_pdf", new_callable=AsyncMock) as mock_pdf:
+            mock_batch.return_value = ["page a", "page b"]
+            mock_single.return_value = "page d"
+            mock_pdf.return_value = "pdf text"
+            files = [
+                ("files", ("a.png", io.BytesIO(b"\x89PNG-a"), "image/png")),
+                ("files", ("b.png", io.BytesIO(b"\x89PNG-b"), "image/png")),
+                ("files", ("c.pdf", io.BytesIO(b"%PDF-1.4 fake"), "application/pdf")),
+                ("files", ("d.png", io.BytesIO(b"\x89PNG-d"), "image/png")),
+            ]
+            response = client.post("/api/reports/upload", files=files)
+
+        assert response.status_code == 200
+        mock_batch.assert_called_once_with([b"\x89PNG-a", b"\x89PNG-b"])
+        mock_single.assert_called_once_with(b"\x89PNG-d")
+        events = parse_sse_events(response.text)
+        assert [e["done"] for e in events if e["phase"] == "ocr"] == [1, 2, 3, 4]
+        data = get_stored_result(client, response.text)
+        assert [f["translation"]["original_text"] for f in data["files"]] == ["page a", "page b", "pdf text", "page d"]
+
     def test_translation_error_isolation(self, client, mock_ocr):
         """Test that translation error in one file doesn't block others."""
         from unittest.mock import AsyncMock, patch
@@ -289,7 +324,7 @@ class TestSSEEvents:
             response = client.post("/api/reports/upload", files=files)
 
         assert response.status_code == 200
-        data = get_sse_result(response.text)
+        data = get_stored_result(client, response.text)
 
         translation_errors = [
             f for f in data["files"]
@@ -325,5 +360,243 @@ class TestSSEEvents:
 
         mock_uppermind_translate.assert_not_called()
 
-        data = get_sse_result(response.text)
+        data = get_stored_result(client, response.text)
         assert data["files"][0]["translation"]["translated_text"] == ""
+
+
+class TestClientDisconnect:
+    @pytest.mark.asyncio
+    async def test_disconnect_cancels_translations_and_keeps_partial_results(self, client, db_session, mock_ocr):
+        """Test closing the SSE stream cancels running translations and marks the record aborted."""
+        import httpx
+        from unittest.mock import patch
+
+        from app.main import app
+        from app.models import Record, Translation
+
+        translation_started = asyncio.Event()
+        cancelled = []
+
+        async def stuck_translate(text, token):
+            translation_started.set()
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                cancelled.append(text)
+                raise
+
+        request = httpx.Request(
+            "POST",
+            "http://test/api/reports/upload",
+            files=[
+                ("files", ("report1.png", b"\x89PNG" + b"\x00" * 50, "image/png")),
+                ("files", ("report2.png", b"\x89PNG" + b"\x00" * 50, "image/png")),
+            ],
+        )
+        body = request.read()
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "POST",
+            "scheme": "http",
+            "path": "/api/reports/upload",
+            "raw_path": b"/api/reports/upload",
+            "query_string": b"",
+            "root_path": "",
+            "headers": [(k.lower().encode(), v.encode()) for k, v in request.headers.items()],
+            "client": ("test", 1),
+            "server": ("test", 80),
+        }
+        body_sent = False
+
+        async def receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await translation_started.wait()
+            await asyncio.sleep(0.01)
+            return {"type": "http.disconnect"}
+
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        with patch("app.routers.reports.translate", side_effect=stuck_translate):
+            await asyncio.wait_for(app(scope, receive, send), timeout=5)
+            await asyncio.sleep(0.01)
+
+        assert len(cancelled) == 2
+        chunks = b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body")
+        assert b'"phase":"complete"' not in chunks
+
+        record = db_session.query(Record).one()
+        assert record.status == "aborted"
+        translations = db_session.query(Translation).all()
+        assert len(translations) == 2
+        assert all(t.original_text == "Extracted text from image" for t in translations)
+        assert all(t.translated_text == "" for t in translations)
+        assert [f.status for f in record.files] == ["ocr", "ocr"]
+
+
+class TestIncrementalPersistence:
+    def test_complete_event_carries_only_ids_and_statuses(self, client, mock_ocr, mock_uppermind_translate):
+        """Test the final event names the stored rows instead of repeating their text."""
+        mock_uppermind_translate.side_effect = [RuntimeError("down"), "Translated text content"]
+        files = [("files", (f"r{i}.png", io.BytesIO(b"\x89PNG" + bytes([i]) * 50), "image/png")) for i in range(2)]
+        response = client.post("/api/reports/upload", files=files)
+
+        result = get_sse_result(response.text)
+        assert set(result) == {"id", "status", "files"}
+        assert result["status"] == "complete"
+        assert sorted(f["status"] for f in result["files"]) == ["failed", "translated"]
+        assert all(set(f) == {"id", "status", "translation_id"} for f in result["files"])
+        assert "Extracted text" not in response.text
+
+        detail = get_stored_result(client, response.text)
+        assert {f["id"]: f["status"] for f in detail["files"]} == {f["id"]: f["status"] for f in result["files"]}
+        assert {f["translation"]["id"] for f in detail["files"]} == {f["translation_id"] for f in result["files"]}
+
+    def test_ocr_results_survive_a_late_failure(self, client, db_session, mock_ocr, mock_uppermind_translate):
+        """Test text extracted before an unexpected error is already stored."""
+        from unittest.mock import patch
+
+        from app.models import Record, Translation
+
+        # The TestClient may re-raise it wrapped in an exception group
+        with patch("app.routers.reports.langid.plan", side_effect=RuntimeError("boom")), \
+                pytest.raises(Exception):
+            client.post(
+                "/api/reports/upload",
+                files=[("files", (f"r{i}.png", io.BytesIO(b"\x89PNG" + bytes([i]) * 50), "image/png")) for i in range(3)],
+            )
+
+        record = db_session.query(Record).one()
+        assert record.status == "failed"
+        assert [f.status for f in record.files] == ["ocr", "ocr", "ocr"]
+        assert [t.original_text for t in db_session.query(Translation).all()] == ["Extracted text from image"] * 3
+
+    def test_failed_write_marks_the_record_failed(self, client, db_session, mock_ocr, mock_uppermind_translate):
+        """Test an error while storing OCR results ends the record as "failed", not "processing"."""
+        from unittest.mock import patch
+
+        from app.models import Record
+
+        with patch("app.routers.reports.usage.rows", side_effect=RuntimeError("disk I/O error")), \
+                pytest.raises(Exception):
+            client.post("/api/reports/upload", files=[("files", ("r.png", io.BytesIO(b"\x89PNG"), "image/png"))])
+
+        assert db_session.query(Record).one().status == "failed"
+        mock_uppermind_translate.assert_not_called()
+
+    def test_no_connection_held_while_processing(self, client, mock_ocr, mock_uppermind_translate):
+        """Test the request's session is released before OCR and translation run."""
+        from tests.conftest import engine
+
+        checked_out = []
+
+        async def translate(text, token):
+            checked_out.append(engine.pool.checkedout())
+            return "Translated text content"
+
+        mock_ocr.side_effect = lambda content: checked_out.append(engine.pool.checkedout()) or "Extracted text from image"
+        mock_uppermind_translate.side_effect = translate
+        response = client.post("/api/reports/upload", files=[("files", ("r.png", io.BytesIO(b"\x89PNG"), "image/png"))])
+
+        assert get_sse_result(response.text)["status"] == "complete"
+        assert checked_out == [0, 0]
+
+
+class TestSpeculativeOCR:
+    @pytest.mark.asyncio
+    async def test_ocr_starts_before_the_body_is_complete(self, client, db_session, mock_ocr,
+                                                          mock_uppermind_translate):
+        """Test the first file is OCR'd while the second is still being uploaded."""
+        import httpx
+
+        from app.main import app
+        from app.models import Record
+
+        request = httpx.Request(
+            "POST",
+            "http://test/api/reports/upload",
+            files=[
+                ("files", ("a.png", b"\x89PNG" + b"\x01" * 50, "image/png")),
+                ("files", ("b.png", b"\x89PNG" + b"\x02" * 50, "image/png")),
+            ],
+        )
+        body = request.read()
+        split = body.index(b'filename="b.png"')  # past the boundary that ends a.png
+        chunks = [body[:split], body[split:]]
+        ocr_started = asyncio.Event()
+        ocr_before_rest = []
+        mock_ocr.side_effect = lambda content: ocr_started.set() or "Extracted text from image"
+
+        async def receive():
+            if len(chunks) == 2:
+                return {"type": "http.request", "body": chunks.pop(0), "more_body": True}
+            if chunks:
+                await asyncio.wait_for(ocr_started.wait(), timeout=2)
+                ocr_before_rest.extend(call.args[0] for call in mock_ocr.call_args_list)
+                return {"type": "http.request", "body": chunks.pop(0), "more_body": False}
+            await asyncio.Event().wait()  # the client stays connected
+
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "POST",
+            "scheme": "http",
+            "path": "/api/reports/upload",
+            "raw_path": b"/api/reports/upload",
+            "query_string": b"",
+            "root_path": "",
+            "headers": [(k.lower().encode(), v.encode()) for k, v in request.headers.items()],
+            "client": ("test", 1),
+            "server": ("test", 80),
+        }
+        await asyncio.wait_for(app(scope, receive, send), timeout=5)
+
+        assert ocr_before_rest == [b"\x89PNG" + b"\x01" * 50]
+        assert sent[0]["status"] == 200
+        stream = b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body")
+        assert get_sse_result(stream.decode())["status"] == "complete"
+        assert mock_ocr.call_count == 2
+        assert [f.status for f in db_session.query(Record).one().files] == ["translated", "translated"]
+
+    def test_note_sent_after_the_files_is_kept(self, client, mock_ocr, mock_uppermind_translate):
+        """Test a patient note that follows the files (as the web app sends it) lands on the record."""
+        response = client.post(
+            "/api/reports/upload",
+            files=[
+                ("files", ("a.png", io.BytesIO(b"\x89PNG" + b"\x00" * 50), "image/png")),
+                ("patient_note", (None, "Ahmet Y.")),
+            ],
+        )
+
+        assert get_stored_result(client, response.text)["patient_note"] == "Ahmet Y."
+
+    def test_invalid_file_after_valid_ones_leaves_nothing_behind(self, client, db_session, mock_ocr):
+        """Test a rejected part drops the record and files already stored for the upload."""
+        from app.models import Record, Translation, UploadedFile
+
+        response = client.post(
+            "/api/reports/upload",
+            files=[
+                ("files", ("a.png", io.BytesIO(b"\x89PNG" + b"\x00" * 50), "image/png")),
+                ("files", ("b.dcm", io.BytesIO(b"DICM"), "application/dicom")),
+            ],
+        )
+
+        assert response.status_code == 400
+        assert "Invalid file type: b.dcm" in response.json()["detail"]
+        assert db_session.query(Record).count() == 0
+        assert db_session.query(UploadedFile).count() == 0
+        assert db_session.query(Translation).count() == 0
@@ -0,0 +1,104 @@
+import asyncio
+import io
+import json
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.models import ReprocessItem, Translation, UploadedFile, UpstreamUsage
+from app.services import blobs, reprocess
+from tests.conftest import TestingSessionLocal, override_get_current_user
+
+
+@pytest.fixture()
+def blob_dir(tmp_path):
+    with patch.object(blobs.settings, "UPLOAD_DIR", str(tmp_path)):
+        yield tmp_path
+
+
+def _upload_report(client):
+    response = client.post("/api/reports/upload", files=[("files", ("lab.png", io.BytesIO(b"\x89PNG lab"), "image/png"))])
+    complete = [json.loads(line[6:]) for line in response.text.split("\n") if line.startswith("data: ")][-1]
+    return complete["result"]["id"], complete["result"]["files"][0]["id"]
+
+
+def _run(job_id):
+    asyncio.run(reprocess.run_job(job_id, override_get_current_user(), TestingSessionLocal))
+
+
+class TestReprocess:
+    def test_reocr_adds_a_version_for_stale_files(self, client, db_session, blob_dir, mock_ocr, mock_uppermind_translate):
+        """Test a model switch selects the file and stores a new version next to the old one."""
+        record_id, file_id = _upload_report(client)
+        first = db_session.query(Translation).one()
+        assert (first.version, first.ocr_model, first.translator_agent_id) == (1, "deepseek-ocr", 1)
+
+        with patch.object(reprocess.settings, "OLLAMA_MODEL", "glm-ocr"), \
+                patch("app.services.reprocess.extract_text_from_image", AsyncMock(return_value="Better OCR")), \
+                patch("app.services.reprocess.translate", AsyncMock(return_value="Daha iyi çeviri")):
+            assert reprocess.select_files(db_session, "ocr", stale=True) == [file_id]
+            job = reprocess.create_job(db_session, "ocr", "testuser", stale=True)
+            _run(job.id)
+            db_session.expire_all()
+            assert reprocess.select_files(db_session, "ocr", stale=True) == []
+
+        files = client.get(f"/api/reports/records/{record_id}").json()["files"]
+        versions = [(t["version"], t["ocr_model"], t["original_text"]) for t in files[0]["translations"]]
+        assert versions == [(2, "glm-ocr", "Better OCR"), (1, "deepseek-ocr", "Extracted text from image")]
+        item = db_session.query(ReprocessItem).one()
+        assert item.status == "done"
+        assert db_session.get(Translation, item.translation_id).translated_text == "Daha iyi çeviri"
+        progress = reprocess.progress(db_session, job.id)
+        assert progress["status"] == "complete"
+        assert progress["files"] == {"total": 1, "done": 1, "failed": 0, "pending": 0}
+
+    def test_retranslate_resumes_failed_files(self, client, db_session, blob_dir, mock_ocr, mock_uppermind_translate):
+        """Test a translate job keeps the OCR text, and a failed file is retried on resume."""
+        _, file_id = _upload_report(client)
+        job = reprocess.create_job(db_session, "translate", "testuser", agent_id=1)
+
+        with patch("app.services.reprocess.translate", AsyncMock(side_effect=RuntimeError("agent down"))):
+            _run(job.id)
+        db_session.expire_all()
+        assert db_session.query(ReprocessItem).one().status == "failed"
+        assert db_session.query(Translation).count() == 1
+
+        with patch("app.services.reprocess.translate", AsyncMock(return_value="Yeni çeviri")), \
+                patch("app.services.reprocess.extract_text_from_image") as ocr:
+            _run(job.id)
+        ocr.assert_not_called()
+        db_session.expire_all()
+        latest = db_session.get(UploadedFile, file_id).translations[0]
+        assert (latest.version, latest.original_text, latest.translated_text) == (2, "Extracted text from image", "Yeni çeviri")
+        assert db_session.query(ReprocessItem).one().status == "done"
+
+    def test_legacy_rows_match_by_recorded_usage(self, client, db_session, blob_dir, mock_ocr, mock_uppermind_translate):
+        """Test translations written before the model was recorded are selected by their OCR usage."""
+        _, file_id = _upload_report(client)
+        translation = db_session.query(Translation).one()
+        translation.ocr_model = None
+        db_session.add(UpstreamUsage(translation_id=translation.id, stage="ocr", model="deepseek-ocr"))
+        db_session.commit()
+
+        assert reprocess.select_files(db_session, "ocr", ocr_model="deepseek-ocr") == [file_id]
+        assert reprocess.select_files(db_session, "ocr", ocr_model="glm-ocr") == []
+
+    def test_failed_ocr_is_stale_and_ocrd_again(self, client, db_session, blob_dir, mock_ocr, mock_uppermind_translate):
+        """Test a file whose OCR failed is selected as stale and OCR'd again instead of translating the error."""
+        mock_ocr.side_effect = RuntimeError("ocr down")
+        _, file_id = _upload_report(client)
+        first = db_session.query(Translation).one()
+        assert first.ocr_model is None and "ocr down" in first.original_text
+
+        assert reprocess.select_files(db_session, "ocr", stale=True) == [file_id]
+        assert reprocess.select_files(db_session, "translate", stale=True) == [file_id]
+        job = reprocess.create_job(db_session, "translate", "testuser", stale=True)
+        with patch("app.services.reprocess.extract_text_from_image", AsyncMock(return_value="Lab text")), \
+                patch("app.services.reprocess.translate", AsyncMock(return_value="Tahlil metni")) as translate:
+            _run(job.id)
+        translate.assert_awaited_once()
+        assert translate.await_args.args[0] == "Lab text"
+        db_session.expire_all()
+        latest = db_session.get(UploadedFile, file_id).translations[0]
+        assert (latest.version, latest.ocr_model, latest.translated_text) == (2, "deepseek-ocr", "Tahlil metni")
+        assert reprocess.select_files(db_session, "translate", stale=True) == []
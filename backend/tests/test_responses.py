@@ -0,0 +1,77 @@
+import io
+from unittest.mock import patch
+
+import pytest
+
+from app.responses import _accepts_gzip, sse
+
+
+def _upload(client, text: str) -> int:
+    with patch("app.routers.reports.extract_text_from_image", return_value=text), \
+            patch("app.routers.reports.translate", return_value=text):
+        response = client.post(
+            "/api/reports/upload", files=[("files", ("r.png", io.BytesIO(b"\x89PNG" + b"\x00" * 50), "image/png"))]
+        )
+    return int(response.headers["x-record-id"])
+
+
+class TestCompressedJSON:
+    def test_large_responses_are_gzipped(self, client):
+        """Test a record detail above the threshold is gzipped for clients that accept it."""
+        record_id = _upload(client, "HEMOGRAM Hemoglobin 13.2 g/dL (12-16)\n" * 300)
+
+        response = client.get(f"/api/reports/records/{record_id}", headers={"Accept-Encoding": "gzip"})
+
+        assert response.headers["content-encoding"] == "gzip"
+        assert "Accept-Encoding" in response.headers["vary"]
+        assert int(response.headers["content-length"]) < len(response.content) / 5
+        assert response.json()["files"][0]["translations"][0]["original_text"].startswith("HEMOGRAM")
+
+    def test_identity_clients_get_plain_json(self, client):
+        """Test clients that do not accept gzip get the same document uncompressed."""
+        record_id = _upload(client, "HEMOGRAM Hemoglobin 13.2 g/dL (12-16)\n" * 300)
+
+        response = client.get(f"/api/reports/records/{record_id}", headers={"Accept-Encoding": "identity"})
+
+        assert "content-encoding" not in response.headers
+        assert "Accept-Encoding" in response.headers["vary"]
+        assert response.json()["id"] == record_id
+
+    def test_small_responses_are_not_compressed(self, client):
+        """Test bodies below the threshold are sent as they are."""
+        response = client.get("/api/reports/records", headers={"Accept-Encoding": "gzip"})
+
+        assert response.json() == []
+        assert "content-encoding" not in response.headers
+        assert "vary" not in response.headers
+
+    @pytest.mark.parametrize("header, accepted", [
+        (b"gzip, deflate, br", True),
+        (b"br;q=1.0, gzip;q=0.8", True),
+        (b"*", True),
+        (b"gzip;q=0", False),
+        (b"identity", False),
+        (None, False),
+    ])
+    def test_accept_encoding(self, header, accepted):
+        """Test gzip is only used when the client lists it with a non-zero weight."""
+        scope = {"headers": [(b"accept-encoding", header)] if header is not None else []}
+        assert _accepts_gzip(scope) is accepted
+
+    @pytest.mark.parametrize("headers, accepted", [
+        ([b"*;q=0, gzip"], True),
+        ([b"gzip;q=0, *"], False),
+        ([b"*;q=0"], False),
+        ([b"GZIP; Q=0.5"], True),
+        ([b"br", b"gzip"], True),
+        ([b"gzip", b"identity"], True),
+    ])
+    def test_explicit_gzip_and_repeated_headers(self, headers, accepted):
+        """Test an explicit gzip entry overrides ``*`` and every Accept-Encoding header counts."""
+        scope = {"headers": [(b"accept-encoding", h) for h in headers]}
+        assert _accepts_gzip(scope) is accepted
+
+
+def test_sse_event_is_compact_json():
+    """Test progress events are one compact JSON object per event."""
+    assert sse({"phase": "ocr", "done": 1, "total": 2}) == b'data: {"phase":"ocr","done":1,"total":2}\n\n'
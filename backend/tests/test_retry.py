@@ -0,0 +1,138 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+import pytest
+
+from app import metrics
+from app.config import settings
+from app.services import uppermind
+from app.services.retry import LatencyWindow, RetryBudget, backoff_delay
+
+
+class TestRetryPrimitives:
+    def test_budget_drains_and_refills(self):
+        """Test the budget allows a burst, then only a share of traffic plus a trickle."""
+        now = [0.0]
+        budget = RetryBudget("test", ratio=0.5, min_per_s=1.0, cap=2.0, clock=lambda: now[0])
+
+        assert budget.try_spend() and budget.try_spend()
+        assert not budget.try_spend()
+        budget.deposit()
+        budget.deposit()
+        assert budget.try_spend()
+        now[0] += 1.0
+        assert budget.try_spend()
+
+    def test_backoff_is_jittered_and_capped(self):
+        """Test delays stay under the exponential ceiling and honour Retry-After."""
+        delays = [backoff_delay(3, base=0.5, cap=2.0) for _ in range(200)]
+
+        assert all(0 <= d <= 2.0 for d in delays)
+        assert len(set(delays)) > 100
+        assert backoff_delay(0, base=0.5, cap=30.0, retry_after=5.0) >= 5.0
+
+    def test_latency_window_needs_samples(self):
+        """Test no quantile is reported until the window has enough samples."""
+        window = LatencyWindow(size=100, min_samples=10)
+        for n in range(9):
+            window.add(n)
+        assert window.quantile(0.95) is None
+        for n in range(9, 100):
+            window.add(n)
+        assert window.quantile(0.95) == 95
+
+
+def _client(*outcomes):
+    """Fake httpx.AsyncClient whose posts play ``outcomes`` in order.
+
+    An outcome is a translated string, an HTTP status code, an exception
+    instance, or a float meaning "hang this many seconds, then answer".
+    """
+    client = AsyncMock()
+    calls = []
+
+    async def post(url, json=None, headers=None):
+        outcome = outcomes[len(calls)]
+        calls.append(json["content"])
+        if isinstance(outcome, BaseException):
+            raise outcome
+        response = MagicMock()
+        response.headers = {}
+        if isinstance(outcome, float):
+            await asyncio.sleep(outcome)
+            outcome = "slow answer"
+        if isinstance(outcome, int):
+            response.status_code = outcome
+            response.text = "upstream error"
+        else:
+            response.status_code = 200
+            response.json.return_value = {"ai_message": outcome}
+        return response
+
+    client.post.side_effect = post
+    client.calls = calls
+    client.__aenter__ = AsyncMock(return_value=client)
+    client.__aexit__ = AsyncMock(return_value=False)
+    return client
+
+
+@pytest.fixture()
+def fresh_state():
+    metrics.reset()
+    uppermind.translation_latency.samples.clear()
+    uppermind.translation_retry_budget.tokens = uppermind.translation_retry_budget.cap
+    with patch.object(settings, "TRANSLATE_RETRY_BASE_S", 0.001), \
+            patch.object(uppermind.translation_batcher, "max_items", 1):
+        yield
+    uppermind.translation_latency.samples.clear()
+
+
+class TestResilientTranslate:
+    @pytest.mark.asyncio
+    async def test_transient_failures_are_retried(self, fresh_state):
+        """Test a 503 and a dropped connection are retried until the translator answers."""
+        client = _client(503, httpx.ConnectError("reset"), "Çeviri")
+        with patch("httpx.AsyncClient", return_value=client):
+            assert await uppermind.translate("text", "token") == "Çeviri"
+
+        assert len(client.calls) == 3
+        assert metrics.snapshot()["counters"]["translation_retries"] == 2
+
+    @pytest.mark.asyncio
+    async def test_client_errors_are_not_retried(self, fresh_state):
+        """Test a 400 fails straight away."""
+        client = _client(400, "never used")
+        with patch("httpx.AsyncClient", return_value=client):
+            with pytest.raises(uppermind.TranslationError, match="HTTP 400"):
+                await uppermind.translate("text", "token")
+
+        assert len(client.calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_empty_budget_stops_retries(self, fresh_state):
+        """Test retries stop once the shared budget is spent."""
+        uppermind.translation_retry_budget.tokens = 0.0
+        client = _client(503, "never used")
+        with patch("httpx.AsyncClient", return_value=client), \
+                patch.object(uppermind.translation_retry_budget, "min_per_s", 0.0):
+            with pytest.raises(uppermind.TranslationError):
+                await uppermind.translate("text", "token")
+
+        assert len(client.calls) == 1
+        assert metrics.snapshot()["counters"]['retry_budget_exhausted{budget="translation"}'] == 1
+
+    @pytest.mark.asyncio
+    async def test_slow_request_is_hedged(self, fresh_state):
+        """Test a request stuck past the p95 gets a duplicate whose answer is used."""
+        for _ in range(50):
+            uppermind.translation_latency.add(0.02)
+        client = _client(5.0, "fast answer")
+        with patch("httpx.AsyncClient", return_value=client):
+            result = await asyncio.wait_for(uppermind.translate("text", "token"), timeout=2)
+
+        assert result == "fast answer"
+        assert len(client.calls) == 2
+        counters = metrics.snapshot()["counters"]
+        assert counters["translation_hedges"] == 1
+        assert counters["translation_hedge_wins"] == 1
@@ -0,0 +1,124 @@
+import asyncio
+
+import pytest
+
+from app import metrics
+from app.services.scheduler import FairScheduler, JobContext, job_context, parse_weights
+
+
+async def _run_jobs(scheduler, jobs):
+    """Queue (ctx, cost) jobs while the only slot is busy; return dispatch order."""
+    order = []
+    gate = asyncio.Event()
+
+    async def blocker():
+        async with scheduler.slot():
+            await gate.wait()
+
+    async def job(i, ctx, cost):
+        with job_context(ctx):
+            async with scheduler.slot(cost=cost):
+                order.append(i)
+                await asyncio.sleep(0)
+
+    first = asyncio.create_task(blocker())
+    await asyncio.sleep(0)
+    tasks = []
+    for i, (ctx, cost) in enumerate(jobs):
+        tasks.append(asyncio.create_task(job(i, ctx, cost)))
+        await asyncio.sleep(0)  # enqueue in a deterministic order
+    gate.set()
+    await asyncio.gather(first, *tasks)
+    return order
+
+
+class TestFairScheduler:
+    @pytest.mark.asyncio
+    async def test_users_take_turns(self):
+        """Test a user with a big backlog does not starve a later user."""
+        scheduler = FairScheduler("test-turns", capacity=1)
+        batch = JobContext(user="batch", upload=1)
+        desk = JobContext(user="desk", upload=2)
+        jobs = [(batch, 1.0)] * 6 + [(desk, 1.0)] * 2
+
+        order = await _run_jobs(scheduler, jobs)
+
+        # desk's jobs (6, 7) are interleaved with batch's instead of waiting for all of them
+        assert order.index(6) <= 2
+        assert order.index(7) <= 4
+
+    @pytest.mark.asyncio
+    async def test_uploads_of_one_user_round_robin(self):
+        """Test a user's uploads alternate instead of running back to back."""
+        scheduler = FairScheduler("test-uploads", capacity=1)
+        a = JobContext(user="u", upload="a")
+        b = JobContext(user="u", upload="b")
+
+        order = await _run_jobs(scheduler, [(a, 1.0)] * 3 + [(b, 1.0)] * 3)
+
+        assert order[:4] == [0, 3, 1, 4]
+
+    @pytest.mark.asyncio
+    async def test_priority_lane_for_small_jobs(self):
+        """Test single-page jobs jump ahead of queued batch work."""
+        scheduler = FairScheduler("test-priority", capacity=1)
+        batch = JobContext(user="batch", upload=1)
+        small = JobContext(user="desk", upload=2, small=True)
+
+        order = await _run_jobs(scheduler, [(batch, 1.0)] * 4 + [(small, 1.0)])
+
+        assert order[0] == 4
+
+    @pytest.mark.asyncio
+    async def test_weights_and_costs(self):
+        """Test deficit accounting: heavier weight gets proportionally more turns."""
+        scheduler = FairScheduler("test-weights", capacity=1, weights={"heavy": 3.0})
+        heavy = JobContext(user="heavy", upload=1)
+        light = JobContext(user="light", upload=2)
+
+        order = await _run_jobs(scheduler, [(heavy, 1.0)] * 6 + [(light, 1.0)] * 6)
+
+        first_eight = order[:8]
+        assert sum(1 for i in first_eight if i < 6) == 6
+
+    @pytest.mark.asyncio
+    async def test_cancelled_job_is_skipped(self):
+        """Test cancelling a queued job frees its place without leaking a slot."""
+        scheduler = FairScheduler("test-cancel", capacity=1)
+        gate = asyncio.Event()
+
+        async def blocker():
+            async with scheduler.slot():
+                await gate.wait()
+
+        async def waiting():
+            async with scheduler.slot():
+                pass
+
+        first = asyncio.create_task(blocker())
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(waiting())
+        await asyncio.sleep(0)
+        assert scheduler.queued == 1
+
+        queued.cancel()
+        gate.set()
+        await first
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+
+        assert scheduler.in_flight == 0
+        assert scheduler.queued == 0
+
+    @pytest.mark.asyncio
+    async def test_reports_queue_wait_per_user(self):
+        """Test queue wait is recorded per user."""
+        scheduler = FairScheduler("test-wait", capacity=1)
+        await _run_jobs(scheduler, [(JobContext(user="alice"), 1.0)])
+
+        summaries = metrics.snapshot()["summaries"]
+        assert summaries['scheduler_queue_wait_s{scheduler="test-wait",user="alice"}']["count"] == 1
+
+    def test_parse_weights(self):
+        assert parse_weights("alice:2, bob:0.5,") == {"alice": 2.0, "bob": 0.5}
+        assert parse_weights("") == {}
@@ -1,6 +1,10 @@
+import asyncio
+import json
+
 import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
 
+import fitz
 import httpx
 
 
@@ -137,22 +141,144 @@ class TestUpperMindService:
 
             assert result == "Translated text via content"
 
+    @staticmethod
+    def _uppermind_client(reply):
+        """Fake httpx.AsyncClient answering /chat/noninteractive with ``reply(content)``."""
+        client = AsyncMock()
+
+        async def post(url, json=None, headers=None):
+            response = MagicMock()
+            response.status_code = 200
+            response.json.return_value = {"ai_message": reply(json["content"])}
+            return response
+
+        client.post.side_effect = post
+        client.__aenter__ = AsyncMock(return_value=client)
+        client.__aexit__ = AsyncMock(return_value=False)
+        return client
+
+    @pytest.mark.asyncio
+    async def test_small_texts_packed_into_one_request(self):
+        """Test concurrent short texts share one translator request and are split back out."""
+        from app.services.uppermind import translate
+
+        def reply(content):
+            # Keep the marker lines, "translate" the text under them
+            return "\n".join(line if line.startswith("<<<") else f"TR {line}" for line in content.splitlines()
+                             if line.startswith("<<<") or line.startswith("label"))
+
+        client = self._uppermind_client(reply)
+        with patch("httpx.AsyncClient", return_value=client):
+            results = await asyncio.gather(*(translate(f"label {n}", "token") for n in range(3)))
+
+        assert results == ["TR label 0", "TR label 1", "TR label 2"]
+        assert client.post.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_packed_and_single_results_keep_the_same_whitespace(self):
+        """Test a packed translation keeps its text's surrounding whitespace exactly like a single request."""
+        from app.services.uppermind import translate, translation_batcher
+
+        def reply(content):
+            if "<<<" not in content:
+                return f"TR {content}"
+            return "\n".join(line if line.startswith("<<<") else f"TR {line}" for line in content.splitlines()
+                             if line.startswith("<<<") or line.startswith("label"))
+
+        texts = ["\n  label a\n", "label b  \n\n"]
+        client = self._uppermind_client(reply)
+        with patch("httpx.AsyncClient", return_value=client):
+            packed = await asyncio.gather(*(translate(t, "token") for t in texts))
+            assert client.post.call_count == 1
+            with patch.object(translation_batcher, "max_items", 1):
+                single = await asyncio.gather(*(translate(t, "token") for t in texts))
+
+        assert packed == single == ["\n  TR label a\n", "TR label b  \n\n"]
+
+    @pytest.mark.asyncio
+    async def test_lost_markers_fall_back_to_single_requests(self):
+        """Test a packed reply without its markers is retried one text at a time."""
+        from app import metrics
+        from app.services.uppermind import translate
+        metrics.reset()
+
+        client = self._uppermind_client(lambda content: "<<<" not in content and f"TR {content}" or "merged")
+        with patch("httpx.AsyncClient", return_value=client):
+            results = await asyncio.gather(translate("label a", "token"), translate("label b", "token"))
+
+        assert results == ["TR label a", "TR label b"]
+        assert client.post.call_count == 3
+        assert metrics.snapshot()["counters"]["translation_batch_fallbacks"] == 1
+
+    @pytest.mark.asyncio
+    async def test_long_texts_and_other_users_not_packed(self):
+        """Test long texts go out on their own and batches never mix bearer tokens."""
+        from app.services.uppermind import translate
+
+        client = self._uppermind_client(lambda content: "<<<" not in content and "single" or "packed")
+        with patch("httpx.AsyncClient", return_value=client):
+            results = await asyncio.gather(
+                translate("x" * 5000, "token"), translate("label a", "token"), translate("label b", "other"),
+            )
+
+        assert results == ["single", "single", "single"]
+        assert client.post.call_count == 3
+
+
+class _FakeStream:
+    """Streaming response for a fake ``client.stream()``: NDJSON lines like Ollama's."""
+
+    def __init__(self, lines, status_code=200):
+        self.status_code = status_code
+        self.lines = lines
+        self.consumed = 0
+
+    async def aiter_lines(self):
+        for line in self.lines:
+            self.consumed += 1
+            yield line
+
+    async def aread(self):
+        return "\n".join(self.lines).encode()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+def _ollama_client(*replies, chunk=20):
+    """Fake httpx.AsyncClient whose ``stream()`` answers /api/generate with each reply in turn.
+
+    A reply is the generated text, streamed ``chunk`` characters at a time,
+    or a ``(status_code, body)`` tuple for an HTTP error.
+    """
+    client = MagicMock()
+    client.streams = []
+
+    def stream(method, url, **kwargs):
+        reply = replies[len(client.streams)]
+        if isinstance(reply, tuple):
+            response = _FakeStream([reply[1]], status_code=reply[0])
+        else:
+            lines = [json.dumps({"response": reply[i:i + chunk], "done": False}) for i in range(0, len(reply), chunk)]
+            lines.append(json.dumps({"response": "", "done": True, "done_reason": "stop", "eval_count": len(reply) // 4}))
+            response = _FakeStream(lines)
+        client.streams.append(response)
+        return response
+
+    client.stream = MagicMock(side_effect=stream)
+    client.__aenter__ = AsyncMock(return_value=client)
+    client.__aexit__ = AsyncMock(return_value=False)
+    return client
+
 
 class TestOCRService:
     @pytest.mark.asyncio
     async def test_extract_text_from_image(self):
         """Test OCR text extraction from image bytes."""
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {"response": "Hello World"}
-
-        with patch("httpx.AsyncClient") as MockClient:
-            mock_client_instance = AsyncMock()
-            mock_client_instance.post.return_value = mock_response
-            mock_client_instance.__aenter__ = AsyncMock(return_value=mock_client_instance)
-            mock_client_instance.__aexit__ = AsyncMock(return_value=False)
-            MockClient.return_value = mock_client_instance
-
+        with patch("httpx.AsyncClient", return_value=_ollama_client("Hello World")):
             from app.services.ocr import extract_text_from_image
             result = await extract_text_from_image(b"fake-image-bytes")
 
@@ -161,17 +287,7 @@ class TestOCRService:
     @pytest.mark.asyncio
     async def test_extract_text_empty_response(self):
         """Test OCR with empty response."""
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {"response": ""}
-
-        with patch("httpx.AsyncClient") as MockClient:
-            mock_client_instance = AsyncMock()
-            mock_client_instance.post.return_value = mock_response
-            mock_client_instance.__aenter__ = AsyncMock(return_value=mock_client_instance)
-            mock_client_instance.__aexit__ = AsyncMock(return_value=False)
-            MockClient.return_value = mock_client_instance
-
+        with patch("httpx.AsyncClient", return_value=_ollama_client("")):
             from app.services.ocr import extract_text_from_image
             result = await extract_text_from_image(b"blank-image")
 
@@ -180,53 +296,224 @@ class TestOCRService:
     @pytest.mark.asyncio
     async def test_glm_ocr_sends_correct_prompt(self):
         """Test that glm-ocr model uses its own prompt instead of deepseek-ocr prompt."""
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {"response": "Extracted text"}
-
-        with patch("httpx.AsyncClient") as MockClient, \
+        client = _ollama_client("Extracted text")
+        with patch("httpx.AsyncClient", return_value=client), \
              patch("app.services.ocr.settings") as mock_settings:
             mock_settings.OLLAMA_URL = "http://localhost:11434"
             mock_settings.OLLAMA_MODEL = "glm-ocr"
 
-            mock_client_instance = AsyncMock()
-            mock_client_instance.post.return_value = mock_response
-            mock_client_instance.__aenter__ = AsyncMock(return_value=mock_client_instance)
-            mock_client_instance.__aexit__ = AsyncMock(return_value=False)
-            MockClient.return_value = mock_client_instance
-
             from app.services.ocr import extract_text_from_image
             result = await extract_text_from_image(b"fake-image-bytes")
 
             assert result == "Extracted text"
-            call_kwargs = mock_client_instance.post.call_args
-            sent_json = call_kwargs.kwargs.get("json") or call_kwargs[1].get("json")
+            sent_json = client.stream.call_args.kwargs["json"]
             assert sent_json["prompt"] == "OCR"
             assert sent_json["model"] == "glm-ocr"
 
     @pytest.mark.asyncio
     async def test_deepseek_preamble_stripped(self):
         """Test that deepseek-ocr preamble is stripped from response."""
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {"response": "Do not change the text\nActual content"}
-
-        with patch("httpx.AsyncClient") as MockClient, \
+        with patch("httpx.AsyncClient", return_value=_ollama_client("Do not change the text\nActual content")), \
              patch("app.services.ocr.settings") as mock_settings:
             mock_settings.OLLAMA_URL = "http://localhost:11434"
             mock_settings.OLLAMA_MODEL = "deepseek-ocr"
 
-            mock_client_instance = AsyncMock()
-            mock_client_instance.post.return_value = mock_response
-            mock_client_instance.__aenter__ = AsyncMock(return_value=mock_client_instance)
-            mock_client_instance.__aexit__ = AsyncMock(return_value=False)
-            MockClient.return_value = mock_client_instance
-
             from app.services.ocr import extract_text_from_image
             result = await extract_text_from_image(b"fake-image-bytes")
 
             assert result == "Actual content"
 
+    @pytest.mark.asyncio
+    async def test_http_error_raised(self):
+        """Test a non-200 answer from Ollama surfaces as an OCR failure."""
+        with patch("httpx.AsyncClient", return_value=_ollama_client((500, '{"error": "out of memory"}'))):
+            from app.services.ocr import extract_text_from_image
+            with pytest.raises(RuntimeError, match="HTTP 500"):
+                await extract_text_from_image(b"img")
+
+    @pytest.mark.asyncio
+    async def test_batched_request_split_on_page_markers(self):
+        """Test several images go out in one request and the reply is split per page."""
+        client = _ollama_client(
+            "Do not change the text\n=== PAGE 1 ===\nfirst page\n=== PAGE 2 ===\nsecond page\n",
+            "third page",
+        )
+        with patch("httpx.AsyncClient", return_value=client), \
+             patch("app.services.ocr.settings") as mock_settings:
+            mock_settings.OLLAMA_URL = "http://localhost:11434"
+            mock_settings.OLLAMA_MODEL = "deepseek-ocr"
+            mock_settings.OCR_BATCH_SIZE = 2
+
+            from app.services.ocr import extract_text_from_images
+            result = await extract_text_from_images([b"img1", b"img2", b"img3"])
+
+        assert result == ["first page", "second page", "third page"]
+        first, second = [call.kwargs["json"] for call in client.stream.call_args_list]
+        assert len(first["images"]) == 2
+        assert "=== PAGE n ===" in first["prompt"]
+        assert len(second["images"]) == 1
+        assert second["prompt"] == "Extract the text in the image."
+
+    @pytest.mark.asyncio
+    async def test_batched_request_falls_back_without_markers(self):
+        """Test a batched reply without page markers is redone one image per request."""
+        client = _ollama_client("both pages run together", "page one", "page two")
+        with patch("httpx.AsyncClient", return_value=client), \
+             patch("app.services.ocr.settings") as mock_settings:
+            mock_settings.OLLAMA_URL = "http://localhost:11434"
+            mock_settings.OLLAMA_MODEL = "glm-ocr"
+            mock_settings.OCR_BATCH_SIZE = 0
+
+            from app.services import ocr
+            with patch.dict(ocr._MODEL_CONFIGS["glm-ocr"], {"batch_size": 4}):
+                result = await ocr.extract_text_from_images([b"img1", b"img2"])
+
+        assert result == ["page one", "page two"]
+        assert client.stream.call_count == 3
+
+
+
+    @pytest.mark.asyncio
+    async def test_requests_carry_model_runtime_profile(self):
+        """Test keep_alive and the model's options are sent, with OLLAMA_KEEP_ALIVE taking precedence."""
+        client = _ollama_client("text")
+        with patch("httpx.AsyncClient", return_value=client), \
+             patch("app.services.ocr.settings") as mock_settings:
+            mock_settings.OLLAMA_URL = "http://localhost:11434"
+            mock_settings.OLLAMA_MODEL = "glm-ocr"
+            mock_settings.OLLAMA_KEEP_ALIVE = "-1"
+
+            from app.services.ocr import extract_text_from_image
+            await extract_text_from_image(b"img")
+
+        sent = client.stream.call_args.kwargs["json"]
+        assert sent["keep_alive"] == "-1"
+        assert sent["options"] == {"num_ctx": 16384, "num_predict": 4096, "temperature": 0.0}
+
+
+class TestRunawayGuard:
+    @pytest.mark.asyncio
+    async def test_loop_aborted_early_and_retried(self):
+        """Test a looping generation is cut off mid-stream and retried with a repeat penalty."""
+        from app import metrics
+        metrics.reset()
+        looping = "Hasta: Ali Veli\n" + "Hemoglobin 13.2 g/dL\n" * 500
+        client = _ollama_client(looping, "Hasta: Ali Veli\nHemoglobin 13.2 g/dL")
+        with patch("httpx.AsyncClient", return_value=client):
+            from app.services.ocr import extract_text_from_image
+            result = await extract_text_from_image(b"img")
+
+        assert result == "Hasta: Ali Veli\nHemoglobin 13.2 g/dL"
+        first = client.streams[0]
+        assert first.consumed < len(first.lines) / 4  # stopped long before the end
+        retry_options = client.stream.call_args_list[1].kwargs["json"]["options"]
+        assert retry_options["repeat_penalty"] > 1
+        counters = metrics.snapshot()["counters"]
+        assert counters['ocr_runaway_detected{model="deepseek-ocr"}'] == 1
+        assert counters['ocr_runaway_recovered{model="deepseek-ocr"}'] == 1
+
+    @pytest.mark.asyncio
+    async def test_output_truncated_when_retry_loops_too(self):
+        """Test when both attempts loop, the text up to the loop is kept with one copy of the line."""
+        from app import metrics
+        metrics.reset()
+        looping = "Sonuc:\n" + "normal normal normal " * 300
+        with patch("httpx.AsyncClient", return_value=_ollama_client(looping, looping)):
+            from app.services.ocr import extract_text_from_image
+            result = await extract_text_from_image(b"img")
+
+        assert result.startswith("Sonuc:\nnormal")
+        assert len(result) < 100
+        assert metrics.snapshot()["counters"]['ocr_runaway_truncated{model="deepseek-ocr"}'] == 1
+
+    def test_find_loop_ignores_short_legit_repetition(self):
+        """Test a few identical table rows are not mistaken for a loop."""
+        from app.services.ocr import _find_loop
+        table = "Test | Sonuc\n" + "Negatif | -\n" * 5 + "Glukoz | 95 mg/dL\n"
+        assert _find_loop(table) is None
+        assert _find_loop("x" * 5 + "ab" * 400) == 7
+
+    def test_token_cap_scales_with_image_size(self):
+        """Test num_predict follows the image area and falls back to the profile cap."""
+        import io
+        from PIL import Image
+        from app.services.ocr import _MODEL_CONFIGS, _token_cap
+
+        def png(w, h):
+            buf = io.BytesIO()
+            Image.new("L", (w, h), 255).save(buf, format="PNG")
+            return buf.getvalue()
+
+        cfg = _MODEL_CONFIGS["deepseek-ocr"]
+        assert _token_cap([png(1000, 1000)], cfg) == 256 + 1200
+        assert _token_cap([png(400, 250)], cfg) == 256 + 120
+        assert _token_cap([png(4000, 4000)], cfg) == 4096
+        assert _token_cap([b"not-an-image"], cfg) == 4096
+
+
+class TestModelWarmup:
+    @staticmethod
+    def _ollama(resident_after_load=True):
+        """Fake Ollama client: /api/ps lists the model once /api/generate has loaded it."""
+        state = {"loaded": False, "generate": []}
+
+        async def get(url, **kwargs):
+            models = [{"name": "deepseek-ocr:latest", "expires_at": "2099-01-01T00:00:00Z"}] if state["loaded"] else []
+            return MagicMock(status_code=200, json=MagicMock(return_value={"models": models}), raise_for_status=MagicMock())
+
+        async def post(url, json=None, **kwargs):
+            state["generate"].append(json)
+            state["loaded"] = resident_after_load
+            return MagicMock(status_code=200, json=MagicMock(return_value={"response": ""}), raise_for_status=MagicMock())
+
+        client = AsyncMock()
+        client.get.side_effect = get
+        client.post.side_effect = post
+        client.__aenter__ = AsyncMock(return_value=client)
+        client.__aexit__ = AsyncMock(return_value=False)
+        return client, state
+
+    @pytest.mark.asyncio
+    async def test_ensure_warm_loads_model_once(self):
+        """Test a cold model is loaded with an empty prompt and then reported resident."""
+        from app.services import ocr
+        client, state = self._ollama()
+        with patch("httpx.AsyncClient", return_value=client), patch.object(ocr, "readiness", ocr.ModelReadiness()):
+            assert await ocr.ensure_warm() is True
+            assert await ocr.ensure_warm() is True  # already resident: no second load
+            status = ocr.readiness.as_dict()
+
+        assert len(state["generate"]) == 1
+        assert state["generate"][0]["prompt"] == ""
+        assert state["generate"][0]["keep_alive"] == "30m"
+        assert status["resident"] is True
+        assert status["expires_at"] == "2099-01-01T00:00:00Z"
+
+    @pytest.mark.asyncio
+    async def test_ensure_warm_reports_unreachable_ollama(self):
+        """Test a failed warm-up leaves the model marked not resident with the error."""
+        from app.services import ocr
+        client = AsyncMock()
+        client.get.side_effect = httpx.ConnectError("Connection refused")
+        client.__aenter__ = AsyncMock(return_value=client)
+        client.__aexit__ = AsyncMock(return_value=False)
+        with patch("httpx.AsyncClient", return_value=client), patch.object(ocr, "readiness", ocr.ModelReadiness()):
+            assert await ocr.ensure_warm() is False
+            assert "ConnectError" in ocr.readiness.error
+
+    def test_readiness_endpoint(self, client):
+        """Test /api/health/ready answers 503 until the model is resident."""
+        from app.services import ocr
+        with patch.object(ocr, "readiness", ocr.ModelReadiness()):
+            cold = client.get("/api/health/ready")
+            ocr.readiness.resident = True
+            warm = client.get("/api/health/ready")
+
+        assert cold.status_code == 503
+        assert cold.json()["status"] == "warming"
+        assert warm.status_code == 200
+        assert warm.json()["ocr_model"]["resident"] is True
+
 
 class TestPDFService:
     @pytest.mark.asyncio
@@ -234,7 +521,11 @@ class TestPDFService:
         """Test PDF extraction from a PDF with embedded text."""
         with patch("fitz.open") as mock_fitz_open:
             mock_page = MagicMock()
-            mock_page.get_text.return_value = "This is a test document with sufficient text content."
+            mock_page.rect = fitz.Rect(0, 0, 612, 792)
+            mock_page.get_text.return_value = [
+                (72, 72, 540, 90, "This is a test document with sufficient text content.\n", 0, 0),
+            ]
+            mock_page.get_image_info.return_value = []
 
             mock_doc = MagicMock()
             mock_doc.__len__ = MagicMock(return_value=1)
@@ -259,7 +550,11 @@ class TestPDFService:
             mock_pix.tobytes.return_value = b"png-image-bytes"
 
             mock_page = MagicMock()
-            mock_page.get_text.return_value = ""  # No text - scanned page
+            mock_page.rect = fitz.Rect(0, 0, 612, 792)
+            mock_page.get_text.return_value = []  # No text - scanned page
+            mock_page.get_image_info.return_value = [
+                {"bbox": (0, 0, 612, 792), "width": 2550, "height": 3300},
+            ]
             mock_page.get_pixmap.return_value = mock_pix
 
             mock_doc = MagicMock()
@@ -271,3 +566,103 @@ class TestPDFService:
             result = await extract_from_pdf(b"scanned-pdf")
 
             assert "OCR extracted text" in result
+
+    @staticmethod
+    def _scan(size, lines=8):
+        """PNG of a scanned table: dark text lines on a light background."""
+        import io
+        from PIL import Image, ImageDraw
+        img = Image.new("L", size, 245)
+        draw = ImageDraw.Draw(img)
+        for n in range(lines):
+            draw.text((20, 20 + n * 30), f"Hemoglobin {n}  13.{n} g/dL  ref 12-16", fill=0)
+        buf = io.BytesIO()
+        img.save(buf, format="PNG")
+        return buf.getvalue()
+
+    @pytest.mark.asyncio
+    async def test_mixed_page_keeps_text_and_ocrs_only_the_image(self):
+        """Test a typed header plus scanned table yields both, OCR'ing just the table crop."""
+        doc = fitz.open()
+        page = doc.new_page(width=612, height=792)
+        page.insert_text((72, 72), "Patient: Ayse Yilmaz - Laboratory report")
+        page.insert_image(fitz.Rect(72, 300, 540, 540), stream=self._scan((1600, 820)))
+        page.insert_text((72, 700), "Signed: Dr. Demir")
+        pdf_bytes = doc.tobytes()
+        doc.close()
+
+        with patch("app.services.pdf.extract_text_from_image", new_callable=AsyncMock) as mock_ocr:
+            mock_ocr.return_value = "Hemoglobin table"
+
+            from app.services.pdf import extract_from_pdf
+            result = await extract_from_pdf(pdf_bytes)
+
+        assert result == "Patient: Ayse Yilmaz - Laboratory report\nHemoglobin table\nSigned: Dr. Demir"
+        mock_ocr.assert_called_once()
+        from PIL import Image
+        import io
+        crop = Image.open(io.BytesIO(mock_ocr.call_args[0][0]))
+        # Long side sized to OCR_TARGET_PIXELS instead of a 2550x3300 full page
+        assert max(crop.size) <= 1600
+        assert crop.size[0] * crop.size[1] < 2550 * 3300 / 4
+
+    @pytest.mark.asyncio
+    async def test_scanned_page_not_rendered_above_native_resolution(self):
+        """Test a low-resolution scan is rendered at its own DPI, not 300."""
+        doc = fitz.open()
+        page = doc.new_page(width=612, height=792)
+        page.insert_image(page.rect, stream=self._scan((850, 1100), lines=20))  # ~100 DPI
+        pdf_bytes = doc.tobytes()
+        doc.close()
+
+        with patch("app.services.pdf.extract_text_from_image", new_callable=AsyncMock) as mock_ocr:
+            mock_ocr.return_value = "scan"
+
+            from app.services.pdf import extract_from_pdf
+            assert await extract_from_pdf(pdf_bytes) == "scan"
+
+        from PIL import Image
+        import io
+        rendered = Image.open(io.BytesIO(mock_ocr.call_args[0][0]))
+        assert rendered.size[0] <= 860
+
+    @pytest.mark.asyncio
+    async def test_image_with_text_layer_is_not_ocrd(self):
+        """Test a scan that already carries a text layer uses that text."""
+        doc = fitz.open()
+        page = doc.new_page(width=612, height=792)
+        page.insert_image(page.rect, stream=self._scan((850, 1100), lines=20))
+        page.insert_textbox(
+            fitz.Rect(30, 30, 580, 760), "Hemoglobin 13.0 g/dL ref 12-16\n" * 40, fontsize=11,
+        )
+        pdf_bytes = doc.tobytes()
+        doc.close()
+
+        with patch("app.services.pdf.extract_text_from_image", new_callable=AsyncMock) as mock_ocr:
+            from app.services.pdf import extract_from_pdf
+            result = await extract_from_pdf(pdf_bytes)
+
+        mock_ocr.assert_not_called()
+        assert "Hemoglobin 13.0 g/dL" in result
+
+    @pytest.mark.asyncio
+    async def test_scan_on_letterhead_background_is_ocrd_once(self):
+        """Test a table pasted over a full-page letterhead image is found and OCR'd once."""
+        doc = fitz.open()
+        page = doc.new_page(width=612, height=792)
+        page.insert_image(page.rect, stream=self._scan((850, 1100), lines=2))
+        letter = "Dear colleague,\n" + "Findings are summarised in the table below. " * 30
+        page.insert_textbox(fitz.Rect(72, 60, 540, 290), letter, fontsize=9)
+        page.insert_textbox(fitz.Rect(72, 560, 540, 760), letter, fontsize=9)
+        page.insert_image(fitz.Rect(72, 300, 540, 540), stream=self._scan((1600, 820)))
+        pdf_bytes = doc.tobytes()
+        doc.close()
+
+        with patch("app.services.pdf.extract_text_from_image", new_callable=AsyncMock) as mock_ocr:
+            mock_ocr.return_value = "Hemoglobin table"
+
+            from app.services.pdf import extract_from_pdf
+            result = await extract_from_pdf(pdf_bytes)
+
+        assert result.count("Hemoglobin table") == 1
+        assert "Dear colleague" in result
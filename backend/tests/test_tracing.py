@@ -0,0 +1,110 @@
+import io
+import json
+from unittest.mock import patch
+
+import pytest
+
+from app.tracing import Trace, _current_trace, inject, span
+
+
+class TestSpans:
+    def test_span_is_noop_without_trace(self):
+        """Test spans outside a request do nothing."""
+        with span("orphan") as s:
+            assert s is None
+
+    def test_nested_spans_and_server_timing(self):
+        """Test nested spans get parent ids and are summed in Server-Timing."""
+        trace = Trace("GET /test")
+        token = _current_trace.set(trace)
+        try:
+            with span("outer") as outer:
+                with span("inner") as inner:
+                    pass
+            with span("inner"):
+                pass
+        finally:
+            _current_trace.reset(token)
+        trace.finish()
+
+        assert outer.parent_id == trace.root.span_id
+        assert inner.parent_id == outer.span_id
+        header = trace.server_timing()
+        assert header.count("inner;dur=") == 1
+        assert "outer;dur=" in header
+        assert "total;dur=" in header
+
+    def test_span_records_error(self):
+        """Test an exception inside a span is recorded and re-raised."""
+        trace = Trace("GET /test")
+        token = _current_trace.set(trace)
+        try:
+            with pytest.raises(RuntimeError):
+                with span("failing"):
+                    raise RuntimeError("boom")
+        finally:
+            _current_trace.reset(token)
+
+        assert trace.spans[-1].error == "RuntimeError: boom"
+
+    def test_inject_traceparent(self):
+        """Test outgoing headers carry the current trace and span ids."""
+        trace = Trace("GET /test")
+        token = _current_trace.set(trace)
+        try:
+            with span("call") as s:
+                headers = inject({"Content-Type": "application/json"})
+        finally:
+            _current_trace.reset(token)
+
+        assert headers["traceparent"] == f"00-{trace.trace_id}-{s.span_id}-01"
+
+
+class TestTracingMiddleware:
+    def test_server_timing_header_on_json_response(self, client):
+        """Test non-streaming responses carry a Server-Timing header."""
+        response = client.get("/api/reports/records")
+
+        assert response.status_code == 200
+        assert "total;dur=" in response.headers["server-timing"]
+
+    def test_no_server_timing_on_sse(self, client, mock_ocr, mock_uppermind_translate):
+        """Test streaming uploads do not get a Server-Timing header."""
+        response = client.post(
+            "/api/reports/upload",
+            files=[("files", ("report.png", io.BytesIO(b"\x89PNG" + b"\x00" * 50), "image/png"))],
+        )
+
+        assert response.status_code == 200
+        assert "server-timing" not in response.headers
+
+    def test_incoming_traceparent_is_continued(self, client, tmp_path):
+        """Test an incoming traceparent is reused and spans are exported as JSON."""
+        trace_id = "0af7651916cd43dd8448eb211c80319c"
+        path = tmp_path / "traces.jsonl"
+        with patch("app.tracing.settings") as mock_settings:
+            mock_settings.TRACE_EXPORTER = "json"
+            mock_settings.TRACE_JSON_PATH = str(path)
+            client.get(
+                "/api/health",
+                headers={"traceparent": f"00-{trace_id}-b7ad6b7169203331-01"},
+            )
+
+        exported = json.loads(path.read_text().strip().splitlines()[-1])
+        assert exported["trace_id"] == trace_id
+        assert exported["spans"][0]["parent_id"] == "b7ad6b7169203331"
+
+    def test_upload_spans_exported(self, client, tmp_path, mock_ocr, mock_uppermind_translate):
+        """Test the upload stages show up as spans in the exported trace."""
+        path = tmp_path / "traces.jsonl"
+        with patch("app.tracing.settings") as mock_settings:
+            mock_settings.TRACE_EXPORTER = "json"
+            mock_settings.TRACE_JSON_PATH = str(path)
+            client.post(
+                "/api/reports/upload",
+                files=[("files", ("report.png", io.BytesIO(b"\x89PNG" + b"\x00" * 50), "image/png"))],
+            )
+
+        exported = json.loads(path.read_text().strip().splitlines()[-1])
+        names = {s["name"] for s in exported["spans"]}
+        assert {"request.parse", "upload.write", "db.commit", "ocr", "translate"} <= names
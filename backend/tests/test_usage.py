@@ -0,0 +1,94 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.services import usage
+from tests.test_services import _ollama_client
+
+
+class TestMetering:
+    @pytest.mark.asyncio
+    async def test_ocr_usage_from_final_chunk(self):
+        """Test token counts and durations from Ollama's final chunk reach the meter."""
+        from app.services.ocr import extract_text_from_image
+
+        client = _ollama_client("Rapor metni " * 10)
+        with patch("httpx.AsyncClient", return_value=client), usage.metering() as meter:
+            await extract_text_from_image(b"fake-image")
+
+        ocr = meter.stages["ocr"]
+        assert ocr.requests == 1
+        assert ocr.output_tokens == len("Rapor metni " * 10) // 4
+        assert ocr.gpu_ms >= 0
+
+    @pytest.mark.asyncio
+    async def test_packed_translation_usage_split_by_length(self):
+        """Test one packed request's usage is shared between its callers by text length."""
+        from app.services.uppermind import translate
+
+        async def post(url, json=None, headers=None):
+            response = MagicMock()
+            response.status_code = 200
+            markers = [line for line in json["content"].splitlines() if line.startswith("<<<")]
+            response.json.return_value = {
+                "ai_message": "\n".join(f"{m}\nçeviri" for m in markers),
+                "usage": {"prompt_tokens": 400, "completion_tokens": 100},
+            }
+            return response
+
+        client = AsyncMock()
+        client.post.side_effect = post
+        client.__aenter__ = AsyncMock(return_value=client)
+        client.__aexit__ = AsyncMock(return_value=False)
+
+        async def one(text):
+            with usage.metering() as meter:
+                await translate(text, "token")
+            return meter
+
+        with patch("httpx.AsyncClient", return_value=client):
+            short, long = await asyncio.gather(one("a" * 100), one("b" * 300))
+
+        assert client.post.call_count == 1
+        assert short.stages["translation"].prompt_tokens == pytest.approx(100)
+        assert long.stages["translation"].prompt_tokens == pytest.approx(300)
+        assert short.stages["translation"].requests + long.stages["translation"].requests == pytest.approx(1)
+
+
+class TestUsageEndpoint:
+    def test_usage_persisted_and_aggregated(self, client, mock_uppermind_translate):
+        """Test per-file usage is stored with the translation and summed per record, user and day."""
+        async def ocr(image_bytes):
+            usage.record("ocr", "deepseek-ocr", prompt_tokens=600, output_tokens=200, gpu_ms=1500, load_ms=0)
+            return "Extracted text from image"
+
+        async def translate(text, token):
+            usage.record("translation", "agent:1", prompt_tokens=50, output_tokens=60, gpu_ms=800)
+            return "Çeviri"
+
+        mock_uppermind_translate.side_effect = translate
+        with patch("app.routers.reports.extract_text_from_image", side_effect=ocr):
+            response = client.post(
+                "/api/reports/upload",
+                files=[("files", ("a.png", b"img-a", "image/png")), ("files", ("b.png", b"img-b", "image/png"))],
+            )
+        assert response.status_code == 200
+
+        by_record = client.get("/api/usage", params={"group_by": "record"}).json()
+        rows = {row["stage"]: row for row in by_record["rows"]}
+        assert rows["ocr"]["files"] == 2
+        assert rows["ocr"]["requests"] == 2
+        assert rows["ocr"]["prompt_tokens"] == 1200
+        assert rows["ocr"]["gpu_seconds"] == 3.0
+        assert rows["translation"]["output_tokens"] == 120
+        assert rows["translation"]["model"] == "agent:1"
+
+        by_user = client.get("/api/usage", params={"group_by": "user"}).json()
+        assert {row["user"] for row in by_user["rows"]} == {"testuser"}
+        by_day = client.get("/api/usage", params={"group_by": "day", "until": "2000-01-01"}).json()
+        assert by_day["rows"] == []
+
+    def test_invalid_grouping_rejected(self, client):
+        """Test an unknown group_by is a 400."""
+        assert client.get("/api/usage", params={"group_by": "model"}).status_code == 400
@@ -14,6 +14,7 @@ interface RecordDetail {
     id: number
     original_filename: string
     file_type: string
+    sha256: string | null
     download_url: string
     translations?: {
       id: number
@@ -21,6 +22,8 @@ interface RecordDetail {
       translated_text: string
       ocr_duration_ms?: number
       translation_duration_ms?: number
+      version?: number
+      ocr_model?: string | null
     }[]
   }[]
 }
@@ -107,6 +110,12 @@ export default function RecordDetailPage() {
                   {type === 'radiology' ? 'Radyoloji' : 'Rapor'}
                 </span>
                 <span style={styles.date}>{formatDate(detail.created_at)}</span>
+                <a
+                  onClick={() => handleDownload(`/api/export/records/${detail.id}`, `${detail.record_type}-${detail.id}.zip`)}
+                  style={styles.fileLink}
+                >
+                  Tümünü indir (ZIP)
+                </a>
               </div>
 
               {detail.patient_note && (
@@ -146,6 +155,9 @@ export default function RecordDetailPage() {
                       </div>
                     )
                   }
+                  // Reprocessing keeps earlier versions (newest first); label them to compare
+                  const versionLabel = (t: { version?: number; ocr_model?: string | null }) =>
+                    file.translations!.length > 1 ? ` (v${t.version}${t.ocr_model ? ` · ${t.ocr_model}` : ''})` : ''
                   return file.translations!.map((t) => (
                     <React.Fragment key={t.id}>
                       {t.original_text ? (
@@ -156,7 +168,7 @@ export default function RecordDetailPage() {
                               onClick={() => toggleText(`${t.id}-original`)}
                             >
                               <span style={{ marginRight: '6px' }}>{expandedTexts[`${t.id}-original`] ? '▾' : '▸'}</span>
-                              Orijinal Metin - {file.original_filename}
+                              Orijinal Metin - {file.original_filename}{versionLabel(t)}
                               {formatDuration(t.ocr_duration_ms) && (
                                 <span style={styles.durationText}>{formatDuration(t.ocr_duration_ms)}</span>
                               )}
@@ -174,7 +186,7 @@ export default function RecordDetailPage() {
                                 onClick={() => toggleText(`${t.id}-translated`)}
                               >
                                 <span style={{ marginRight: '6px' }}>{expandedTexts[`${t.id}-translated`] ? '▾' : '▸'}</span>
-                                Çeviri - {file.original_filename}
+                                Çeviri - {file.original_filename}{versionLabel(t)}
                                 {formatDuration(t.translation_duration_ms) && (
                                   <span style={styles.durationText}>{formatDuration(t.translation_duration_ms)}</span>
                                 )}
@@ -120,6 +120,14 @@ export default function RecordUploadPage() {
             window.location.href = '/login'
             return
           }
+          if (response.status === 503) {
+            const retryAfter = response.headers.get('Retry-After')
+            setReportResult({
+              success: false,
+              error: `Sunucu şu anda yoğun. Lütfen ${retryAfter ? `${retryAfter} saniye sonra` : 'biraz sonra'} tekrar deneyin.`,
+            })
+            return
+          }
           if (!response.ok) {
             const errorData = await response.json().catch(() => null)
             setReportResult({ success: false, error: errorData?.detail || 'Yükleme sırasında bir hata oluştu.' })
@@ -129,6 +137,7 @@ export default function RecordUploadPage() {
           const reader = response.body!.getReader()
           const decoder = new TextDecoder()
           let buffer = ''
+          let recordId: number | null = null
 
           while (true) {
             const { done, value } = await reader.read()
@@ -147,11 +156,23 @@ export default function RecordUploadPage() {
                 } else if (payload.phase === 'translation') {
                   setTranslationProgress({ done: payload.done, total: payload.total })
                 } else if (payload.phase === 'complete') {
-                  setReportResult({ success: true, files: payload.result.files })
+                  recordId = payload.result.id
                 }
               } catch { /* malformed event, ignore */ }
             }
           }
+
+          // The stream only names the stored rows; the texts come from the record
+          if (recordId !== null) {
+            const { data } = await apiClient.get(`/api/reports/records/${recordId}`)
+            setReportResult({
+              success: true,
+              files: data.files.map((f: { original_filename: string; translations: FileTranslation['translation'][] }) => ({
+                original_filename: f.original_filename,
+                translation: f.translations[0] ?? { original_text: '', translated_text: '' },
+              })),
+            })
+          }
         })().catch(() => {
           setReportResult({ success: false, error: 'Sunucu ile bağlantı kurulamadı.' })
         })